@@ -0,0 +1,102 @@
+"""Time autocomplete lookups, with and without a location to favor, on
+made-up names and addresses.  Every lookup is checked against scoring
+every key of the index first.
+
+"""
+import datetime
+import random
+import uuid
+
+from nkzalimi.autocomplete import AutocompleteIndex, Suggestion, SuggestionKind
+from nkzalimi.entities import BusinessEntityStatus
+from nkzalimi.records import EntityRecord
+from nkzalimi.search import normalize
+from nkzalimi.spatial import sphere_distance
+
+from .common import CENTER, make_parser, measure, report
+
+
+parser = make_parser(__doc__, database=False)
+parser.set_defaults(repeat=200)
+parser.add_argument('--entities', type=int, default=100000,
+                    help='business entities to index')
+parser.add_argument('--spread', type=float, default=0.5,
+                    help='degrees entities are scattered around the center')
+parser.add_argument('--cell-size', type=float, default=0.05,
+                    help='grid cell size of the index, in degrees')
+parser.add_argument('-l', '--limit', type=int, default=10,
+                    help='suggestions to ask for')
+
+SYLLABLES = [c + v for c in 'bcdghjkmnprst' for v in 'aeiou']
+
+#: Words every name ends with, as chains and categories repeat a lot.
+SUFFIXES = ['cafe', 'kitchen', 'bakery', 'kids', 'park', 'house', 'store']
+
+
+def make_records(count: int, spread: float, seed: int = 0):
+    rng = random.Random(seed)
+    words = sorted({''.join(rng.choices(SYLLABLES, k=rng.randint(2, 3)))
+                  for _ in range(3000)})
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return [
+        EntityRecord(
+            uuid.uuid4(), now,
+            ' '.join(rng.choices(words, k=rng.randint(1, 2)) +
+                     [rng.choice(SUFFIXES)]),
+            'cafe', BusinessEntityStatus.kids_friendly,
+            f'{rng.choice(words)}-ro {rng.randint(1, 300)}', '',
+            CENTER[0] + rng.uniform(-spread, spread),
+            CENTER[1] + rng.uniform(-spread, spread)
+        )
+        for _ in range(count)
+    ]
+
+
+def rank_all(index, prefix, limit, near):
+    """Score every key the slow way."""
+    prefix = normalize(prefix)
+    best = {}
+    for group in index.keys.groups.values():
+        for key, id, kind, whole in group.entries:
+            if not key.startswith(prefix):
+                continue
+            record = index.records[id]
+            kind = SuggestionKind(kind)
+            text = record.name if kind is SuggestionKind.name \
+                else record.address
+            score = (1.0 if whole else 0.5) / len(key)
+            if near is not None:
+                score /= 1.0 + sphere_distance(near[0], near[1],
+                                               record.latitude,
+                                               record.longitude) / 1000.0
+            current = best.get((text, kind))
+            if current is None or current.score < score:
+                best[text, kind] = Suggestion(text, kind, id, score)
+    return sorted(best.values(),
+                  key=lambda s: (-s.score, s.text, s.kind.value))[:limit]
+
+
+def main():
+    args = parser.parse_args()
+    records = make_records(args.entities, args.spread)
+    index = AutocompleteIndex(cell_size=args.cell_size)
+    report('rebuild', measure(lambda: index.rebuild(records), 3))
+    print(index.stats())
+    prefixes = ['b', 'ka', 'cafe', records[0].name[:3], records[1].name,
+                'zz']
+    places = [('', None), (' near', CENTER),
+              (' near edge', (CENTER[0] + args.spread, CENTER[1])),
+              (' far', (CENTER[0] + 3.0, CENTER[1]))]
+    for prefix in prefixes:
+        for label, near in places:
+            found = index.complete(prefix, args.limit, near)
+            assert found == rank_all(index, prefix, args.limit, near), \
+                (prefix, near)
+            report(f'{prefix!r}{label}',
+                   measure(lambda: index.complete(prefix, args.limit, near),
+                           args.repeat),
+                   found=len(found))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Compare committing pending revision requests one per call with the
+bulk commit endpoint.  Several of the requests revise the same entity.
+
+"""
+import statistics
+import time
+import typing
+import uuid
+
+from nkzalimi.api import MAX_BULK_COMMIT
+from nkzalimi.app import App
+from nkzalimi.entities import (CurrentBusinessEntity, RevisionKind,
+                               RevisionRequest)
+from nkzalimi.web import create_web_app
+
+from .common import load_app, login, make_parser, report, seed_entities
+
+
+parser = make_parser(__doc__)
+parser.set_defaults(repeat=3)
+parser.add_argument('--requests', type=int, default=2000,
+                    help='requests to commit in each run')
+parser.add_argument('--per-entity', type=int, default=3,
+                    help='requests revising each entity')
+
+
+def make_requests(app: App, user_id: uuid.UUID, count: int,
+                  per_entity: int) -> typing.List[uuid.UUID]:
+    """Submit ``count`` pending name revisions, ``per_entity`` on each of
+    the entities, and return their ids in order.
+
+    """
+    session = app.create_session()
+    try:
+        entity_ids = [
+            id for id, in session.query(CurrentBusinessEntity.id)
+                                 .limit(-(-count // per_entity))
+        ]
+        requests = [
+            RevisionRequest(submitted_by_id=user_id,
+                            business_entity_id=entity_ids[i // per_entity],
+                            revision_kind=RevisionKind.name,
+                            data=f'Renamed {uuid.uuid4().hex[:8]}')
+            for i in range(count)
+        ]
+        session.add_all(requests)
+        session.flush()
+        ids = [req.id for req in requests]
+        session.commit()
+    finally:
+        session.close()
+    return ids
+
+
+def main():
+    args = parser.parse_args()
+    app = load_app(args.config)
+    user_id = seed_entities(app, args.entities)
+    client = login(create_web_app(app).test_client(), user_id)
+
+    def one_by_one(ids):
+        for id in ids:
+            response = client.post(f'/api/requests/{id}/commit/')
+            assert response.status_code == 200, response.data
+
+    def in_bulk(ids):
+        for i in range(0, len(ids), MAX_BULK_COMMIT):
+            response = client.post('/api/requests/commit/', json={
+                'request_ids': [str(id) for id in ids[i:i + MAX_BULK_COMMIT]]
+            })
+            assert response.status_code == 200, response.data
+            results = response.get_json()['data']['results']
+            assert all(r['result'] == 'success' for r in results), results
+
+    for label, commit in [('one per call', one_by_one),
+                          ('bulk', in_bulk)]:
+        timings = []
+        for _ in range(args.repeat):
+            ids = make_requests(app, user_id, args.requests, args.per_entity)
+            started_at = time.perf_counter()
+            commit(ids)
+            timings.append(time.perf_counter() - started_at)
+        report(label, timings, requests_per_second=round(
+            args.requests / statistics.median(timings)
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""Helpers shared by the benchmarks, which are run as modules, e.g.::
+
+    python -m benchmarks.tiles scratch.toml
+
+Benchmarks which need the database take a configuration file as
+:file:`run.py` does.  Point it to a scratch database: they migrate it and
+seed fixtures into it.  Fixtures are made by the helpers of the tests, so
+install :file:`dev-requirements.txt` first.
+
+"""
+import argparse
+import pathlib
+import random
+import statistics
+import time
+import typing
+import uuid
+
+from ormeasy.alembic import upgrade_database
+
+from nkzalimi.app import App
+from nkzalimi.entities import (BusinessEntityStatus, CurrentBusinessEntity,
+                               User)
+from nkzalimi.orm import Base, get_alembic_config
+from tests.conftest import login, make_entities
+
+__all__ = ('CENTER', 'configure', 'database_only', 'load_app', 'login',
+           'make_parser', 'measure', 'report', 'seed_entities')
+
+
+#: Where fixtures are seeded around: central Seoul.
+CENTER = 37.5665, 126.9780
+
+#: The display name of the administrator fixtures are submitted by.
+FIXTURE_USER = 'benchmark'
+
+CATEGORIES = 'cafe', 'restaurant', 'bakery', 'bar', 'pub'
+
+
+def make_parser(description: str,
+                database: bool = True) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description=description,
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument('-n', '--repeat', type=int, default=50,
+                        help='times to run each case')
+    if database:
+        parser.add_argument('--entities', type=int, default=10000,
+                            help='business entities to seed at least')
+        parser.add_argument('config', type=pathlib.Path,
+                            help='configuration of a scratch database')
+    return parser
+
+
+def load_app(path: pathlib.Path) -> App:
+    app = App.from_path(path)
+    config = get_alembic_config(app.database_engine)
+    upgrade_database(config, app.database_engine, Base.metadata)
+    return app
+
+
+def configure(app: App, section: str, **values) -> App:
+    """A copy of ``app`` with ``values`` set in ``section``.  A value of
+    :const:`None` removes the setting.
+
+    """
+    settings = {**app.config.get(section, {}), **values}
+    return App(app.config, **{
+        section: {k: v for k, v in settings.items() if v is not None}
+    })
+
+
+def database_only(app: App) -> App:
+    """A copy of ``app`` which answers listings from the database, with
+    neither the listing cache nor in-process indexes.
+
+    """
+    app = configure(app, 'cache', listing=None)
+    return configure(app, 'index', spatial=None, search=None)
+
+
+def seed_entities(app: App, count: int, spread: float = 0.05) -> uuid.UUID:
+    """Make sure there are ``count`` business entities at least, scattered
+    up to ``spread`` degrees around :const:`CENTER`.  They're made through
+    creation requests as moderators would, by :func:`make_entities()` of
+    the tests.  Returns the id of the administrator who submitted them.
+
+    """
+    session = app.create_session()
+    try:
+        user = session.query(User) \
+            .filter_by(display_name=FIXTURE_USER) \
+            .first()
+        if user is None:
+            user = User(display_name=FIXTURE_USER, admin=True)
+            session.add(user)
+            session.commit()
+        user_id = user.id
+        missing = count - session.query(CurrentBusinessEntity).count()
+        rng = random.Random(missing)
+        statuses = [BusinessEntityStatus.kids_exclusive,
+                    BusinessEntityStatus.kids_friendly]
+        while missing > 0:
+            points = {status: [] for status in statuses}
+            for _ in range(min(missing, 1000)):
+                points[rng.choice(statuses)].append((
+                    CENTER[0] + rng.uniform(-spread, spread),
+                    CENTER[1] + rng.uniform(-spread, spread)
+                ))
+                missing -= 1
+            for status, batch in points.items():
+                if batch:
+                    make_entities(session, user_id, batch, status)
+    finally:
+        session.close()
+    return user_id
+
+
+def measure(f: typing.Callable[[], typing.Any],
+            repeat: int) -> typing.List[float]:
+    """Call ``f`` ``repeat`` times after a call to warm up, and return the
+    seconds each took.
+
+    """
+    f()
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        f()
+        timings.append(time.perf_counter() - started_at)
+    return timings
+
+
+def report(label: str, timings: typing.Sequence[float], **extra) -> None:
+    timings = sorted(timings)
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    columns = [
+        f'{label:<40}',
+        f'median {statistics.median(timings) * 1000:9.3f} ms',
+        f'p95 {p95 * 1000:9.3f} ms',
+    ]
+    columns.extend(f'{k} {v}' for k, v in extra.items())
+    print('  '.join(columns))
@@ -0,0 +1,86 @@
+"""Run slow queries from concurrent greenlets with database.green off and
+on, and see whether they overlap.  Needs only a PostgreSQL database; no
+tables are made.
+
+"""
+from gevent.monkey import patch_all; patch_all()  # noqa
+
+import pathlib
+import time
+import typing
+
+from gevent import joinall, sleep, spawn
+
+from nkzalimi.app import App
+
+from .common import configure, make_parser, measure, report
+
+
+parser = make_parser(__doc__, database=False)
+parser.set_defaults(repeat=5)
+parser.add_argument('-c', '--concurrency', type=int, default=10,
+                    help='greenlets querying at once')
+parser.add_argument('--sleep', type=float, default=0.1,
+                    help='seconds each query sleeps in pg_sleep()')
+parser.add_argument('config', type=pathlib.Path,
+                    help='configuration of a PostgreSQL database')
+
+
+class Ticker:
+    """A greenlet which wakes up every millisecond, to tell how long the
+    hub was kept from running it.
+
+    """
+
+    def __init__(self) -> None:
+        self.longest = 0.0
+        self.greenlet = spawn(self.run)
+
+    def run(self) -> None:
+        while True:
+            started_at = time.perf_counter()
+            sleep(0.001)
+            self.longest = max(self.longest,
+                               time.perf_counter() - started_at)
+
+    def stop(self) -> float:
+        self.greenlet.kill()
+        return self.longest
+
+
+def run_queries(app: App, concurrency: int,
+                seconds: float) -> typing.Callable[[], None]:
+    def query():
+        session = app.create_session()
+        try:
+            session.execute('SELECT pg_sleep(:seconds)', {'seconds': seconds})
+        finally:
+            session.close()
+
+    def run():
+        joinall([spawn(query) for _ in range(concurrency)],
+                raise_error=True)
+    return run
+
+
+def main():
+    args = parser.parse_args()
+    app = App.from_path(args.config)
+    # Enough connections for every greenlet, so that only the waits differ.
+    app = configure(app, 'database', pool_size=args.concurrency,
+                    max_overflow=0)
+    # Blocking first, as psycopg2 can't be made blocking again.
+    for green in (False, True):
+        case = configure(app, 'database', green=green)
+        run = run_queries(case, args.concurrency, args.sleep)
+        run()  # Open every connection of the pool.
+        ticker = Ticker()
+        timings = measure(run, args.repeat)
+        report(f'green = {str(green).lower()}', timings,
+               hub_blocked=f'{ticker.stop() * 1000:.0f} ms',
+               serial=f'{args.concurrency * args.sleep * 1000:.0f} ms')
+        case.database_engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
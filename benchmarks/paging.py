@@ -0,0 +1,65 @@
+"""Compare deep pages of the listing through offsets with "next" cursors,
+for the unfiltered and the geo listing.  Seed with --entities 1000000 to
+see pages at depth on a large table.
+
+Both listings read current_business_entity: cursors of the unfiltered one
+seek ix_current_business_entity_created_at_id, and those of the geo one
+ix_current_business_entity_geography.  The (created_at, id) index of
+business_entity was dropped by e41c6b9f2d07 as nothing reads it anymore.
+
+"""
+import urllib.parse
+
+from nkzalimi.web import create_web_app
+
+from .common import (CENTER, database_only, load_app, make_parser, measure,
+                     report, seed_entities)
+
+
+parser = make_parser(__doc__)
+parser.add_argument('-l', '--limit', type=int, default=100,
+                    help='entities per page')
+
+
+def main():
+    args = parser.parse_args()
+    app = load_app(args.config)
+    seed_entities(app, args.entities)
+    client = create_web_app(database_only(app)).test_client()
+    pages = args.entities // args.limit
+    depths = [d for d in (1, 10, 100, 1000, 10000) if d <= pages]
+    listings = [
+        ('unfiltered', {'limit': args.limit}),
+        ('geo', {'latitude': CENTER[0], 'longitude': CENTER[1],
+                 'radius': 100000, 'limit': args.limit}),
+    ]
+    for name, query in listings:
+        url = '/api/business_entities/?' + urllib.parse.urlencode(query)
+        # Walk down to the deepest page for the cursor of each depth.
+        cursors = {1: url}
+        next_url = url
+        for page in range(2, depths[-1] + 1):
+            response = client.get(next_url)
+            assert response.status_code == 200, response.data
+            next = response.get_json()['data']['next']
+            next_url = '/api/business_entities/?' + \
+                urllib.parse.urlencode({'next': next})
+            if page in depths:
+                cursors[page] = next_url
+        for depth in depths:
+            offset = (depth - 1) * args.limit
+            cases = [
+                ('offset', f'{url}&offset={offset}' if offset else url),
+                ('cursor', cursors[depth]),
+            ]
+            for label, page_url in cases:
+                response = client.get(page_url)
+                assert response.status_code == 200, response.data
+                rows = len(response.get_json()['data']['business_entities'])
+                report(f'{name} page {depth} ({label})',
+                       measure(lambda: client.get(page_url), args.repeat),
+                       rows=rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Load the connection pool from concurrent greenlets with a few sizes of
+database.pool_size and database.max_overflow, to size them for the
+concurrency of a process.  Needs only a PostgreSQL database; no tables
+are made.
+
+"""
+from gevent.monkey import patch_all; patch_all()  # noqa
+
+import pathlib
+import time
+import typing
+
+from gevent import joinall, sleep, spawn
+from sqlalchemy.exc import TimeoutError
+
+from nkzalimi.app import App
+
+from .common import configure, make_parser, report
+
+
+parser = make_parser(__doc__, database=False)
+parser.add_argument('-c', '--concurrency', type=int, default=50,
+                    help='greenlets querying at once')
+parser.add_argument('--query-time', type=float, default=0.01,
+                    help='seconds each query sleeps in pg_sleep()')
+parser.add_argument('--pools', default='5:10,10:10,25:0,50:0',
+                    help='comma-separated pool_size:max_overflow pairs')
+parser.add_argument('--pool-timeout', type=float, default=30.0,
+                    help='database.pool_timeout of every pool')
+parser.add_argument('config', type=pathlib.Path,
+                    help='configuration of a PostgreSQL database')
+
+
+def load(app: App, concurrency: int, repeat: int,
+         seconds: float) -> typing.Tuple[typing.List[float], int, float]:
+    """Have ``concurrency`` greenlets query ``repeat`` times each, and
+    return how long every query took including its checkout, the number
+    of checkouts which timed out, and the seconds it all took.
+
+    """
+    timings = []
+    timeouts = 0
+
+    def worker():
+        nonlocal timeouts
+        for _ in range(repeat):
+            started_at = time.perf_counter()
+            session = app.create_session()
+            try:
+                session.execute('SELECT pg_sleep(:seconds)',
+                                {'seconds': seconds})
+            except TimeoutError:
+                timeouts += 1
+                continue
+            finally:
+                session.close()
+                # Yield as a server does writing a response, or the same
+                # greenlets would take returned connections right back.
+                sleep(0)
+            timings.append(time.perf_counter() - started_at)
+
+    started_at = time.perf_counter()
+    joinall([spawn(worker) for _ in range(concurrency)], raise_error=True)
+    return timings, timeouts, time.perf_counter() - started_at
+
+
+def main():
+    args = parser.parse_args()
+    app = App.from_path(args.config)
+    for pair in args.pools.split(','):
+        pool_size, max_overflow = map(int, pair.split(':'))
+        case = configure(app, 'database', green=True, pool_size=pool_size,
+                         max_overflow=max_overflow,
+                         pool_timeout=args.pool_timeout)
+        timings, timeouts, elapsed = load(case, args.concurrency,
+                                          args.repeat, args.query_time)
+        stats = case.pool_stats()
+        waited = {k: v for k, v in stats['wait_histogram'].items() if v}
+        report(f'pool_size {pool_size}, max_overflow {max_overflow}',
+               timings,
+               longest=f'{max(timings) * 1000:.0f} ms',
+               queries_per_second=round(len(timings) / elapsed),
+               timeouts=timeouts, waits=stats['waits'],
+               wait_time=f'{stats["wait_time"]:.2f} s',
+               wait_histogram=waited, connects=stats['connects'],
+               connect_time=f'{stats["connect_time"]:.2f} s')
+        case.database_engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Compare the radius search through ST_DWithin() and ``<->`` with an
+ST_DistanceSphere() scan, as the table grows.  Both read
+current_business_entity; the former goes through its geography index,
+ix_current_business_entity_geography, which no index of
+business_entity_revision stands in for since e41c6b9f2d07.
+
+"""
+import pathlib
+
+from sqlalchemy.sql.functions import func
+
+from nkzalimi.api import query_business_entities
+from nkzalimi.entities import CurrentBusinessEntity
+from nkzalimi.util import latlng_to_geography, latlng_to_point
+from nkzalimi.web import create_web_app, session
+
+from .common import (CENTER, database_only, load_app, make_parser, measure,
+                     report, seed_entities)
+
+
+parser = make_parser(__doc__, database=False)
+parser.add_argument('--sizes', default='10000,100000,1000000',
+                    help='comma-separated numbers of entities to compare at')
+parser.add_argument('--spread', type=float, default=1.0,
+                    help='degrees around the center entities are seeded in')
+parser.add_argument('-r', '--radius', type=float, default=1000.0,
+                    help='meters to search within')
+parser.add_argument('-l', '--limit', type=int, default=100,
+                    help='entities to list at most')
+parser.add_argument('config', type=pathlib.Path,
+                    help='configuration of a scratch database')
+
+
+def distance_sphere(radius: float, limit: int):
+    """The query of the listing before the geography index, which computes
+    the distance of every entity.  ST_Distance_Sphere() was renamed
+    ST_DistanceSphere() in PostGIS 2.2, and the old name was dropped in
+    3.0.
+
+    """
+    distance = func.ST_DistanceSphere(CurrentBusinessEntity.coordinate,
+                                      latlng_to_point(*CENTER))
+    return session.query(CurrentBusinessEntity) \
+        .filter(distance < radius) \
+        .order_by(distance) \
+        .limit(limit) \
+        .all()
+
+
+def main():
+    args = parser.parse_args()
+    app = load_app(args.config)
+    wsgi_app = create_web_app(database_only(app))
+    origin = latlng_to_geography(*CENTER)
+    cases = [
+        ('ST_DistanceSphere() scan',
+         lambda: distance_sphere(args.radius, args.limit)),
+        ('ST_DWithin() and <->',
+         lambda: query_business_entities(origin, args.radius, None, None,
+                                         None, 0, None, args.limit)),
+        ('<-> only (nearest)',
+         lambda: query_business_entities(origin, None, None, None, None, 0,
+                                         None, args.limit)),
+    ]
+    for size in map(int, args.sizes.split(',')):
+        seed_entities(app, size, args.spread)
+        for label, f in cases:
+            with wsgi_app.test_request_context():
+                rows = len(f())
+                timings = measure(f, args.repeat)
+            report(f'{size} entities, {label}', timings, rows=rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""Compare the memory a listing page takes as slotted records with ORM
+instances.  Given a configuration, pages loaded from its database are
+compared as well; otherwise only pages built from rows in memory.
+
+"""
+import datetime
+import gc
+import pathlib
+import random
+import tracemalloc
+import typing
+import uuid
+
+from nkzalimi.entities import BusinessEntityStatus, CurrentBusinessEntity
+from nkzalimi.records import EntityRecord
+from nkzalimi.serializer import serialize, serialize_many
+
+from .common import (CATEGORIES, CENTER, load_app, make_parser, measure,
+                     report, seed_entities)
+
+
+parser = make_parser(__doc__, database=False)
+parser.add_argument('--items', type=int, default=1000,
+                    help='entities on a page')
+parser.add_argument('config', type=pathlib.Path, nargs='?',
+                    help='configuration of a scratch database')
+
+
+def profile(f: typing.Callable[[], typing.Any]) -> typing.Mapping[str, str]:
+    """Count the memory blocks the result of ``f`` holds, and the peak
+    memory it took to make it.
+
+    """
+    gc.collect()
+    tracemalloc.start()
+    result = f()
+    snapshot = tracemalloc.take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    blocks = sum(stat.count for stat in snapshot.statistics('filename'))
+    return {
+        'blocks': blocks,
+        'held': f'{current / 1024:.0f} KiB',
+        'peak': f'{peak / 1024:.0f} KiB',
+    }
+
+
+def make_rows(n: int, seed: int = 0) -> typing.List[tuple]:
+    """Rows as :meth:`EntityRecord.query()` gives them."""
+    rng = random.Random(seed)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    statuses = list(BusinessEntityStatus)
+    rows = []
+    for _ in range(n):
+        i = rng.randrange(1000000)
+        rows.append((
+            uuid.UUID(int=rng.getrandbits(128)),
+            now - datetime.timedelta(seconds=i), f'Fixture {i}',
+            rng.choice(CATEGORIES), rng.choice(statuses),
+            f'{i} Sejong-daero, Jung-gu, Seoul', '',
+            CENTER[0] + rng.uniform(-0.05, 0.05),
+            CENTER[1] + rng.uniform(-0.05, 0.05)
+        ))
+    return rows
+
+
+def in_memory_cases(n: int) -> typing.List[typing.Tuple[str, typing.Callable]]:
+    rows = make_rows(n)
+    names = EntityRecord.__slots__
+
+    def instances():
+        # Transient, so without the identity map and the committed state
+        # loaded instances also keep; a lower bound of those.
+        return [CurrentBusinessEntity(**dict(zip(names, row)))
+                for row in rows]
+
+    def records():
+        return [EntityRecord(*row) for row in rows]
+
+    return [
+        ('ORM instances', instances),
+        ('ORM instances, serialized',
+         lambda: [serialize(e) for e in instances()]),
+        ('records', records),
+        ('records, serialized', lambda: serialize_many(records())),
+    ]
+
+
+def database_cases(
+    config: pathlib.Path, n: int
+) -> typing.List[typing.Tuple[str, typing.Callable]]:
+    app = load_app(config)
+    seed_entities(app, n)
+    order = (CurrentBusinessEntity.created_at.desc(),
+             CurrentBusinessEntity.id.desc())
+
+    def load(query):
+        session = app.create_session()
+        try:
+            return query(session)
+        finally:
+            session.close()
+
+    def instances(session):
+        return [serialize(e)
+                for e in session.query(CurrentBusinessEntity)
+                                .order_by(*order).limit(n)]
+
+    def records(session):
+        return serialize_many([
+            EntityRecord(*row)
+            for row in EntityRecord.query(session).order_by(*order).limit(n)
+        ])
+
+    return [
+        ('loaded as ORM instances, serialized', lambda: load(instances)),
+        ('loaded as records, serialized', lambda: load(records)),
+    ]
+
+
+def main():
+    args = parser.parse_args()
+    cases = in_memory_cases(args.items)
+    if args.config is not None:
+        cases += database_cases(args.config, args.items)
+    for label, f in cases:
+        report(label, measure(f, args.repeat), **profile(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+"""Compare serializer plans with serializing field by field, and
+JSON encoders with :func:`flask.jsonify()`.  Needs no database.
+
+"""
+import datetime
+import random
+import uuid
+
+from flask import Flask, jsonify
+
+from nkzalimi.autocomplete import Suggestion, SuggestionKind
+from nkzalimi.cluster import Cluster
+from nkzalimi.entities import (BlockUserRequest, BusinessEntity,
+                               BusinessEntityRevision, BusinessEntityStatus,
+                               CreationRequest, CurrentBusinessEntity,
+                               GithubLogin, MarkAsDuplicateRequest,
+                               OAuthProvider, RevisionKind, RevisionRequest,
+                               User)
+from nkzalimi.records import (EntityRecord, OAuthLoginRecord, RevisionRecord,
+                              RevisionRequestRecord, UserRecord)
+from nkzalimi.serializer import (DUMPS_SAMPLE, dumps, plans, serialize,
+                                 serialize_many, stdlib_dumps, ujson,
+                                 ujson_dumps)
+
+from .common import CATEGORIES, CENTER, make_parser, measure, report
+
+
+parser = make_parser(__doc__, database=False)
+parser.add_argument('--items', type=int, default=1000,
+                    help='objects in each list serialized')
+
+
+def entity_fields(e) -> dict:
+    return {
+        'id': serialize(e.id),
+        'created_at': serialize(e.created_at),
+        'name': e.name,
+        'category': e.category,
+        'status': serialize(e.status),
+        'address': f'{e.address} {e.address_sub}',
+        'coordinate': [e.latitude, e.longitude]
+    }
+
+
+def revision_fields(e) -> dict:
+    return {
+        **entity_fields(e),
+        'request_id': serialize(e.request_id),
+        'replacing_id': None if e.replacing_id is None
+        else serialize(e.replacing_id),
+    }
+
+
+#: How classes with plans were serialized before: one object at a time,
+#: through :func:`serialize()` for every value.
+FIELD_BY_FIELD = {
+    CurrentBusinessEntity: entity_fields,
+    EntityRecord: entity_fields,
+    BusinessEntityRevision: revision_fields,
+    RevisionRecord: revision_fields,
+    Suggestion: lambda e: {
+        'text': e.text,
+        'kind': serialize(e.kind),
+        'business_entity_id': serialize(e.business_entity_id)
+    },
+    Cluster: lambda e: {
+        'count': e.count,
+        'coordinate': [e.latitude, e.longitude],
+        'statuses': {serialize(s): n for s, n in e.statuses.items()}
+    },
+}
+
+
+def make_fixtures(n: int, seed: int = 0) -> dict:
+    """Lists of ``n`` objects of every class :func:`serialize()` has."""
+    rng = random.Random(seed)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    statuses = list(BusinessEntityStatus)
+
+    def entity_values():
+        i = rng.randrange(1000000)
+        return dict(
+            id=uuid.UUID(int=rng.getrandbits(128)),
+            created_at=now - datetime.timedelta(seconds=i),
+            name=f'Fixture {i} 키즈카페', category=rng.choice(CATEGORIES),
+            status=rng.choice(statuses),
+            address=f'{i} Sejong-daero, Jung-gu, Seoul', address_sub='2F',
+            latitude=CENTER[0] + rng.uniform(-0.05, 0.05),
+            longitude=CENTER[1] + rng.uniform(-0.05, 0.05)
+        )
+
+    def revision_values():
+        return dict(entity_values(), request_id=uuid.uuid4(),
+                    replacing_id=rng.choice([None, uuid.uuid4()]))
+
+    def user():
+        user = User(id=uuid.uuid4(), created_at=now, admin=False,
+                    display_name='Fixture user')
+        user.oauth_logins.append(GithubLogin(uid=str(rng.randrange(1000))))
+        return user
+
+    user_record = UserRecord(uuid.uuid4(), now, False, False, 'Fixture user',
+                             [OAuthLoginRecord(OAuthProvider.github, '1')])
+    request_values = dict(created_at=now, upvotes=3, downvotes=1)
+    revisions = [BusinessEntityRevision(**revision_values())
+                 for _ in range(n)]
+    entities = []
+    for revision in revisions:
+        entity = BusinessEntity(id=uuid.uuid4(), created_at=now)
+        entity.latest_revision = revision
+        entities.append(entity)
+    return {
+        CurrentBusinessEntity: [CurrentBusinessEntity(**entity_values())
+                                for _ in range(n)],
+        EntityRecord: [EntityRecord(**entity_values()) for _ in range(n)],
+        BusinessEntityRevision: revisions,
+        RevisionRecord: [RevisionRecord(**revision_values())
+                         for _ in range(n)],
+        Suggestion: [
+            Suggestion(f'Fixture {i}', rng.choice(list(SuggestionKind)),
+                       uuid.uuid4(), rng.random())
+            for i in range(n)
+        ],
+        Cluster: [
+            Cluster(rng.randrange(1, 100), *CENTER,
+                    {s: rng.randrange(1, 50) for s in statuses})
+            for _ in range(n)
+        ],
+        BusinessEntity: entities,
+        User: [user() for _ in range(n)],
+        UserRecord: [user_record] * n,
+        CreationRequest: [
+            CreationRequest(id=uuid.uuid4(), submitted_by=user(),
+                            name='Fixture', category='cafe',
+                            status=rng.choice(statuses), address='Seoul',
+                            address_sub='', **request_values)
+            for _ in range(n)
+        ],
+        RevisionRequest: [
+            RevisionRequest(id=uuid.uuid4(), submitted_by=user(),
+                            business_entity_id=uuid.uuid4(),
+                            revision_kind=RevisionKind.name,
+                            data='Fixture', **request_values)
+            for _ in range(n)
+        ],
+        RevisionRequestRecord: [
+            RevisionRequestRecord(uuid.uuid4(), now, user_record, 3, 1,
+                                  False, uuid.uuid4(), RevisionKind.name,
+                                  'Fixture')
+            for _ in range(n)
+        ],
+        MarkAsDuplicateRequest: [
+            MarkAsDuplicateRequest(id=uuid.uuid4(), submitted_by=user(),
+                                   business_entity_id=uuid.uuid4(),
+                                   duplicates_with_id=uuid.uuid4(),
+                                   **request_values)
+            for _ in range(n)
+        ],
+        BlockUserRequest: [
+            BlockUserRequest(id=uuid.uuid4(), submitted_by=user(),
+                             blocking_user_id=uuid.uuid4(),
+                             **request_values)
+            for _ in range(n)
+        ],
+        datetime.datetime: [now] * n,
+        uuid.UUID: [uuid.uuid4() for _ in range(n)],
+        BusinessEntityStatus: [rng.choice(statuses) for _ in range(n)],
+    }
+
+
+def main():
+    args = parser.parse_args()
+    fixtures = make_fixtures(args.items)
+    payloads = {}
+    for cls, items in fixtures.items():
+        name = cls.__name__
+        data = serialize_many(items)
+        payloads[name] = {'result': 'success', 'data': {'items': data}}
+        if cls in plans:
+            fields = FIELD_BY_FIELD[cls]
+            assert data == [fields(e) for e in items], name
+            report(f'{name} (field by field)',
+                   measure(lambda: [fields(e) for e in items], args.repeat))
+            report(f'{name} (plan)',
+                   measure(lambda: serialize_many(items), args.repeat))
+        else:
+            report(f'{name} (serialize)',
+                   measure(lambda: serialize_many(items), args.repeat))
+    encoders = [('stdlib', stdlib_dumps)]
+    if ujson is None:
+        print('ujson is not installed')
+    else:
+        encoders.append(('ujson', ujson_dumps))
+    for label, encode in encoders:
+        print(f'{label} encodes DUMPS_SAMPLE like the stdlib:',
+              encode(DUMPS_SAMPLE) == stdlib_dumps(DUMPS_SAMPLE))
+    print('dumps is', dumps.__name__)
+    flask_app = Flask(__name__)
+    with flask_app.app_context():
+        for name, payload in payloads.items():
+            expected = jsonify(payload).get_data()
+            report(f'{name} (jsonify)',
+                   measure(lambda: jsonify(payload).get_data(), args.repeat),
+                   bytes=len(expected))
+            for label, encode in encoders:
+                body = (encode(payload) + '\n').encode()
+                report(f'{name} ({label})',
+                       measure(lambda: encode(payload), args.repeat),
+                       identical=body == expected)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Compare the spatial index with scanning every entity."""
+import datetime
+import random
+import uuid
+
+from nkzalimi.entities import BusinessEntityStatus
+from nkzalimi.records import EntityRecord
+from nkzalimi.spatial import SpatialIndex, sphere_distance
+
+from .common import CENTER, make_parser, measure, report
+
+
+parser = make_parser(__doc__, database=False)
+parser.add_argument('--entities', type=int, default=100000,
+                    help='business entities to index')
+parser.add_argument('--spread', type=float, default=0.5,
+                    help='degrees entities are scattered around the center')
+parser.add_argument('--cell-size', type=float, default=0.05,
+                    help='grid cell size of the index, in degrees')
+
+
+def scan(records, latitude, longitude, radius=None, k=None):
+    found = []
+    for record in records:
+        distance = sphere_distance(latitude, longitude,
+                                   record.latitude, record.longitude)
+        if radius is None or distance <= radius:
+            found.append((distance, record.id, record))
+    found.sort(key=lambda row: row[:2])
+    return [(record, distance) for distance, _, record in found[:k]]
+
+
+def main():
+    args = parser.parse_args()
+    rng = random.Random(0)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    records = [
+        EntityRecord(uuid.uuid4(), now, f'Entity {i}', 'cafe',
+                     BusinessEntityStatus.kids_friendly, '', '',
+                     CENTER[0] + rng.uniform(-args.spread, args.spread),
+                     CENTER[1] + rng.uniform(-args.spread, args.spread))
+        for i in range(args.entities)
+    ]
+    index = SpatialIndex(cell_size=args.cell_size)
+    report('rebuild', measure(lambda: index.rebuild(records), 3))
+    print(index.stats())
+    for radius in (500.0, 5000.0):
+        expected = scan(records, *CENTER, radius=radius)
+        assert index.nearby(*CENTER, radius) == expected
+        report(f'nearby {radius:.0f} m (index)',
+               measure(lambda: index.nearby(*CENTER, radius), args.repeat),
+               found=len(expected))
+        report(f'nearby {radius:.0f} m (scan)',
+               measure(lambda: scan(records, *CENTER, radius=radius),
+                       max(1, args.repeat // 10)))
+    for k in (10, 100):
+        expected = scan(records, *CENTER, k=k)
+        assert index.nearest(*CENTER, k) == expected
+        report(f'nearest {k} (index)',
+               measure(lambda: index.nearest(*CENTER, k), args.repeat))
+        report(f'nearest {k} (scan)',
+               measure(lambda: scan(records, *CENTER, k=k),
+                       max(1, args.repeat // 10)))
+
+
+if __name__ == '__main__':
+    main()
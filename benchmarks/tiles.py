@@ -0,0 +1,54 @@
+"""Compare a vector tile with the JSON listing of the same area."""
+import tempfile
+import urllib.parse
+
+from nkzalimi.mercator import tile_bounds, tile_of
+from nkzalimi.web import create_web_app
+
+from .common import (CENTER, configure, load_app, make_parser, measure,
+                     report, seed_entities)
+
+
+parser = make_parser(__doc__)
+parser.add_argument('-z', '--zoom', type=int, default=15,
+                    help='zoom of the tile at the center of fixtures')
+
+
+def main():
+    args = parser.parse_args()
+    app = load_app(args.config)
+    seed_entities(app, args.entities)
+    x, y = tile_of(args.zoom, *CENTER)
+    south, west, north, east = tile_bounds(args.zoom, x, y)
+    listing_url = '/api/business_entities/?' + urllib.parse.urlencode({
+        'min_latitude': south, 'min_longitude': west,
+        'max_latitude': north, 'max_longitude': east,
+        'limit': args.entities,
+    })
+    tile_url = f'/api/tiles/{args.zoom}/{x}/{y}.mvt'
+    # Leave the listing uncached, as tiles are compared with it.
+    app = configure(app, 'cache', listing=None)
+    uncached = create_web_app(configure(app, 'tiles', cache_dir=None))
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cached = create_web_app(configure(app, 'tiles', cache_dir=cache_dir))
+        cases = [
+            ('listing (JSON)', uncached, listing_url, {}),
+            ('tile (rendered)', uncached, tile_url, {}),
+            ('tile (cached)', cached, tile_url, {}),
+        ]
+        etag = cached.test_client().get(tile_url).headers['ETag']
+        cases.append(('tile (revalidated)', cached, tile_url,
+                      {'If-None-Match': etag}))
+        for label, wsgi_app, url, headers in cases:
+            client = wsgi_app.test_client()
+            response = client.get(url, headers=headers)
+            assert response.status_code in (200, 304), response.data
+            report(label,
+                   measure(lambda: client.get(url, headers=headers),
+                           args.repeat),
+                   status=response.status_code,
+                   bytes=len(response.data))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Time the viewport listing for a few sizes of viewports, with a status
+filter, and deep in its cursor pages, next to the radius listing a client
+would have had to use to cover the same viewport.
+
+"""
+import math
+import urllib.parse
+
+from nkzalimi.entities import BusinessEntityStatus
+from nkzalimi.spatial import sphere_distance
+from nkzalimi.web import create_web_app
+
+from .common import (CENTER, database_only, load_app, make_parser, measure,
+                     report, seed_entities)
+
+
+parser = make_parser(__doc__)
+parser.add_argument('-l', '--limit', type=int, default=100,
+                    help='entities per page')
+parser.add_argument('--spread', type=float, default=0.5,
+                    help='degrees around the center entities are seeded in')
+parser.add_argument('--pages', type=int, default=10,
+                    help='the page of the viewport listing to go down to')
+
+
+def main():
+    args = parser.parse_args()
+    app = load_app(args.config)
+    seed_entities(app, args.entities, args.spread)
+    client = create_web_app(database_only(app)).test_client()
+
+    def listing(**query):
+        return '/api/business_entities/?' + urllib.parse.urlencode(
+            {'limit': args.limit, **query}
+        )
+
+    def get(url):
+        response = client.get(url)
+        assert response.status_code == 200, response.data
+        return response.get_json()['data']
+
+    for size in (0.01, 0.05, 0.2):
+        half = size / 2
+        bounds = {
+            'min_latitude': CENTER[0] - half,
+            'min_longitude': CENTER[1] - half,
+            'max_latitude': CENTER[0] + half,
+            'max_longitude': CENTER[1] + half,
+        }
+        # The circle through the corners of the viewport.
+        radius = math.ceil(sphere_distance(CENTER[0], CENTER[1],
+                                           CENTER[0] + half,
+                                           CENTER[1] + half))
+        cases = [
+            ('viewport', listing(**bounds)),
+            ('viewport, kids_exclusive',
+             listing(status=BusinessEntityStatus.kids_exclusive.value,
+                     **bounds)),
+            (f'radius {radius} m',
+             listing(latitude=CENTER[0], longitude=CENTER[1],
+                     radius=radius)),
+        ]
+        url = cases[0][1]
+        for page in range(2, args.pages + 1):
+            next = get(url)['next']
+            if next is None:
+                break
+            url = listing(next=next)
+        else:
+            cases.append((f'viewport, page {args.pages}', url))
+        for label, url in cases:
+            rows = len(get(url)['business_entities'])
+            report(f'{size}° {label}',
+                   measure(lambda: client.get(url), args.repeat), rows=rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""Measure how many votes per second concurrent greenlets cast, one
+statement per vote or batched by :class:`~nkzalimi.poll.VoteBuffer`.
+Without a configuration, sessions only simulate a connection pool and
+round trips to the database.
+
+"""
+import argparse
+import itertools
+import pathlib
+import statistics
+import typing
+import uuid
+
+from gevent import joinall, sleep, spawn
+from gevent.lock import BoundedSemaphore
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from nkzalimi.entities import CreationRequest, User
+from nkzalimi.poll import Vote, VoteBuffer, cast_votes
+
+from .common import load_app, make_parser, measure, report, seed_entities
+
+
+parser = make_parser(__doc__, database=False)
+parser.set_defaults(repeat=5)
+parser.add_argument('-c', '--concurrency', type=int, default=100,
+                    help='greenlets casting votes, each as its own user')
+parser.add_argument('--votes', type=int, default=20,
+                    help='votes each greenlet casts, on distinct requests')
+parser.add_argument('--interval', type=float, default=0.005,
+                    help='seconds VoteBuffer collects votes for')
+parser.add_argument('--batch-size', type=int, default=500,
+                    help='votes VoteBuffer writes early as a batch')
+parser.add_argument('--pool-size', type=int, default=5,
+                    help='connections of the simulated pool')
+parser.add_argument('--latency', type=float, default=0.001,
+                    help='seconds of a simulated round trip')
+parser.add_argument('config', type=pathlib.Path, nargs='?',
+                    help='configuration of a scratch database')
+
+
+class SimulatedSession:
+    """Holds one of the ``pool`` connections from its first statement until
+    it's closed, and sleeps for ``latency`` seconds per round trip.
+    Statements are compiled for PostgreSQL as they would be to be sent.
+
+    """
+
+    dialect = postgresql.dialect()
+
+    def __init__(self, pool: BoundedSemaphore, latency: float) -> None:
+        self.pool = pool
+        self.latency = latency
+        self.connected = False
+
+    def round_trip(self) -> None:
+        if not self.connected:
+            self.pool.acquire()
+            self.connected = True
+        sleep(self.latency)
+
+    def execute(self, statement) -> None:
+        statement.compile(dialect=self.dialect)
+        self.round_trip()
+
+    def commit(self) -> None:
+        self.round_trip()
+
+    def close(self) -> None:
+        if self.connected:
+            self.pool.release()
+            self.connected = False
+
+
+def make_fixtures(
+    args: argparse.Namespace
+) -> typing.Tuple[typing.Callable[[], Session],
+                  typing.List[uuid.UUID], typing.List[uuid.UUID]]:
+    """A session factory, and the ids of users and requests to vote
+    with and on.
+
+    """
+    users, requests = args.concurrency, args.votes
+    if args.config is None:
+        pool = BoundedSemaphore(args.pool_size)
+        return (lambda: SimulatedSession(pool, args.latency),
+                [uuid.uuid4() for _ in range(users)],
+                [uuid.uuid4() for _ in range(requests)])
+    app = load_app(args.config)
+    seed_entities(app, requests)
+    session = app.create_session()
+    try:
+        fixtures = [User(display_name=f'Voter {i}') for i in range(users)]
+        session.add_all(fixtures)
+        session.commit()
+        user_ids = [user.id for user in fixtures]
+        request_ids = [
+            id for id, in session.query(CreationRequest.id).limit(requests)
+        ]
+    finally:
+        session.close()
+    return app.create_session, user_ids, request_ids
+
+
+def main():
+    args = parser.parse_args()
+    create_session, user_ids, request_ids = make_fixtures(args)
+    runs = itertools.count()
+
+    def direct(vote: Vote) -> None:
+        session = create_session()
+        try:
+            cast_votes(session, [vote])
+            session.commit()
+        finally:
+            session.close()
+
+    buffer = VoteBuffer(create_session, args.interval, args.batch_size)
+    total = args.concurrency * args.votes
+    for label, cast in [('one statement per vote', direct),
+                        ('VoteBuffer', lambda vote: buffer.cast(*vote))]:
+
+        def run():
+            # Flip votes every run, so that every one of them is written.
+            upvote = next(runs) % 2 == 0
+            joinall([
+                spawn(lambda user_id: [
+                    cast(Vote(user_id, request_id, upvote))
+                    for request_id in request_ids
+                ], user_id)
+                for user_id in user_ids
+            ], raise_error=True)
+
+        timings = measure(run, args.repeat)
+        report(label, timings,
+               votes_per_second=round(total / statistics.median(timings)))
+    print('VoteBuffer', buffer.stats())
+
+
+if __name__ == '__main__':
+    main()
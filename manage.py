@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+import argparse
+import logging
+import pathlib
+
+from nkzalimi.app import App
+from nkzalimi.maintenance import (check_current_business_entities,
+                                  check_vote_counts,
+                                  repair_current_business_entities,
+                                  repair_vote_counts)
+
+
+parser = argparse.ArgumentParser(
+    formatter_class=argparse.ArgumentDefaultsHelpFormatter
+)
+parser.add_argument('config', type=pathlib.Path)
+subparsers = parser.add_subparsers(dest='command')
+check_current_parser = subparsers.add_parser(
+    'check-current',
+    help='check current_business_entity against the latest revisions'
+)
+check_current_parser.add_argument(
+    '--repair', action='store_true', default=False,
+    help='rewrite missing and stale rows'
+)
+check_votes_parser = subparsers.add_parser(
+    'check-votes',
+    help='check the stored vote counts of requests against their polls'
+)
+check_votes_parser.add_argument(
+    '--repair', action='store_true', default=False,
+    help='recount the mismatching requests'
+)
+
+
+def check_current(app: App, args: argparse.Namespace) -> int:
+    logger = logging.getLogger('nkzalimi.check_current')
+    session = app.create_session()
+    try:
+        broken = []
+        for id, problem in check_current_business_entities(session):
+            logger.warning('%s: %s', id, problem)
+            broken.append(id)
+        logger.info('%d inconsistent entities', len(broken))
+        if broken and args.repair:
+            repair_current_business_entities(session, broken)
+            session.commit()
+            logger.info('%d entities repaired', len(broken))
+            return 0
+    finally:
+        session.close()
+    return 1 if broken else 0
+
+
+def check_votes(app: App, args: argparse.Namespace) -> int:
+    logger = logging.getLogger('nkzalimi.check_votes')
+    session = app.create_session()
+    try:
+        broken = []
+        for id, *counts in check_vote_counts(session):
+            logger.warning('%s: %d/%d scored %f stored, '
+                           '%d/%d scored %f polled', id, *counts)
+            broken.append(id)
+        logger.info('%d inconsistent requests', len(broken))
+        if broken and args.repair:
+            repair_vote_counts(session, broken)
+            session.commit()
+            logger.info('%d requests repaired', len(broken))
+            return 0
+    finally:
+        session.close()
+    return 1 if broken else 0
+
+
+commands = {
+    'check-current': check_current,
+    'check-votes': check_votes,
+}
+
+
+def main():
+    args = parser.parse_args()
+    logging.basicConfig(
+        format='%(levelname).1s | %(name)s | %(message)s',
+        level=logging.INFO
+    )
+    if not args.config.is_file():
+        parser.error('file not found: {!s}'.format(args.config))
+    if args.command is None:
+        parser.error('too few arguments')
+    app = App.from_path(args.config)
+    raise SystemExit(commands[args.command](app, args))
+
+
+if __name__ == '__main__':
+    main()
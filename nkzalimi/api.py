@@ -1,22 +1,41 @@
 import base64
+import datetime
 import functools
+import hashlib
+import json
+import math
 import typing
 import uuid
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
 from flask_login import current_user, login_required
-from geoalchemy2.functions import ST_Distance_Sphere
+from geoalchemy2.functions import ST_DWithin
+from sqlalchemy.orm import (aliased, joinedload, selectinload,
+                            with_polymorphic)
 from sqlalchemy.orm.exc import NoResultFound
-from sqlalchemy.sql.expression import or_
+from sqlalchemy.sql.expression import cast, literal_column, or_, tuple_
+from sqlalchemy.sql.functions import func
+from sqlalchemy.types import Float
 from sqlalchemy_utc import utcnow
 
-from .entities import (BlockUserRequest, BusinessEntity, BusinessEntityStatus,
-                       BusinessEntityRevision, CreationRequest,
-                       MarkAsDuplicateRequest, Poll, Request, RevisionKind,
-                       RevisionRequest)
-from .serializer import serialize
-from .util import latlng_to_point
-from .web import session
+from .autocomplete import Suggestion, SuggestionKind
+from .cluster import CELL_BITS, Cluster, cluster_cells
+from .entities import (BlockUserRequest, BusinessEntity,
+                       BusinessEntityRevision, BusinessEntityStatus,
+                       CreationRequest, CurrentBusinessEntity,
+                       MarkAsDuplicateRequest, Request, RequestKind,
+                       RevisionKind, RevisionRequest, User)
+from .mercator import MAX_LATITUDE, tile_bounds
+from .poll import Vote, cast_votes
+from .records import (EntityRecord, RevisionRecord, RevisionRequestRecord,
+                      UserRecord)
+from .serializer import dumps, serialize, serialize_many
+from .signals import entity_committed
+from .tiles import render_tile, tile_etag
+from .util import (LINESTRING_GEOGRAPHY, coordinate_geography,
+                   coordinate_geometry, latlng_to_geography, latlng_to_point,
+                   path_to_geometry)
+from .web import app, session
 
 
 bp = Blueprint('api', __name__, url_prefix='/api')
@@ -35,7 +54,15 @@ def error(type: str, message: str, status_code: int = 400):
 
 
 def success(**data):
-    return jsonify(result='success', data=data)
+    config = current_app.config
+    if current_app.debug or config['JSONIFY_PRETTYPRINT_REGULAR'] or \
+            not config['JSON_SORT_KEYS'] or not config['JSON_AS_ASCII']:
+        return jsonify(result='success', data=data)
+    # The same output as jsonify() gives with the defaults above, only
+    # through a faster encoder if one is available.
+    body = dumps({'result': 'success', 'data': data})
+    return current_app.response_class(body + '\n',
+                                      mimetype=config['JSONIFY_MIMETYPE'])
 
 
 def admin_required(f):
@@ -54,114 +81,617 @@ def get_user():
     return success(user=serialize(current_user))
 
 
+def encode_next(params: typing.Mapping[str, typing.Any]) -> str:
+    payload = json.dumps(params, separators=(',', ':'), sort_keys=True)
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_next(token: str) -> typing.Dict[str, typing.Any]:
+    try:
+        payload = base64.urlsafe_b64decode(token.encode('ascii'))
+        params = json.loads(payload.decode('utf-8'))
+    except (ValueError, UnicodeError):
+        raise ValueError(f'Invalid "next" token: {token!r}')
+    if not isinstance(params, dict):
+        raise ValueError(f'Invalid "next" token: {token!r}')
+    return params
+
+
+#: The largest k of nearest-k listings.
+MAX_NEAREST = 100
+
+VIEWPORT_PARAMS = ('min_latitude', 'min_longitude',
+                   'max_latitude', 'max_longitude')
+
+
+def get_listing_params(args) -> typing.Dict[str, typing.Any]:
+    params = {}
+    latitude = args.get('latitude')
+    longitude = args.get('longitude')
+    if latitude and longitude:
+        params['latitude'] = float(latitude)
+        params['longitude'] = float(longitude)
+        nearest = args.get('nearest')
+        if nearest:
+            # The k nearest at any distance, in place of a radius.
+            if args.get('keyword') or args.get('offset'):
+                raise ValueError('nearest excludes keyword and offset')
+            k = int(nearest)
+            if k < 1:
+                raise ValueError(f'invalid nearest: {k!r}')
+            params['nearest'] = min(k, MAX_NEAREST)
+        else:
+            radius = float(args.get('radius') or 5000.0)
+            if not (radius > 0 and math.isfinite(radius)):
+                raise ValueError(f'invalid radius: {radius!r}')
+            params['radius'] = min(radius, 100000.0)
+    elif args.get('nearest'):
+        raise ValueError('nearest needs latitude and longitude')
+    viewport = [args.get(k) for k in VIEWPORT_PARAMS]
+    if any(viewport):
+        if 'latitude' in params or not all(viewport):
+            raise ValueError('a viewport needs all of its bounds and '
+                             'excludes latitude/longitude')
+        for key, value in zip(VIEWPORT_PARAMS, viewport):
+            params[key] = float(value)
+    limit = args.get('limit')
+    params['limit'] = params.get('nearest') or (int(limit) if limit else 100)
+    status = args.get('status')
+    if status:
+        params['status'] = BusinessEntityStatus(status).value
+    keyword = args.get('keyword')
+    if keyword:
+        params['keyword'] = keyword
+    offset = args.get('offset')
+    if offset:
+        # Deprecated offset paging; kept for clients which still send it.
+        params['offset'] = int(offset)
+    return params
+
+
+def viewport_filter(min_latitude: float, min_longitude: float,
+                    max_latitude: float, max_longitude: float):
+    """Filter the entities in a viewport with ``&&`` on the GiST index
+    of coordinate, whose x is the latitude.  A viewport crossing the
+    antimeridian has ``min_longitude > max_longitude``.
+
+    """
+    coordinate = CurrentBusinessEntity.coordinate
+    if min_longitude > max_longitude:
+        return or_(
+            coordinate.intersects(func.ST_MakeEnvelope(
+                min_latitude, min_longitude, max_latitude, 180.0
+            )),
+            coordinate.intersects(func.ST_MakeEnvelope(
+                min_latitude, -180.0, max_latitude, max_longitude
+            ))
+        )
+    return coordinate.intersects(func.ST_MakeEnvelope(
+        min_latitude, min_longitude, max_latitude, max_longitude
+    ))
+
+
+def query_business_entities(
+    origin, radius: typing.Optional[float],
+    viewport: typing.Optional[typing.Tuple[float, float, float, float]],
+    status: typing.Optional[BusinessEntityStatus],
+    keyword: typing.Optional[str], offset: int,
+    after: typing.Optional[typing.Tuple[typing.Any, uuid.UUID]], limit: int
+) -> typing.List[typing.Tuple[EntityRecord, typing.Any]]:
+    """Query the listing from the database.  Returns pairs of a record
+    and its sort key, i.e. either its distance from ``origin`` or its
+    creation time.  Without ``radius``, entities around ``origin`` are
+    listed at any distance.
+
+    """
+    if origin is not None:
+        # ST_DWithin() and the KNN operator <-> both go through the GiST
+        # index on the geography expression; distances are spherical.
+        geography = coordinate_geography(CurrentBusinessEntity.coordinate)
+        distance = geography.op('<->', return_type=Float)(origin)
+        q = EntityRecord.query(session, distance) \
+            .order_by(distance, CurrentBusinessEntity.id)
+        if radius is not None:
+            q = q.filter(ST_DWithin(geography, origin, radius, False))
+        if after is not None:
+            q = q.filter(tuple_(distance, CurrentBusinessEntity.id) > after)
+    else:
+        q = EntityRecord.query(session) \
+            .order_by(CurrentBusinessEntity.created_at.desc(),
+                      CurrentBusinessEntity.id.desc())
+        if after is not None:
+            q = q.filter(
+                tuple_(CurrentBusinessEntity.created_at,
+                       CurrentBusinessEntity.id) < after
+            )
+        if viewport is not None:
+            q = q.filter(viewport_filter(*viewport))
+    if status:
+        q = q.filter(CurrentBusinessEntity.status == status)
+    if keyword:
+        clause = f'%{keyword}%'
+        q = q.filter(or_(
+            CurrentBusinessEntity.name.like(clause),
+            CurrentBusinessEntity.address.like(clause),
+            CurrentBusinessEntity.address_sub.like(clause)))
+    if offset:
+        q = q.offset(offset)
+    if origin is None:
+        records = (EntityRecord(*row) for row in q.limit(limit))
+        return [(record, record.created_at) for record in records]
+    return EntityRecord.with_columns(q.limit(limit))
+
+
 @bp.route('/business_entities/')
 def get_business_entities():
     next = request.args.get('next')
-    if next:
-        try:
-            lat, lng, radius, offset, limit, status, keyword = \
-                base64.b64decode(next).decode('utf-8').split('|', 5)
-        except ValueError:
-            return error(
-                'invalid_arg_format', f'Invalid "next" parameter.', 400
-            )
-        if lat and lng:
-            coordinate = latlng_to_point(latitude, longitude)
-            radius = float(radius)
+    cache = app.listing_cache
+    try:
+        if next:
+            params = decode_next(next)
         else:
-            coordinate = None
-        limit = int(limit)
-        if not keyword:
-            keyword = None
-        if status:
-            status = BusinessEntityStatus(status)
+            params = get_listing_params(request.args)
+            if cache is not None and 'latitude' in params:
+                # Nearby clients share the cached response of the tile
+                # they're in; cursors carry the snapped center along.
+                params['latitude'], params['longitude'] = cache.snap(
+                    params['latitude'], params['longitude']
+                )
+        if 'latitude' in params:
+            latitude = float(params['latitude'])
+            longitude = float(params['longitude'])
+            origin = latlng_to_geography(latitude, longitude)
+            nearest = params.get('nearest')
+            radius = None if nearest else float(params['radius'])
+            # "next" tokens come from clients too.
+            if radius is not None and \
+                    not (radius > 0 and math.isfinite(radius)):
+                raise ValueError(f'invalid radius: {radius!r}')
         else:
-            status = None
-        offset = int(offset)
-    else:
-        latitude = request.args.get('latitude')
-        longitude = request.args.get('longitude')
-        if latitude and longitude:
-            coordinate = latlng_to_point(latitude, longitude)
-            radius = request.args.get('radius')
-            if radius:
-                radius = float(radius)
-                if radius > 100000.0:
-                    radius = 100000.0
-            else:
-                radius = 5000.0
+            origin = radius = nearest = None
+        if VIEWPORT_PARAMS[0] in params:
+            viewport = tuple(float(params[k]) for k in VIEWPORT_PARAMS)
+            if not (-90.0 <= viewport[0] <= viewport[2] <= 90.0 and
+                    -180.0 <= viewport[1] <= 180.0 and
+                    -180.0 <= viewport[3] <= 180.0):
+                raise ValueError(f'invalid viewport: {viewport!r}')
         else:
-            coordinate = None
-        limit = request.args.get('limit')
-        if limit:
-            limit = int(limit)
+            viewport = None
+        limit = int(params['limit'])
+        if limit <= 0:
+            raise ValueError(f'invalid limit: {limit!r}')
+        status = params.get('status')
+        status = status and BusinessEntityStatus(status)
+        keyword = params.get('keyword')
+        offset = int(params.get('offset') or 0)
+        ranked = bool(keyword) and origin is None and viewport is None and \
+            app.search_index is not None
+        after = params.get('after')
+        if after is not None:
+            after_key, after_id = after
+            if origin is not None or ranked:
+                after_key = float(after_key)
+            else:
+                after_key = datetime.datetime.fromisoformat(after_key)
+            after = after_key, uuid.UUID(after_id)
+    except (KeyError, TypeError, ValueError):
+        return error('invalid_arg_format', 'Invalid listing parameters.', 400)
+    if cache is not None:
+        cache_key = encode_next(params)
+        body = cache.get(cache_key)
+        if body is not None:
+            return current_app.response_class(body,
+                                              mimetype='application/json')
+        # Read before querying, so that the response isn't stored if it's
+        # invalidated while it's being built.
+        generation = cache.generation()
+    search_index = app.search_index
+    spatial_index = app.spatial_index
+    if nearest:
+        if spatial_index is not None:
+            rows = spatial_index.nearest(latitude, longitude, limit,
+                                         status=status)
         else:
-            limit = 100
-        offset = request.args.get('offset')
+            rows = query_business_entities(origin, None, None, status, None,
+                                           0, None, limit)
+    elif keyword and search_index is not None and viewport is None and \
+            not offset:
+        # Without a location results come ranked by relevance, and the
+        # cursor carries the score instead of the creation time.
+        rows = search_index.search(
+            keyword, status=status,
+            near=None if origin is None else (latitude, longitude, radius),
+            after=after, limit=limit + 1
+        )
+    elif origin is not None and spatial_index is not None and \
+            not keyword and not offset:
+        rows = spatial_index.nearby(
+            latitude, longitude, radius,
+            status=status, after=after, limit=limit + 1
+        )
+    else:
+        rows = query_business_entities(
+            origin, radius, viewport, status, keyword, offset, after,
+            limit + 1
+        )
+    if not nearest and len(rows) > limit:
+        rows = rows[:limit]
         if offset:
-            offset = int(offset)
+            params = {**params, 'offset': offset + limit}
         else:
-            offset = 0
-        status = request.args.get('status')
-        if status:
-            status = BusinessEntityStatus(status)
-        keyword = request.args.get('keyword')
-    q = session.query(BusinessEntity).join(BusinessEntity.latest_revision)
-    if coordinate:
-        q = q.filter(
-            ST_Distance_Sphere(
-                BusinessEntityRevision.coordinate, coordinate
-            ) < radius
-        ).order_by(
-            ST_Distance_Sphere(
-                BusinessEntityRevision.coordinate, coordinate
-            )
-        )
+            last, key = rows[-1]
+            if isinstance(key, datetime.datetime):
+                key = key.isoformat()
+            params = {**params, 'after': [key, str(last.id)]}
+        next = encode_next(params)
     else:
-        q = q.order_by(BusinessEntity.created_at.desc())
+        next = None
+    response = success(
+        business_entities=serialize_many([be for be, _ in rows]), next=next
+    )
+    if cache is not None:
+        if nearest:
+            # Only entities closer than the farthest one listed can change
+            # the k nearest, unless there were fewer than k at all.
+            radius = rows[-1][1] if len(rows) >= limit else None
+        cache.set(cache_key, response.get_data(), cache.tags_for(
+            None if origin is None or radius is None
+            else (latitude, longitude, radius)
+        ), generation)
+    return response
+
+
+#: The widest corridor along a path, in meters.
+MAX_CORRIDOR_WIDTH = 20000.0
+
+#: The most points a corridor path may have.
+MAX_PATH_POINTS = 1000
+
+
+def query_corridor(
+    path: typing.Sequence[typing.Tuple[float, float]], width: float,
+    status: typing.Optional[BusinessEntityStatus],
+    after: typing.Optional[typing.Tuple[float, uuid.UUID]], limit: int
+) -> typing.List[typing.Tuple[EntityRecord, float]]:
+    """Query the entities within ``width / 2`` meters of ``path``, in
+    the order they come along it.  Returns pairs of a record and its
+    position on the path, from 0 to 1.
+
+    """
+    route = path_to_geometry(path)
+    position = func.ST_LineLocatePoint(
+        route, coordinate_geometry(CurrentBusinessEntity.coordinate),
+        type_=Float
+    )
+    q = EntityRecord.query(session, position).filter(
+        # Goes through the GiST index on the geography expression.
+        ST_DWithin(coordinate_geography(CurrentBusinessEntity.coordinate),
+                   cast(route, LINESTRING_GEOGRAPHY), width / 2, False)
+    ).order_by(position, CurrentBusinessEntity.id)
     if status:
-        q = q.filter(BusinessEntityRevision.status == status)
-    if keyword:
-        clause = f'%{keyword}%'
-        q = q.filter(or_(
-            BusinessEntityRevision.name.like(clause),
-            BusinessEntityRevision.address.like(clause),
-            BusinessEntityRevision.address_sub.like(clause)))
-    q = q.limit(limit + 1).offset(offset)
-    result = q.all()
-    if len(result) == limit + 1:
-        next_offset = offset + limit
-        payload = '{}|{}|{}|{}|{}|{}|{}'.format(
-            lat if lat else '',
-            lng if lng else '',
-            radius if radius else '',
-            offset,
-            limit,
-            status.value if status else '',
-            keyword if keyword else ''
-        )
-        next = base64.b64encode(payload.encode('utf-8'))
-        result = result[:limit]
+        q = q.filter(CurrentBusinessEntity.status == status)
+    if after is not None:
+        q = q.filter(tuple_(position, CurrentBusinessEntity.id) > after)
+    return EntityRecord.with_columns(q.limit(limit))
+
+
+def path_digest(path: typing.Sequence[typing.Tuple[float, float]]) -> str:
+    payload = json.dumps(path, separators=(',', ':'))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+@bp.route('/business_entities/corridor/', methods=['POST'])
+def post_corridor():
+    """List the entities along a path, e.g. a route to drive.  The body
+    has ``path``, a list of ``[lat, lng]``, and ``width`` of the corridor
+    in meters.  To get the next page, send the same ``path`` again with
+    the ``next`` token of the previous page.
+
+    """
+    data = request.json
+    try:
+        path = []
+        for lat, lng in data['path']:
+            point = float(lat), float(lng)
+            if not path or path[-1] != point:
+                path.append(point)
+        if not 2 <= len(path) <= MAX_PATH_POINTS:
+            raise ValueError(f'a path needs 2 to {MAX_PATH_POINTS} points')
+        digest = path_digest(path)
+        next = data.get('next')
+        if next:
+            params = decode_next(next)
+            if params.get('path') != digest:
+                raise ValueError('"next" token is for another path')
+        else:
+            width = data.get('width')
+            limit = data.get('limit')
+            params = {
+                'path': digest,
+                'width': min(float(width), MAX_CORRIDOR_WIDTH)
+                if width else 1000.0,
+                'limit': int(limit) if limit else 100,
+            }
+            if data.get('status'):
+                params['status'] = BusinessEntityStatus(data['status']).value
+        width = float(params['width'])
+        limit = int(params['limit'])
+        status = params.get('status')
+        status = status and BusinessEntityStatus(status)
+        after = params.get('after')
+        if after is not None:
+            after_position, after_id = after
+            after = float(after_position), uuid.UUID(after_id)
+    except (KeyError, TypeError, ValueError):
+        return error('invalid_arg_format', 'Invalid corridor parameters.',
+                     400)
+    rows = query_corridor(path, width, status, after, limit + 1)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last, position = rows[-1]
+        next = encode_next({**params, 'after': [position, str(last.id)]})
     else:
         next = None
-    return success(business_entities=[serialize(i) for i in result],
+    return success(business_entities=serialize_many([be for be, _ in rows]),
                    next=next)
-        
+
+
+@bp.route('/autocomplete/')
+def get_autocomplete():
+    prefix = request.args.get('q', '')
+    try:
+        limit = min(int(request.args.get('limit') or 10), 50)
+        latitude = request.args.get('latitude')
+        longitude = request.args.get('longitude')
+        if latitude and longitude:
+            near = float(latitude), float(longitude)
+        else:
+            near = None
+    except ValueError:
+        return error('invalid_arg_format', 'Invalid autocomplete parameters.',
+                     400)
+    index = app.autocomplete_index
+    if index is not None:
+        suggestions = index.complete(prefix, limit, near)
+    elif prefix:
+        # Slow path for when the index is turned off: names only, and
+        # without any location bias.
+        name = CurrentBusinessEntity.name
+        rows = session.query(CurrentBusinessEntity.id, name) \
+            .filter(name.startswith(prefix, autoescape=True)) \
+            .order_by(func.length(name), name) \
+            .limit(limit)
+        suggestions = [
+            Suggestion(name, SuggestionKind.name, id, 0.0)
+            for id, name in rows
+        ]
+    else:
+        suggestions = []
+    return success(suggestions=serialize_many(suggestions))
+
+
+def query_clusters(
+    south: float, west: float, north: float, east: float, zoom: int,
+    status: typing.Optional[BusinessEntityStatus]
+) -> typing.List[Cluster]:
+    """Compute clusters with a ``GROUP BY`` over Web Mercator cells;
+    the same as :meth:`~.cluster.ClusterIndex.clusters()`.
+
+    """
+    n = 2 ** (zoom + CELL_BITS)
+    latitude = CurrentBusinessEntity.latitude
+    longitude = CurrentBusinessEntity.longitude
+    sin_lat = func.sin(func.radians(
+        func.greatest(-MAX_LATITUDE, func.least(MAX_LATITUDE, latitude))
+    ))
+    x = func.greatest(0, func.least(
+        func.floor((longitude + 180.0) / 360.0 * n), n - 1
+    ))
+    y = func.greatest(0, func.least(
+        func.floor(
+            (0.5 - func.ln((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) *
+            n
+        ),
+        n - 1
+    ))
+    # Filter by the envelopes of whole cells, so that the GiST index on
+    # coordinate (whose x is the latitude) applies and edge cells come out
+    # the same as from the index.
+    x_ranges, (y_lo, y_hi) = cluster_cells(zoom, south, west, north, east)
+    envelopes = []
+    for x_lo, x_hi in x_ranges:
+        _, left, top, _ = tile_bounds(zoom + CELL_BITS, x_lo, y_lo)
+        bottom, _, _, right = tile_bounds(zoom + CELL_BITS, x_hi, y_hi)
+        # The outermost rows also hold what's beyond Mercator's limits.
+        if y_lo == 0:
+            top = 90.0
+        if y_hi == n - 1:
+            bottom = -90.0
+        envelopes.append(CurrentBusinessEntity.coordinate.intersects(
+            func.ST_MakeEnvelope(bottom, left, top, right)
+        ))
+    x = x.label('x')
+    y = y.label('y')
+    q = session.query(x, y, CurrentBusinessEntity.status, func.count(),
+                      func.sum(latitude), func.sum(longitude)) \
+        .filter(or_(*envelopes)) \
+        .group_by(x, y, CurrentBusinessEntity.status)
+    if status:
+        q = q.filter(CurrentBusinessEntity.status == status)
+    cells = {}
+    for x, y, s, count, lat_sum, lng_sum in q.all():
+        cells.setdefault((int(x), int(y)), {})[s] = [count, lat_sum, lng_sum]
+    return [Cluster.from_buckets(cells[key]) for key in sorted(cells)]
+
+
+@bp.route('/clusters/')
+def get_clusters():
+    try:
+        south = float(request.args['south'])
+        west = float(request.args['west'])
+        north = float(request.args['north'])
+        east = float(request.args['east'])
+        zoom = int(request.args['zoom'])
+        status = request.args.get('status')
+        status = status and BusinessEntityStatus(status)
+        if not (-90.0 <= south <= north <= 90.0 and
+                -180.0 <= west <= 180.0 and -180.0 <= east <= 180.0 and
+                zoom >= 0):
+            raise ValueError('out of range')
+    except (KeyError, ValueError):
+        return error('invalid_arg_format', 'Invalid cluster parameters.', 400)
+    zoom = min(zoom, app.cluster_max_zoom)
+    index = app.cluster_index
+    if index is not None:
+        clusters = index.clusters(south, west, north, east, zoom,
+                                  status=status)
+    else:
+        clusters = query_clusters(south, west, north, east, zoom, status)
+    return success(zoom=zoom, clusters=serialize_many(clusters))
+
+
+@bp.route('/tiles/<int:z>/<int:x>/<int:y>.mvt')
+def get_tile(z: int, x: int, y: int):
+    if not (app.tiles_min_zoom <= z <= app.tiles_max_zoom and
+            x < 2 ** z and y < 2 ** z):
+        return error('object_not_found', f'Tile {z}/{x}/{y} not found', 404)
+    cache = app.tile_cache
+    if cache is None:
+        data = render_tile(session, z, x, y)
+    else:
+        data = cache.get(z, x, y)
+        if data is None:
+            # Read before rendering, so that the tile isn't stored if it's
+            # invalidated while it renders.
+            generation = cache.generation(z, x, y)
+            data = render_tile(session, z, x, y)
+            cache.set(z, x, y, data, generation)
+    response = current_app.response_class(
+        data, mimetype='application/vnd.mapbox-vector-tile'
+    )
+    response.set_etag(tile_etag(data))
+    # Let clients revalidate every time, so invalidations show up at once.
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
 
 @bp.route('/business_entity/<uuid:entity_id>/')
 def get_business_entity(entity_id: uuid.UUID):
-    be = session.query(BusinessEntity).get(entity_id)
-    if not be:
+    row = EntityRecord.query(session) \
+        .filter(CurrentBusinessEntity.id == entity_id) \
+        .one_or_none()
+    if row is None:
         return error('object_not_found', f'Entity "{entity_id}" not found',
                      404)
-    requests = session.query(RevisionRequest).filter(
-        RevisionRequest.business_entity == be,
-        ~RevisionRequest.committed
+    requests = RevisionRequestRecord.load(
+        session,
+        RevisionRequestRecord.query(session).filter(
+            RevisionRequest.business_entity_id == entity_id,
+            ~RevisionRequest.committed
+        )
     )
-    return success(entity=serialize(be),
-                   requests=[serialize(i) for i in requests])
+    return success(entity=serialize(EntityRecord(*row)),
+                   requests=[serialize(r) for r in requests])
     
 
+#: The most revisions in a page of a history.
+MAX_HISTORY_PAGE = 500
+
+
+def query_history(entity_id: uuid.UUID, start: typing.Optional[uuid.UUID],
+                  limit: int) -> typing.List[RevisionRecord]:
+    """Query up to ``limit`` revisions of a business entity, newest first,
+    from ``start`` or its latest revision.  The chain is followed through
+    ``replacing_id`` in a single recursive query, which stops after
+    ``limit`` revisions however long the rest of the chain is.
+
+    ``start`` has to be a revision of the entity, made by its creation
+    request or by a request on it; otherwise nothing is found.
+
+    """
+    entity = session.query(BusinessEntity) \
+        .filter(BusinessEntity.id == entity_id)
+    first = entity.with_entities(BusinessEntity.first_revision_id) \
+        .as_scalar()
+    if start is None:
+        anchor = BusinessEntityRevision.id == entity.with_entities(
+            BusinessEntity.latest_revision_id
+        ).as_scalar()
+    else:
+        requests = session.query(RevisionRequest.id).filter(
+            RevisionRequest.business_entity_id == entity_id
+        ).union_all(session.query(MarkAsDuplicateRequest.id).filter(
+            MarkAsDuplicateRequest.business_entity_id == entity_id
+        ))
+        anchor = (BusinessEntityRevision.id == start) & or_(
+            BusinessEntityRevision.id == first,
+            BusinessEntityRevision.request_id.in_(requests)
+        )
+    chain = session.query(
+        BusinessEntityRevision.id, BusinessEntityRevision.replacing_id,
+        literal_column('1').label('depth')
+    ).filter(anchor).cte('chain', recursive=True)
+    previous = aliased(chain, name='previous')
+    revision = aliased(BusinessEntityRevision, name='revision')
+    # Nothing before the first revision of the entity belongs to it.
+    chain = chain.union_all(
+        session.query(revision.id, revision.replacing_id,
+                      previous.c.depth + 1)
+        .filter(revision.id == previous.c.replacing_id,
+                previous.c.id != first,
+                previous.c.depth < limit)
+    )
+    rows = RevisionRecord.query(session) \
+        .join(chain, chain.c.id == BusinessEntityRevision.id) \
+        .order_by(chain.c.depth)
+    return [RevisionRecord(*row) for row in rows]
+
+
+@bp.route('/business_entity/<uuid:entity_id>/history/')
+def get_business_entity_history(entity_id: uuid.UUID):
+    next = request.args.get('next')
+    try:
+        if next:
+            params = decode_next(next)
+            if params['entity'] != str(entity_id):
+                raise ValueError(f'"next" token of another entity: {next!r}')
+        else:
+            limit = request.args.get('limit')
+            params = {
+                'entity': str(entity_id),
+                'limit': min(int(limit), MAX_HISTORY_PAGE) if limit else 100,
+            }
+        limit = int(params['limit'])
+        if not 0 < limit <= MAX_HISTORY_PAGE:
+            raise ValueError(f'invalid limit: {limit!r}')
+        start = params.get('start')
+        start = start and uuid.UUID(start)
+    except (KeyError, TypeError, ValueError):
+        return error('invalid_arg_format', 'Invalid history parameters.', 400)
+    cache = app.history_cache
+    if cache is not None:
+        body = cache.get(entity_id, start, limit)
+        if body is not None:
+            return current_app.response_class(body,
+                                              mimetype='application/json')
+    revisions = query_history(entity_id, start, limit)
+    if not revisions and start is not None:
+        return error('invalid_arg_format',
+                     f'"next" token of another entity: {next!r}', 400)
+    elif not revisions:
+        return error('object_not_found', f'Entity "{entity_id}" not found',
+                     404)
+    last = revisions[-1]
+    if len(revisions) >= limit and last.replacing_id is not None:
+        next = encode_next({**params, 'start': str(last.replacing_id)})
+    else:
+        next = None
+    response = success(revisions=serialize_many(revisions), next=next)
+    if cache is not None:
+        cache.set(entity_id, start, limit, response.get_data())
+    return response
+
+
 @bp.route('/request/creation/', methods=['PUT'])
 @login_required
 def put_creation_request():
@@ -226,9 +756,121 @@ def put_revision_request():
     return success(request=serialize(req))
 
 
+def load_request(request_id: uuid.UUID) -> typing.Optional[Request]:
+    """Load a request along with what :func:`serialize()` of it needs:
+    the columns of its kind, the submitter, and the submitter's OAuth
+    logins, in two queries.
+
+    """
+    requests = with_polymorphic(Request, '*')
+    return session.query(requests) \
+        .options(
+            joinedload(requests.submitted_by).selectinload(User.oauth_logins)
+        ) \
+        .filter(requests.id == request_id) \
+        .one_or_none()
+
+
+#: How the moderation queue can be ordered: the highest score first, the
+#: oldest first, or the oldest first within each kind.
+QUEUE_ORDERS = ('score', 'age', 'kind')
+
+
+def query_pending_requests(
+    order: str, kind: typing.Optional[RequestKind],
+    after: typing.Optional[typing.Sequence[typing.Any]], limit: int
+) -> typing.List[Request]:
+    """Query uncommitted requests of every kind for the moderation
+    queue, loaded like :func:`load_request()` does.  ``after`` is the
+    :func:`queue_key()` of the last request of the previous page.
+
+    """
+    requests = with_polymorphic(Request, '*')
+    if order == 'score':
+        key = tuple_(requests.score, requests.id)
+        ordering = requests.score.desc(), requests.id.desc()
+    elif order == 'age':
+        key = tuple_(requests.created_at, requests.id)
+        ordering = requests.created_at, requests.id
+    else:
+        key = tuple_(requests.kind, requests.created_at, requests.id)
+        ordering = requests.kind, requests.created_at, requests.id
+    # Every condition matches one of the ix_request_pending_* partial
+    # indices, so pages are read off an index in order.
+    q = session.query(requests) \
+        .options(
+            joinedload(requests.submitted_by).selectinload(User.oauth_logins)
+        ) \
+        .filter(requests.committed_at.is_(None)) \
+        .order_by(*ordering)
+    if kind is not None:
+        q = q.filter(requests.kind == kind)
+    if after is not None:
+        q = q.filter(key < tuple(after) if order == 'score'
+                     else key > tuple(after))
+    return q.limit(limit).all()
+
+
+def queue_key(order: str, req: Request) -> typing.List[typing.Any]:
+    if order == 'score':
+        return [req.score, str(req.id)]
+    elif order == 'age':
+        return [req.created_at.isoformat(), str(req.id)]
+    return [req.kind.value, req.created_at.isoformat(), str(req.id)]
+
+
+def parse_queue_key(
+    order: str, key: typing.Sequence[typing.Any]
+) -> typing.List[typing.Any]:
+    *key, id = key
+    if order == 'score':
+        score, = key
+        return [float(score), uuid.UUID(id)]
+    elif order == 'age':
+        created_at, = key
+        return [datetime.datetime.fromisoformat(created_at), uuid.UUID(id)]
+    kind, created_at = key
+    return [RequestKind(kind), datetime.datetime.fromisoformat(created_at),
+            uuid.UUID(id)]
+
+
+@bp.route('/requests/queue/')
+@admin_required
+def get_request_queue():
+    next = request.args.get('next')
+    try:
+        if next:
+            params = decode_next(next)
+        else:
+            params = {
+                'order': request.args.get('order', 'score'),
+                'limit': int(request.args.get('limit', 100)),
+            }
+            if request.args.get('kind'):
+                params['kind'] = RequestKind(request.args['kind']).value
+        order = params['order']
+        if order not in QUEUE_ORDERS:
+            raise ValueError(f'invalid order: {order!r}')
+        limit = int(params['limit'])
+        kind = params.get('kind')
+        kind = kind and RequestKind(kind)
+        after = params.get('after')
+        after = after and parse_queue_key(order, after)
+    except (KeyError, TypeError, ValueError):
+        return error('invalid_arg_format', 'Invalid queue parameters.', 400)
+    requests = query_pending_requests(order, kind, after, limit + 1)
+    if len(requests) > limit:
+        requests = requests[:limit]
+        next = encode_next({**params,
+                            'after': queue_key(order, requests[-1])})
+    else:
+        next = None
+    return success(requests=[serialize(r) for r in requests], next=next)
+
+
 @bp.route('/requests/<uuid:request_id>/', methods=['GET'])
 def get_request(request_id: uuid.UUID):
-    req = session.query(Request).get(request_id)
+    req = load_request(request_id)
     if not req:
         return error('object_not_found', f'Request "{request_id}" not found',
                      404)
@@ -253,8 +895,8 @@ def delete_request(request_id: uuid.UUID):
 @bp.route('/requests/<uuid:request_id>/poll/', methods=['POST'])
 def poll_request(request_id: uuid.UUID):
     data = request.json
-    upvote = data['upvote']
-    req = session.query(Request).get(request_id)
+    upvote = bool(data['upvote'])
+    req = load_request(request_id)
     if not req:
         return error('object_not_found', f'Request "{request_id}" not found',
                      404)
@@ -262,22 +904,69 @@ def poll_request(request_id: uuid.UUID):
         return error('request_already_committed',
                      f'Request "{request_id}" has been already committed.',
                      400)
-    poll = session.query(Poll).filter_by(
-        request=req, user=current_user
-    ).one_or_none()
-    if poll:
-        poll.upvote = upvote
+    if app.vote_buffer is None:
+        cast_votes(session, [Vote(current_user.id, req.id, upvote)])
+        session.commit()
     else:
-        poll = Poll(request=req, user=current_user, upvote=upvote)
-        session.add(poll)
-    session.commit()
+        app.vote_buffer.cast(current_user.id, req.id, upvote)
+        session.expire(req, ['upvotes', 'downvotes'])
     return success(request=serialize(req))
 
 
+def observe_entity(
+    entity: BusinessEntity
+) -> typing.Optional[EntityRecord]:
+    """Snapshot ``entity`` for :data:`~.signals.entity_committed`, unless
+    nothing listens to it.
+
+    """
+    if entity_committed.has_receivers_for(app._get_current_object()):
+        return EntityRecord.from_entity(entity)
+
+
+def notify_entity_committed(entity: BusinessEntity,
+                            previous: typing.Optional[EntityRecord]) -> None:
+    sender = app._get_current_object()
+    if entity_committed.has_receivers_for(sender):
+        entity_committed.send(sender, record=EntityRecord.from_entity(entity),
+                              previous=previous)
+
+
+def apply_request(
+    req: Request
+) -> typing.Tuple[typing.Union[BusinessEntity, User],
+                  typing.Optional[EntityRecord]]:
+    """Apply a pending ``req`` and mark it committed, without committing
+    the session.  Returns the business entity or the user it changed,
+    and what :func:`observe_entity()` saw of the entity beforehand.
+
+    """
+    if isinstance(req, CreationRequest):
+        changed = req.create()
+        previous = None
+        session.add(changed)
+    elif isinstance(req, MarkAsDuplicateRequest):
+        changed = req.business_entity
+        previous = observe_entity(changed)
+        session.add(req.mark_as_duplicate())
+    elif isinstance(req, RevisionRequest):
+        changed = req.business_entity
+        previous = observe_entity(changed)
+        session.add(req.revise())
+    elif isinstance(req, BlockUserRequest):
+        req.block()
+        changed = req.blocking_user
+        previous = None
+    else:
+        raise ValueError(f'Request {req} is not a valid request.')
+    req.committed_at = utcnow()
+    return changed, previous
+
+
 @bp.route('/requests/<uuid:request_id>/commit/', methods=['POST'])
 @admin_required
 def commit_request(request_id: uuid.UUID):
-    req = session.query(Request).get(request_id)
+    req = load_request(request_id)
     if not req:
         return error('object_not_found', f'Request "{request_id}" not found',
                      404)
@@ -285,30 +974,159 @@ def commit_request(request_id: uuid.UUID):
         return error('request_already_committed',
                      f'Request "{request_id}" has been already committed.',
                      400)
-    if isinstance(req, CreationRequest):
-        be = req.create()
-        req.committed_at = utcnow()
-        session.add(be)
-        session.commit()
-        return success(business_entity=serialize(be))
-    elif isinstance(req, MarkAsDuplicateRequest):
-        ber = req.mark_as_duplicate()
-        req.committed_at = utcnow()
-        session.add(ber)
-        session.commit()
-        return success(business_entity=serialize(req.business_entity))
-    elif isinstance(req, RevisionRequest):
-        ber = req.revise()
-        req.committed_at = utcnow()
-        session.add(ber)
-        session.commit()
-        return success(business_entity=serialize(ber.business_entity))
-    elif isinstance(req, BlockUserRequest):
-        req.block()
-        req.committed_at = utcnow()
+    try:
+        changed, previous = apply_request(req)
+    except ValueError as e:
+        return error('invalid_request', str(e), 400)
+    session.commit()
+    if isinstance(changed, User):
+        return success(user=serialize(changed))
+    notify_entity_committed(changed, previous)
+    return success(business_entity=serialize(changed))
+
+
+#: The most requests a bulk commit takes.
+MAX_BULK_COMMIT = 1000
+
+#: How many requests of a bulk commit are committed in each transaction.
+BULK_COMMIT_CHUNK = 100
+
+
+def load_requests_to_commit(
+    ids: typing.Collection[uuid.UUID]
+) -> typing.Dict[uuid.UUID, Request]:
+    """Load requests along with what :func:`apply_request()` needs: the
+    columns of their kind, the business entities they change with their
+    latest revisions and current states, and the users they block.  It
+    takes the same few queries however many requests there are.
+
+    """
+    requests = with_polymorphic(Request, '*')
+    q = session.query(requests).options(
+        selectinload(requests.RevisionRequest.business_entity)
+        .joinedload(BusinessEntity.current),
+        selectinload(requests.MarkAsDuplicateRequest.business_entity)
+        .joinedload(BusinessEntity.current),
+        selectinload(requests.BlockUserRequest.blocking_user),
+    ).filter(requests.id.in_(ids))
+    return {req.id: req for req in q}
+
+
+def commit_chunk(
+    ids: typing.Sequence[uuid.UUID]
+) -> typing.List[typing.Mapping[str, typing.Any]]:
+    """Commit the requests of ``ids`` in order, in a single transaction.
+    Several of them may change the same business entity; each applies on
+    top of the previous one.  A request which fails to apply is left out
+    without affecting the others.  Returns the result of each request.
+
+    """
+    def failure(id: uuid.UUID, type: str, message: str):
+        return {'request_id': str(id), 'result': 'error',
+                'error': {'type': type, 'message': message}}
+    requests = load_requests_to_commit(ids)
+    results = [None] * len(ids)
+    applied = []
+    # The state of each changed entity before the first request on it.
+    entities = {}
+    for i, id in enumerate(ids):
+        req = requests.get(id)
+        if req is None:
+            results[i] = failure(id, 'object_not_found',
+                                 f'Request "{id}" not found')
+            continue
+        elif req.committed:
+            results[i] = failure(
+                id, 'request_already_committed',
+                f'Request "{id}" has been already committed.'
+            )
+            continue
+        # Each request goes in a savepoint of its own, so that one which
+        # fails halfway leaves nothing behind for the others to commit.
+        savepoint = session.begin_nested()
+        try:
+            changed, previous = apply_request(req)
+            savepoint.commit()
+        except Exception as e:
+            savepoint.rollback()
+            if isinstance(e, ValueError):
+                results[i] = failure(id, 'invalid_request', str(e))
+            else:
+                current_app.logger.exception('Failed to apply request %s',
+                                             id)
+                results[i] = failure(id, 'commit_failed',
+                                     f'Request "{id}" failed to be applied.')
+            continue
+        applied.append((i, changed))
+        if isinstance(changed, BusinessEntity):
+            entities.setdefault(changed, previous)
+    try:
+        # Flush first to read the ids of new entities, as every attribute
+        # expires on commit.
+        session.flush()
+        applied = [(i, changed, changed.id) for i, changed in applied]
+        entity_ids = [entity.id for entity in entities]
         session.commit()
-        return success(user=serialize(req.blocking_user))
-    else:
-        return error(
-            'invalid_request', f'Request {req} is not a valid request.', 400
-        )
+    except Exception:
+        session.rollback()
+        current_app.logger.exception('Failed to commit requests')
+        for i, *_ in applied:
+            results[i] = failure(
+                ids[i], 'commit_failed',
+                f'Request "{ids[i]}" failed to be committed.'
+            )
+        return results
+    records = {}
+    if entity_ids:
+        rows = EntityRecord.query(session) \
+            .filter(CurrentBusinessEntity.id.in_(entity_ids))
+        for row in rows:
+            records[row[0]] = EntityRecord(*row)
+    users = UserRecord.load(session, (
+        changed_id for _, changed, changed_id in applied
+        if isinstance(changed, User)
+    ))
+    for i, changed, changed_id in applied:
+        if isinstance(changed, User):
+            result = {'user': serialize(users[changed_id])}
+        else:
+            result = {'business_entity': serialize(records[changed_id])}
+        results[i] = {'request_id': str(ids[i]), 'result': 'success',
+                      **result}
+    sender = app._get_current_object()
+    if entity_committed.has_receivers_for(sender):
+        for entity_id, previous in zip(entity_ids, entities.values()):
+            entity_committed.send(sender, record=records[entity_id],
+                                  previous=previous)
+    return results
+
+
+@bp.route('/requests/commit/', methods=['POST'])
+@admin_required
+def commit_requests():
+    try:
+        ids = [uuid.UUID(id) for id in request.json['request_ids']]
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return error('invalid_arg_format', 'Invalid request ids.', 400)
+    if len(ids) > MAX_BULK_COMMIT:
+        return error('invalid_arg_format',
+                     f'At most {MAX_BULK_COMMIT} requests can be committed '
+                     'at once.', 400)
+    results = []
+    for i in range(0, len(ids), BULK_COMMIT_CHUNK):
+        results.extend(commit_chunk(ids[i:i + BULK_COMMIT_CHUNK]))
+    return success(results=results)
+
+
+@bp.route('/stats/')
+@admin_required
+def get_stats():
+    return success(
+        indexes={name: index.stats() for name, index in app.indexes.items()},
+        caches={name: cache.stats() for name, cache in app.caches.items()},
+        votes=app.vote_buffer and app.vote_buffer.stats(),
+        history=app.history_cache and app.history_cache.stats(),
+        users=app.user_cache and app.user_cache.stats(),
+        http=app.http_client.stats(),
+        pool=app.pool_stats(),
+    )
@@ -1,13 +1,27 @@
 import collections
+import pathlib
 import typing
 
 from settei import config_property
 from settei.presets.flask import WebConfiguration
 from sqlalchemy.engine import Engine, create_engine
 from werkzeug.datastructures import ImmutableDict
-from werkzeug.utils import cached_property
+from werkzeug.utils import cached_property, import_string
 
+from .autocomplete import AutocompleteIndex
+from .cache import CacheBackend, HistoryCache, ResponseCache
+from .cluster import ClusterIndex
+from .green import make_psycopg2_green
+from .http import HTTPClient
+from .identity import IdentityCache
+from .oauth import (DatabaseOAuthSessionStore, MemoryOAuthSessionStore,
+                    OAuthSessionStore, SharedOAuthSessionStore)
 from .orm import Session
+from .poll import VoteBuffer
+from .pool import InstrumentedQueuePool
+from .search import SearchIndex
+from .spatial import SpatialIndex
+from .tiles import TileCache
 
 
 class App(WebConfiguration):
@@ -15,6 +29,54 @@ class App(WebConfiguration):
         'database.url', str
     )
 
+    database_green = config_property(
+        'database.green', bool,
+        'Wait for PostgreSQL by yielding to other greenlets, so that slow '
+        'queries don\'t block the whole process under gevent',
+        default=False
+    )
+
+    database_pool_size = config_property(
+        'database.pool_size', int,
+        'Connections kept open in the pool.  Size it along with '
+        'database.max_overflow for the number of greenlets which use '
+        'the database at once',
+        default=5
+    )
+
+    database_max_overflow = config_property(
+        'database.max_overflow', int,
+        'Connections opened beyond database.pool_size when every pooled '
+        'one is in use, and closed once returned',
+        default=10
+    )
+
+    database_pool_timeout = config_property(
+        'database.pool_timeout', float,
+        'Seconds to wait for a connection when the pool is exhausted',
+        default=30.0
+    )
+
+    database_pool_recycle = config_property(
+        'database.pool_recycle', int,
+        'Seconds after which connections are replaced, or -1 to keep them',
+        default=-1
+    )
+
+    database_pool_pre_ping = config_property(
+        'database.pool_pre_ping', bool,
+        'Test connections before handing them out, to replace ones which '
+        'have been dropped',
+        default=False
+    )
+
+    database_statement_timeout = config_property(
+        'database.statement_timeout', int,
+        'Milliseconds PostgreSQL lets a statement run for before it '
+        'cancels it; 0 for no limit',
+        default=None
+    )
+
     sentry_dsn = config_property(
         'sentry.dsn', str, 'Sentry API DSN', default=None
     )
@@ -35,18 +97,380 @@ class App(WebConfiguration):
         'twitter.oauth_client_secret', str
     )
 
+    oauth_session_store_name = config_property(
+        'oauth.session_store', str,
+        'Where pending OAuth 1 logins are kept: database, memory (only for '
+        'a single process) or shared (the cache.shared backend)',
+        default='database'
+    )
+
+    oauth_session_ttl = config_property(
+        'oauth.session_ttl', float,
+        'Seconds pending OAuth 1 logins can be completed within',
+        default=600.0
+    )
+
+    oauth_sweep_interval = config_property(
+        'oauth.sweep_interval', float,
+        'Seconds between sweeps of expired OAuth 1 logins',
+        default=60.0
+    )
+
+    oauth_sweep_batch_size = config_property(
+        'oauth.sweep_batch_size', int,
+        'The number of expired OAuth 1 logins deleted in each transaction',
+        default=1000
+    )
+
+    http_connect_timeout = config_property(
+        'http.connect_timeout', float,
+        'Seconds to wait for a connection to an OAuth provider',
+        default=3.05
+    )
+
+    http_read_timeout = config_property(
+        'http.read_timeout', float,
+        'Seconds to wait for each read of a response of an OAuth provider',
+        default=10.0
+    )
+
+    http_pool_size = config_property(
+        'http.pool_size', int,
+        'Connections to each OAuth provider host kept alive',
+        default=10
+    )
+
+    http_concurrency = config_property(
+        'http.concurrency', int,
+        'Requests to each OAuth provider in flight at once',
+        default=20
+    )
+
+    spatial_index_enabled = config_property(
+        'index.spatial', bool,
+        'Answer nearby queries from an in-process spatial index.  Only '
+        'the process which commits a change updates its index, so other '
+        'worker processes serve stale results until they restart',
+        default=False
+    )
+
+    spatial_index_cell_size = config_property(
+        'index.spatial_cell_size', float,
+        'Grid cell size of the spatial and autocomplete indexes, in degrees',
+        default=0.05
+    )
+
+    search_index_enabled = config_property(
+        'index.search', bool,
+        'Answer keyword searches from an in-process n-gram index',
+        default=False
+    )
+
+    search_index_chosung = config_property(
+        'index.search_chosung', bool,
+        'Match keywords made of initial consonants against names',
+        default=True
+    )
+
+    autocomplete_index_enabled = config_property(
+        'index.autocomplete', bool,
+        'Complete names and addresses from an in-process sorted index',
+        default=False
+    )
+
+    cluster_index_enabled = config_property(
+        'index.cluster', bool,
+        'Answer cluster queries from in-process per-zoom grid aggregates',
+        default=False
+    )
+
+    cluster_max_zoom = config_property(
+        'index.cluster_max_zoom', int,
+        'The finest zoom level clusters are computed for',
+        default=16
+    )
+
+    listing_cache_enabled = config_property(
+        'cache.listing', bool,
+        'Cache responses of the business entity listing by map tile',
+        default=False
+    )
+
+    listing_cache_size = config_property(
+        'cache.listing_size', int,
+        'The maximum number of responses cached in-process',
+        default=1024
+    )
+
+    listing_cache_ttl = config_property(
+        'cache.listing_ttl', float,
+        'Seconds responses are cached in-process for',
+        default=30.0
+    )
+
+    listing_cache_tile_level = config_property(
+        'cache.listing_tile_level', int,
+        'Query centers are snapped to tiles 360 / 2 ** level degrees wide',
+        default=18
+    )
+
+    shared_cache_backend = config_property(
+        'cache.shared', str,
+        'Import name of a nkzalimi.cache.CacheBackend subclass shared '
+        'by worker processes, e.g. nkzalimi.cache:LocalCacheBackend',
+        default=None
+    )
+
+    shared_cache_ttl = config_property(
+        'cache.shared_ttl', float,
+        'Seconds responses are cached in the shared tier for',
+        default=300.0
+    )
+
+    history_cache_enabled = config_property(
+        'cache.history', bool,
+        'Cache revision history pages of business entities in-process',
+        default=False
+    )
+
+    history_cache_size = config_property(
+        'cache.history_size', int,
+        'The maximum number of history pages cached in-process',
+        default=1024
+    )
+
+    history_cache_ttl = config_property(
+        'cache.history_ttl', float,
+        'Seconds history pages are cached for, which bounds how stale '
+        'they get in other worker processes',
+        default=30.0
+    )
+
+    user_cache_enabled = config_property(
+        'cache.users', bool,
+        'Cache logged-in users and their OAuth logins',
+        default=False
+    )
+
+    user_cache_size = config_property(
+        'cache.users_size', int,
+        'The maximum number of users cached in-process',
+        default=4096
+    )
+
+    user_cache_ttl = config_property(
+        'cache.users_ttl', float,
+        'Seconds users are cached in-process for, which bounds how long '
+        'other worker processes let a blocked user through',
+        default=5.0
+    )
+
+    tiles_min_zoom = config_property(
+        'tiles.min_zoom', int,
+        'The most zoomed out vector tiles are served for',
+        default=12
+    )
+
+    tiles_max_zoom = config_property(
+        'tiles.max_zoom', int,
+        'The most zoomed in vector tiles are served for',
+        default=20
+    )
+
+    tiles_cache_dir = config_property(
+        'tiles.cache_dir', str,
+        'Directory to cache rendered vector tiles in',
+        default=None
+    )
+
+    tiles_cache_size = config_property(
+        'tiles.cache_size', int,
+        'Bytes of rendered vector tiles to keep in tiles.cache_dir, give '
+        'or take what worker processes write between pruning it',
+        default=2 ** 30
+    )
+
+    vote_write_behind = config_property(
+        'poll.write_behind', bool,
+        'Collect votes from concurrent requests and write them in batches',
+        default=False
+    )
+
+    vote_flush_interval = config_property(
+        'poll.flush_interval', float,
+        'Seconds votes are collected for before they are written',
+        default=0.005
+    )
+
+    vote_batch_size = config_property(
+        'poll.batch_size', int,
+        'The number of votes which are written early as a batch',
+        default=500
+    )
+
     @cached_property
     def database_engine(self) -> Engine:
         url = self.database_url
         db_options = dict(self.get('database', ()))
-        db_options.pop('url', None)
-        return create_engine(url, **db_options)
+        for key in ('url', 'green', 'pool_size', 'max_overflow',
+                    'pool_timeout', 'pool_recycle', 'pool_pre_ping',
+                    'statement_timeout'):
+            db_options.pop(key, None)
+        if self.database_green:
+            make_psycopg2_green()
+        connect_args = dict(db_options.pop('connect_args', ()))
+        if self.database_statement_timeout is not None:
+            connect_args['options'] = ' '.join(filter(None, [
+                connect_args.get('options'),
+                f'-c statement_timeout={self.database_statement_timeout}'
+            ]))
+        db_options.setdefault('poolclass', InstrumentedQueuePool)
+        return create_engine(
+            url,
+            pool_size=self.database_pool_size,
+            max_overflow=self.database_max_overflow,
+            pool_timeout=self.database_pool_timeout,
+            pool_recycle=self.database_pool_recycle,
+            pool_pre_ping=self.database_pool_pre_ping,
+            connect_args=connect_args,
+            **db_options
+        )
+
+    def pool_stats(self) -> typing.Optional[typing.Mapping[str, typing.Any]]:
+        pool = self.database_engine.pool
+        if not isinstance(pool, InstrumentedQueuePool):
+            return None
+        return pool.stats()
 
     def create_session(self, bind: Engine=None) -> Session:
         if bind is None:
             bind = self.database_engine
         return Session(bind=bind)
 
+    @cached_property
+    def oauth_session_store(self) -> OAuthSessionStore:
+        name = self.oauth_session_store_name
+        ttl = self.oauth_session_ttl
+        if name == 'database':
+            return DatabaseOAuthSessionStore(ttl)
+        elif name == 'memory':
+            return MemoryOAuthSessionStore(ttl)
+        elif name == 'shared':
+            if self.shared_cache is None:
+                raise ValueError('oauth.session_store = "shared" needs '
+                                 'cache.shared to be configured')
+            return SharedOAuthSessionStore(ttl, self.shared_cache)
+        raise ValueError(f'unknown oauth.session_store: {name!r}')
+
+    @cached_property
+    def http_client(self) -> HTTPClient:
+        return HTTPClient(
+            connect_timeout=self.http_connect_timeout,
+            read_timeout=self.http_read_timeout,
+            pool_size=self.http_pool_size,
+            concurrency=self.http_concurrency,
+        )
+
+    @cached_property
+    def spatial_index(self) -> typing.Optional[SpatialIndex]:
+        if not self.spatial_index_enabled:
+            return None
+        return SpatialIndex(cell_size=self.spatial_index_cell_size)
+
+    @cached_property
+    def search_index(self) -> typing.Optional[SearchIndex]:
+        if not self.search_index_enabled:
+            return None
+        return SearchIndex(chosung=self.search_index_chosung)
+
+    @cached_property
+    def autocomplete_index(self) -> typing.Optional[AutocompleteIndex]:
+        if not self.autocomplete_index_enabled:
+            return None
+        return AutocompleteIndex(cell_size=self.spatial_index_cell_size)
+
+    @cached_property
+    def cluster_index(self) -> typing.Optional[ClusterIndex]:
+        if not self.cluster_index_enabled:
+            return None
+        return ClusterIndex(max_zoom=self.cluster_max_zoom)
+
+    @cached_property
+    def shared_cache(self) -> typing.Optional[CacheBackend]:
+        if self.shared_cache_backend is None:
+            return None
+        return import_string(self.shared_cache_backend)()
+
+    @cached_property
+    def listing_cache(self) -> typing.Optional[ResponseCache]:
+        if not self.listing_cache_enabled:
+            return None
+        return ResponseCache(
+            maxsize=self.listing_cache_size,
+            ttl=self.listing_cache_ttl,
+            tile_level=self.listing_cache_tile_level,
+            shared=self.shared_cache,
+            shared_ttl=self.shared_cache_ttl,
+            prefix='listing',
+        )
+
+    @cached_property
+    def history_cache(self) -> typing.Optional[HistoryCache]:
+        if not self.history_cache_enabled:
+            return None
+        return HistoryCache(maxsize=self.history_cache_size,
+                            ttl=self.history_cache_ttl)
+
+    @cached_property
+    def user_cache(self) -> typing.Optional[IdentityCache]:
+        if not self.user_cache_enabled:
+            return None
+        return IdentityCache(
+            maxsize=self.user_cache_size,
+            ttl=self.user_cache_ttl,
+            shared=self.shared_cache,
+            shared_ttl=self.shared_cache_ttl,
+        )
+
+    @property
+    def indexes(self) -> typing.Mapping[str, typing.Any]:
+        """In-process indexes which are enabled, by name.  Every index has
+        ``rebuild(records)``, ``update(record, previous)`` and ``stats()``
+        methods.
+
+        """
+        indexes = {
+            'spatial': self.spatial_index,
+            'search': self.search_index,
+            'autocomplete': self.autocomplete_index,
+            'cluster': self.cluster_index,
+        }
+        return {k: v for k, v in indexes.items() if v is not None}
+
+    @cached_property
+    def tile_cache(self) -> typing.Optional[TileCache]:
+        if self.tiles_cache_dir is None:
+            return None
+        return TileCache(pathlib.Path(self.tiles_cache_dir),
+                         self.tiles_min_zoom, self.tiles_max_zoom,
+                         self.tiles_cache_size)
+
+    @property
+    def caches(self) -> typing.Mapping[str, typing.Any]:
+        """Caches which are enabled, by name.  Every cache has
+        ``invalidate(points)`` and ``stats()`` methods.
+
+        """
+        caches = {'listing': self.listing_cache, 'tiles': self.tile_cache}
+        return {k: v for k, v in caches.items() if v is not None}
+
+    @cached_property
+    def vote_buffer(self) -> typing.Optional[VoteBuffer]:
+        if not self.vote_write_behind:
+            return None
+        return VoteBuffer(self.create_session, self.vote_flush_interval,
+                          self.vote_batch_size)
+
     @cached_property
     def web_config(self) -> typing.Mapping[str, typing.Any]:
         web_config = self.config.get('web', {})
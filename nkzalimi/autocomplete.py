@@ -0,0 +1,483 @@
+import bisect
+import enum
+import heapq
+import math
+import sys
+import typing
+import uuid
+
+from .records import EntityRecord
+from .search import normalize
+from .spatial import EARTH_RADIUS, METERS_PER_DEGREE, sphere_distance
+
+__all__ = 'AutocompleteIndex', 'Suggestion', 'SuggestionKind'
+
+
+class SuggestionKind(enum.Enum):
+    name = 'name'
+    address = 'address'
+
+
+class Suggestion(typing.NamedTuple):
+
+    text: str
+    kind: SuggestionKind
+    business_entity_id: uuid.UUID
+    score: float
+
+
+#: (key, entity id, kind, whether key is the whole text), where kind is
+#: :attr:`SuggestionKind.value` so that entries stay orderable.
+Entry = typing.Tuple[str, uuid.UUID, str, bool]
+
+#: Sorts above every key starting with the same prefix.
+MAX_CHAR = '\U0010ffff'
+
+#: The kinds of entries, as :attr:`SuggestionKind.value`.
+NAME = SuggestionKind.name.value
+ADDRESS = SuggestionKind.address.value
+
+#: Lookups near a place having up to this many matches in all score them
+#: rather than looking for the nearest cells.
+SCAN_MATCHES = 200
+
+
+def gap_distance(latitude: float, lat_gap: float, lng_gap: float) -> float:
+    """The least distance in meters from a point at ``latitude`` to any
+    point ``lat_gap`` degrees of latitude and ``lng_gap`` degrees of
+    longitude away, i.e. as far as the farther of the parallel and the
+    meridian bounding them.  It may be underestimated.
+
+    """
+    return max(
+        lat_gap * METERS_PER_DEGREE,
+        math.asin(math.cos(math.radians(latitude)) *
+                  math.sin(math.radians(min(lng_gap, 90.0)))) *
+        EARTH_RADIUS
+    )
+
+
+class Entries:
+    """Entries sorted in an array, along with their keys alone in another
+    array, so that looking up a prefix only compares strings.
+
+    """
+
+    __slots__ = 'keys', 'entries'
+
+    def __init__(self) -> None:
+        self.keys: typing.List[str] = []
+        self.entries: typing.List[Entry] = []
+
+    def append(self, entry: Entry) -> None:
+        """Add ``entry``, which must sort after every entry."""
+        self.keys.append(entry[0])
+        self.entries.append(entry)
+
+    def add(self, entry: Entry) -> None:
+        lo = bisect.bisect_left(self.keys, entry[0])
+        hi = bisect.bisect_right(self.keys, entry[0], lo)
+        i = bisect.bisect(self.entries, entry, lo, hi)
+        self.keys.insert(i, entry[0])
+        self.entries.insert(i, entry)
+
+    def remove(self, entry: Entry) -> bool:
+        lo = bisect.bisect_left(self.keys, entry[0])
+        hi = bisect.bisect_right(self.keys, entry[0], lo)
+        i = bisect.bisect_left(self.entries, entry, lo, hi)
+        if i < hi and self.entries[i] == entry:
+            del self.keys[i], self.entries[i]
+            return True
+        return False
+
+    def find(self, prefix: str) -> typing.Tuple[int, int]:
+        """The range of the entries whose keys start with ``prefix``."""
+        start = bisect.bisect_left(self.keys, prefix)
+        return start, bisect.bisect_left(self.keys, prefix + MAX_CHAR, start)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __sizeof__(self) -> int:
+        return (object.__sizeof__(self) + sys.getsizeof(self.keys) +
+                sys.getsizeof(self.entries))
+
+
+class Keys:
+    """Entries grouped by the length of their keys and whether they're
+    the whole text, which decide their score before the distance, so
+    that matches of a prefix can be visited from the highest score down.
+
+    """
+
+    __slots__ = 'groups', 'size'
+
+    def __init__(self) -> None:
+        self.groups: typing.Dict[typing.Tuple[int, bool], Entries] = {}
+        self.size = 0
+
+    def append(self, entry: Entry) -> None:
+        """Add ``entry``, which must sort after every entry of its
+        group.
+
+        """
+        group_key = len(entry[0]), entry[3]
+        try:
+            group = self.groups[group_key]
+        except KeyError:
+            group = self.groups[group_key] = Entries()
+        group.append(entry)
+        self.size += 1
+
+    def add(self, entry: Entry) -> None:
+        self.groups.setdefault((len(entry[0]), entry[3]),
+                               Entries()).add(entry)
+        self.size += 1
+
+    def remove(self, entry: Entry) -> None:
+        group_key = len(entry[0]), entry[3]
+        group = self.groups[group_key]
+        if group.remove(entry):
+            self.size -= 1
+            if not group:
+                del self.groups[group_key]
+
+    def matches(self, prefix: str) -> typing.List[
+        typing.Tuple[float, typing.List[Entry], int, int]
+    ]:
+        """List ``(score, entries, start, stop)`` for every group having
+        keys which start with ``prefix`` in ``entries[start:stop]``, the
+        highest score first.
+
+        """
+        found = []
+        for (length, whole), group in self.groups.items():
+            if length < len(prefix):
+                continue
+            start, stop = group.find(prefix)
+            if start < stop:
+                found.append(((1.0 if whole else 0.5) / length,
+                              group.entries, start, stop))
+        found.sort(key=lambda match: -match[0])
+        return found
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __sizeof__(self) -> int:
+        size = object.__sizeof__(self) + sys.getsizeof(self.groups)
+        return size + sum(map(sys.getsizeof, self.groups.values()))
+
+
+class Ranking:
+    """The best scored suggestion of each text found so far, along with a
+    min-heap of the top ``limit`` scores, so that the score to beat is at
+    hand without sorting them all.  Suggestions scoring less than that
+    are left out as soon as they're offered.
+
+    """
+
+    __slots__ = 'limit', 'best', 'top', 'heap', 'threshold'
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.best: typing.Dict[typing.Tuple[str, str],
+                               typing.Tuple[float, uuid.UUID]] = {}
+        # The scores of the top texts.  Texts whose scores have risen
+        # since leave behind stale heap entries, skipped once on top.
+        self.top: typing.Dict[typing.Tuple[str, str], float] = {}
+        self.heap: typing.List[typing.Tuple[float, str, str]] = []
+        #: The score to beat to make it into the top ``limit``.
+        self.threshold = 0.0
+
+    def offer(self, text: str, kind: str, id: uuid.UUID,
+              score: float) -> None:
+        if score < self.threshold:
+            return
+        key = text, kind
+        current = self.best.get(key)
+        if current is not None and current[0] >= score:
+            return
+        self.best[key] = score, id
+        top = self.top
+        heap = self.heap
+        if key not in top and len(top) >= self.limit and \
+                score == self.threshold:
+            # A tie with the last of the top; it doesn't change the score
+            # to beat.
+            return
+        top[key] = score
+        heapq.heappush(heap, (score, text, kind))
+        if len(top) > self.limit:
+            while True:
+                score, text, kind = heapq.heappop(heap)
+                if top.get((text, kind)) == score:
+                    del top[text, kind]
+                    break
+        if len(top) >= self.limit:
+            while top.get(heap[0][1:]) != heap[0][0]:
+                heapq.heappop(heap)
+            self.threshold = heap[0][0]
+
+    def suggestions(self) -> typing.List[Suggestion]:
+        """The top ``limit``, the highest score first."""
+        threshold = self.threshold
+        found = heapq.nsmallest(self.limit, (
+            (-score, text, kind, id)
+            for (text, kind), (score, id) in self.best.items()
+            if score >= threshold
+        ))
+        return [Suggestion(text, SuggestionKind(kind), id, -score)
+                for score, text, kind, id in found]
+
+
+class AutocompleteIndex:
+    """A sorted array of normalized names and addresses for prefix
+    lookups.  Every word of a name or an address is a key of its own, so
+    ``강남`` completes ``스타벅스 강남점`` as well.  Keys are also bucketed
+    into latitude/longitude cells, so that lookups near a place rank the
+    matches around it first and rule out far ones without scoring them.
+
+    :param cell_size: the edge length of a grid cell, in degrees
+
+    """
+
+    def __init__(self, cell_size: float = 0.05) -> None:
+        self.cell_size = cell_size
+        self.records: typing.Dict[uuid.UUID, EntityRecord] = {}
+        self.keys = Keys()
+        self.cells: typing.Dict[typing.Tuple[int, int], Entries] = {}
+
+    @staticmethod
+    def entries(record: EntityRecord) -> typing.Iterator[Entry]:
+        for kind, text in ((NAME, record.name), (ADDRESS, record.address)):
+            text = normalize(text)
+            start = 0
+            while True:
+                yield text[start:], record.id, kind, start == 0
+                start = text.find(' ', start) + 1
+                if not start:
+                    break
+
+    def cell_key(self, latitude: float,
+                 longitude: float) -> typing.Tuple[int, int]:
+        return (math.floor(latitude / self.cell_size),
+                math.floor(longitude / self.cell_size))
+
+    def cell_distance(self, latitude: float, longitude: float,
+                      key: typing.Tuple[int, int]) -> float:
+        """The least distance in meters from the given point to any
+        point of the cell of ``key``.  It may be underestimated.
+
+        """
+        i, j = key
+        south = i * self.cell_size
+        west = j * self.cell_size
+        lat_gap = max(south - latitude, latitude - south - self.cell_size,
+                      0.0)
+        if (longitude - west) % 360.0 <= self.cell_size:
+            lng_gap = 0.0
+        else:
+            lng_gap = min((west - longitude) % 360.0,
+                          (longitude - west - self.cell_size) % 360.0)
+        return gap_distance(latitude, lat_gap, lng_gap)
+
+    def nearby_cells(
+        self, latitude: float, longitude: float
+    ) -> typing.Iterator[typing.Tuple[float, float, Entries]]:
+        """Yield ``(bound, distance, entries)`` for every cell, where
+        ``distance`` is the least distance to the cell and ``bound`` the
+        least distance to the cells yet to come, which never decreases.
+        Rings of cells around the given point are visited outward, as
+        :meth:`SpatialIndex.nearest() <nkzalimi.spatial.SpatialIndex.nearest>`
+        does.
+
+        """
+        cells = self.cells
+        cell_size = self.cell_size
+        ci, cj = self.cell_key(latitude, longitude)
+        left = len(cells)
+        r = 0
+        while left:
+            if (2 * r + 1) ** 2 > left or (cj - r) * cell_size <= -180.0 or \
+                    (cj + r + 1) * cell_size >= 180.0:
+                # Cheaper to sort the cells left, or the rings would have
+                # to wrap around the antimeridian.
+                rest = sorted(
+                    (self.cell_distance(latitude, longitude, key), key)
+                    for key in cells
+                    if abs(key[0] - ci) >= r or abs(key[1] - cj) >= r
+                )
+                for distance, key in rest:
+                    yield distance, distance, cells[key]
+                return
+            if r:
+                ring = [(ci + d, cj + e) for d in (-r, r)
+                        for e in range(-r, r + 1)]
+                ring += [(ci + d, cj + e) for e in (-r, r)
+                         for d in range(-r + 1, r)]
+                # As far as the nearest inner edge of the ring.
+                bound = min(
+                    gap_distance(latitude,
+                                 min(latitude - (ci - r + 1) * cell_size,
+                                     (ci + r) * cell_size - latitude),
+                                 0.0),
+                    gap_distance(latitude, 0.0,
+                                 min(longitude - (cj - r + 1) * cell_size,
+                                     (cj + r) * cell_size - longitude))
+                )
+            else:
+                ring = [(ci, cj)]
+                bound = 0.0
+            found = sorted(
+                (self.cell_distance(latitude, longitude, key), key)
+                for key in ring if key in cells
+            )
+            for distance, key in found:
+                yield bound, distance, cells[key]
+            left -= len(found)
+            r += 1
+
+    def rebuild(self, records: typing.Iterable[EntityRecord]) -> None:
+        self.records = {record.id: record for record in records}
+        self.keys = Keys()
+        self.cells = {}
+        entries = []
+        for record in self.records.values():
+            key = self.cell_key(record.latitude, record.longitude)
+            try:
+                cell = self.cells[key]
+            except KeyError:
+                cell = self.cells[key] = Entries()
+            entries.extend((entry[0], entry[1].int, entry, cell)
+                           for entry in self.entries(record))
+        # Sorted once, comparing ids as integers as UUID does but without
+        # calling into it, and appended in order.
+        entries.sort()
+        append = self.keys.append
+        for _, _, entry, cell in entries:
+            append(entry)
+            cell.append(entry)
+
+    def discard(self, id: uuid.UUID) -> None:
+        record = self.records.pop(id, None)
+        if record is None:
+            return
+        key = self.cell_key(record.latitude, record.longitude)
+        cell = self.cells[key]
+        for entry in self.entries(record):
+            self.keys.remove(entry)
+            cell.remove(entry)
+        if not cell:
+            del self.cells[key]
+
+    def add(self, record: EntityRecord) -> None:
+        self.records[record.id] = record
+        key = self.cell_key(record.latitude, record.longitude)
+        try:
+            cell = self.cells[key]
+        except KeyError:
+            cell = self.cells[key] = Entries()
+        for entry in self.entries(record):
+            self.keys.add(entry)
+            cell.add(entry)
+
+    def update(self, record: EntityRecord,
+               previous: typing.Optional[EntityRecord]) -> None:
+        self.discard(record.id)
+        self.add(record)
+
+    def complete(
+        self, prefix: str, limit: int = 10,
+        near: typing.Optional[typing.Tuple[float, float]] = None
+    ) -> typing.List[Suggestion]:
+        """Suggest up to ``limit`` distinct names and addresses starting
+        with ``prefix``.  Whole-text matches rank above word matches and
+        shorter texts above longer ones; if ``near`` is a
+        ``(latitude, longitude)`` pair, nearby entities are favored.
+
+        """
+        prefix = normalize(prefix)
+        if not prefix or limit <= 0:
+            return []
+        matches = self.keys.matches(prefix)
+        ranking = Ranking(limit)
+        if near is None or \
+                sum(stop - start for _, _, start, stop in matches) <= \
+                SCAN_MATCHES:
+            self._rank(matches, near, ranking)
+            return ranking.suggestions()
+        # No match scores more than this, however near.
+        top = matches[0][0]
+        for bound, distance, cell in self.nearby_cells(*near):
+            threshold = ranking.threshold
+            if top / (1.0 + bound / 1000.0) < threshold:
+                break
+            elif top / (1.0 + distance / 1000.0) >= threshold:
+                self._scan(cell, prefix, near, distance, ranking)
+        return ranking.suggestions()
+
+    def _rank(self,
+              matches: typing.Sequence[
+                  typing.Tuple[float, typing.List[Entry], int, int]
+              ],
+              near: typing.Optional[typing.Tuple[float, float]],
+              ranking: Ranking) -> None:
+        """Score the ``matches`` from :meth:`Keys.matches()` into
+        ``ranking``, until none of the rest could make it into the top.
+
+        """
+        records = self.records
+        offer = ranking.offer
+        for base, entries, start, stop in matches:
+            if base < ranking.threshold:
+                break
+            for _, id, kind, _ in entries[start:stop]:
+                record = records[id]
+                score = base
+                if near is not None:
+                    score /= 1.0 + sphere_distance(near[0], near[1],
+                                                   record.latitude,
+                                                   record.longitude) / 1000.0
+                # Kinds are named after the fields of records.
+                offer(getattr(record, kind), kind, id, score)
+
+    def _scan(self, cell: Entries, prefix: str,
+              near: typing.Tuple[float, float], distance: float,
+              ranking: Ranking) -> None:
+        """Score the matches of ``prefix`` in ``cell``, which is at least
+        ``distance`` meters away from ``near``, into ``ranking``.
+
+        """
+        records = self.records
+        offer = ranking.offer
+        decay = 1.0 + distance / 1000.0
+        start, stop = cell.find(prefix)
+        for key, id, kind, whole in cell.entries[start:stop]:
+            base = (1.0 if whole else 0.5) / len(key)
+            if base / decay < ranking.threshold:
+                continue
+            record = records[id]
+            offer(getattr(record, kind), kind, id,
+                  base / (1.0 + sphere_distance(near[0], near[1],
+                                                record.latitude,
+                                                record.longitude) / 1000.0))
+
+    def memory_usage(self) -> int:
+        """Estimate the bytes held by the index, records excluded."""
+        size = (sys.getsizeof(self.records) + sys.getsizeof(self.keys) +
+                sys.getsizeof(self.cells))
+        size += sum(map(sys.getsizeof, self.cells.values()))
+        for group in self.keys.groups.values():
+            for entry in group.entries:
+                size += sys.getsizeof(entry) + sys.getsizeof(entry[0])
+        return size
+
+    def stats(self) -> typing.Mapping[str, typing.Any]:
+        return {
+            'entities': len(self.records),
+            'keys': len(self.keys),
+            'cells': len(self.cells),
+            'memory_usage': self.memory_usage()
+        }
+
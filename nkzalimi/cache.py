@@ -0,0 +1,385 @@
+import collections
+import math
+import os
+import threading
+import time
+import typing
+import uuid
+
+from .spatial import METERS_PER_DEGREE
+
+__all__ = ('CacheBackend', 'HistoryCache', 'LRUCache', 'LocalCacheBackend',
+           'ResponseCache', 'grid_cell', 'grid_level_for')
+
+
+#: The finest grid level used for invalidation tags, about 2.4 m per cell.
+MAX_GRID_LEVEL = 24
+
+
+class LRUCache:
+    """A bounded in-process cache which evicts the least recently used
+    entries, and optionally expires entries ``ttl`` seconds after they were
+    set.
+
+    :param maxsize: the maximum number of entries
+    :param ttl: seconds entries live for, or :const:`None` to keep them
+                until they're evicted
+    :param on_evict: called with the key of every entry dropped due to
+                     ``maxsize`` or ``ttl``
+
+    """
+
+    def __init__(self, maxsize: int, ttl: typing.Optional[float] = None,
+                 on_evict: typing.Optional[typing.Callable] = None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.entries: typing.MutableMapping[
+            typing.Hashable, typing.Tuple[typing.Any, float]
+        ] = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def get(self, key: typing.Hashable, default=None):
+        with self.lock:
+            try:
+                value, expires_at = self.entries[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                self.expirations += 1
+                self.misses += 1
+                expired = True
+            else:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                expired = False
+        if expired:
+            if self.on_evict is not None:
+                self.on_evict(key)
+            return default
+        return value
+
+    def set(self, key: typing.Hashable, value) -> None:
+        expires_at = math.inf if self.ttl is None \
+            else time.monotonic() + self.ttl
+        evicted = []
+        with self.lock:
+            self.entries[key] = value, expires_at
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                evicted.append(self.entries.popitem(last=False)[0])
+            self.evictions += len(evicted)
+        if self.on_evict is not None:
+            for k in evicted:
+                self.on_evict(k)
+
+    def delete(self, key: typing.Hashable) -> bool:
+        with self.lock:
+            return self.entries.pop(key, None) is not None
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def stats(self) -> typing.Mapping[str, int]:
+        return {
+            'size': len(self.entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+class CacheBackend:
+    """The interface of a cache tier shared by worker processes, e.g. one
+    on top of Redis or memcached.  Besides plain values it keeps *tags*:
+    sets of keys which get invalidated together.
+
+    """
+
+    def get(self, key: str) -> typing.Optional[bytes]:
+        raise NotImplementedError('get() has to be implemented')
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        raise NotImplementedError('set() has to be implemented')
+
+    def delete(self, keys: typing.Iterable[str]) -> None:
+        raise NotImplementedError('delete() has to be implemented')
+
+    def tag(self, key: str, tags: typing.Iterable[str]) -> None:
+        raise NotImplementedError('tag() has to be implemented')
+
+    def pop_tag(self, tag: str) -> typing.Set[str]:
+        """Remove ``tag`` and return the keys it had."""
+        raise NotImplementedError('pop_tag() has to be implemented')
+
+
+class LocalCacheBackend(CacheBackend):
+    """A :class:`CacheBackend` kept in a dictionary.  Not actually shared
+    by anything; it stands in for a real one in development and tests.
+
+    """
+
+    def __init__(self) -> None:
+        self.values: typing.Dict[str, typing.Tuple[bytes, float]] = {}
+        self.tags: typing.Dict[str, typing.Set[str]] = {}
+
+    def get(self, key: str) -> typing.Optional[bytes]:
+        try:
+            value, expires_at = self.values[key]
+        except KeyError:
+            return None
+        if expires_at < time.monotonic():
+            del self.values[key]
+            return None
+        return value
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self.values[key] = value, time.monotonic() + ttl
+
+    def delete(self, keys: typing.Iterable[str]) -> None:
+        for key in keys:
+            self.values.pop(key, None)
+
+    def tag(self, key: str, tags: typing.Iterable[str]) -> None:
+        for tag in tags:
+            self.tags.setdefault(tag, set()).add(key)
+
+    def pop_tag(self, tag: str) -> typing.Set[str]:
+        return self.tags.pop(tag, set())
+
+
+def grid_cell(level: int, latitude: float,
+              longitude: float) -> typing.Tuple[int, int]:
+    """The cell containing a point on a latitude/longitude grid whose cells
+    are ``360 / 2 ** level`` degrees wide.
+
+    """
+    size = 360.0 / 2 ** level
+    return (math.floor((latitude + 90.0) / size),
+            math.floor((longitude + 180.0) / size) % 2 ** level)
+
+
+def grid_level_for(latitude: float, radius: float) -> int:
+    """The finest grid level whose cells are at least ``radius`` meters
+    wide and high around ``latitude``, so that a circle of ``radius``
+    centered in a cell lies within its 3x3 neighborhood.
+
+    """
+    if not radius > 0:
+        # A point, e.g. the farthest of the k nearest entities being at
+        # the very center.
+        return MAX_GRID_LEVEL
+    lat_span = radius / METERS_PER_DEGREE
+    cos_lat = math.cos(math.radians(min(abs(latitude) + lat_span, 90.0)))
+    if cos_lat < 1e-9:
+        return 0
+    size = lat_span / cos_lat
+    if size >= 360.0:
+        return 0
+    return min(MAX_GRID_LEVEL, math.floor(math.log2(360.0 / size)))
+
+
+class ResponseCache:
+    """Caches serialized responses of geo queries by a quantized location,
+    with a local :class:`LRUCache` tier and an optional shared
+    :class:`CacheBackend` tier.
+
+    Query centers are snapped to the center of a *tile*, a grid cell of
+    ``tile_level`` (see :meth:`snap()`), so that nearby clients share
+    entries.  Every entry is tagged with the cells any entity it may
+    contain can be in, so a change to an entity at a point invalidates
+    precisely the entries around that point (see :meth:`invalidate()`).
+    Entries not bound to a location carry the ``global`` tag instead, and
+    are dropped on every invalidation.
+
+    Every invalidation bumps the *generation* of the cache.  A response is
+    only stored if the generation is the same as before it was built (see
+    :meth:`set()`), so that an invalidation which comes in while it's
+    being built isn't lost.
+
+    With a shared tier, local entries of other worker processes aren't
+    invalidated; keep the local ``ttl`` short in that case.
+
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30.0,
+                 tile_level: int = 18,
+                 shared: typing.Optional[CacheBackend] = None,
+                 shared_ttl: float = 300.0,
+                 prefix: str = 'response') -> None:
+        self.tile_level = tile_level
+        self.shared = shared
+        self.shared_ttl = shared_ttl
+        self.prefix = prefix
+        self.local = LRUCache(maxsize, ttl, on_evict=self._untag)
+        self.local_tags: typing.Dict[str, typing.Set[str]] = {}
+        self.key_tags: typing.Dict[str, typing.Sequence[str]] = {}
+        self.local_generation = 0
+        self.shared_hits = self.invalidations = self.discards = 0
+
+    def snap(self, latitude: float,
+             longitude: float) -> typing.Tuple[float, float]:
+        size = 360.0 / 2 ** self.tile_level
+        i, j = grid_cell(self.tile_level, latitude, longitude)
+        return (i + 0.5) * size - 90.0, (j + 0.5) * size - 180.0
+
+    def tags_for(
+        self, near: typing.Optional[typing.Tuple[float, float, float]]
+    ) -> typing.Sequence[str]:
+        """Tags for an entry answering a query around ``near``, a
+        ``(latitude, longitude, radius)`` triple, or :const:`None` for
+        queries which aren't bound to a location.
+
+        """
+        if near is None:
+            return ['global']
+        latitude, longitude, radius = near
+        level = grid_level_for(latitude, radius)
+        i, j = grid_cell(level, latitude, longitude)
+        n = 2 ** level
+        return sorted({
+            f'{level}:{i + di}:{(j + dj) % n}'
+            for di in (-1, 0, 1) for dj in (-1, 0, 1)
+        })
+
+    def get(self, key: str) -> typing.Optional[bytes]:
+        value = self.local.get(key)
+        if value is None and self.shared is not None:
+            value = self.shared.get(f'{self.prefix}:{key}')
+            if value is not None:
+                self.shared_hits += 1
+        return value
+
+    def generation(self) -> typing.Tuple[int, typing.Optional[bytes]]:
+        """The generation of the cache, to be passed to :meth:`set()`
+        along with the response built after this returned.
+
+        """
+        if self.shared is None:
+            return self.local_generation, None
+        return (self.local_generation,
+                self.shared.get(f'{self.prefix}:generation'))
+
+    def set(self, key: str, value: bytes, tags: typing.Sequence[str],
+            generation: typing.Tuple[int, typing.Optional[bytes]]) -> None:
+        """Store a response built after :meth:`generation()` returned
+        ``generation``, unless the cache has been invalidated since.
+
+        """
+        if self.generation() != generation:
+            self.discards += 1
+            return
+        self.local.set(key, value)
+        self.key_tags[key] = tags
+        for tag in tags:
+            self.local_tags.setdefault(tag, set()).add(key)
+        if self.shared is not None:
+            shared_key = f'{self.prefix}:{key}'
+            self.shared.set(shared_key, value, self.shared_ttl)
+            self.shared.tag(shared_key,
+                            [f'{self.prefix}:{tag}' for tag in tags])
+        # An invalidation which bumped the generation before the check
+        # above but after this one pops the tags after they're added; one
+        # which bumped it in between has to be caught here.
+        if self.generation() != generation:
+            self.discards += 1
+            self.local.delete(key)
+            self._untag(key)
+            if self.shared is not None:
+                self.shared.delete([shared_key])
+
+    def _untag(self, key: str) -> None:
+        for tag in self.key_tags.pop(key, ()):
+            keys = self.local_tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.local_tags[tag]
+
+    def _pop_tag(self, tag: str) -> None:
+        for key in self.local_tags.pop(tag, ()):
+            self.local.delete(key)
+            self._untag(key)
+        if self.shared is not None:
+            self.shared.delete(self.shared.pop_tag(f'{self.prefix}:{tag}'))
+
+    def invalidate(
+        self, points: typing.Iterable[typing.Tuple[float, float]]
+    ) -> None:
+        """Invalidate entries which may contain an entity at any of
+        ``points``, i.e. ``(latitude, longitude)`` pairs.
+
+        """
+        self.invalidations += 1
+        # Bump the generation before popping tags; see set().
+        self.local_generation += 1
+        if self.shared is not None:
+            self.shared.set(f'{self.prefix}:generation',
+                            os.urandom(8).hex().encode('ascii'),
+                            self.shared_ttl)
+        self._pop_tag('global')
+        for latitude, longitude in set(points):
+            for level in range(MAX_GRID_LEVEL + 1):
+                i, j = grid_cell(level, latitude, longitude)
+                self._pop_tag(f'{level}:{i}:{j}')
+
+    def stats(self) -> typing.Mapping[str, typing.Any]:
+        return {
+            **self.local.stats(),
+            'shared_hits': self.shared_hits,
+            'invalidations': self.invalidations,
+            'discards': self.discards,
+        }
+
+
+class HistoryCache:
+    """Responses of revision history pages, by business entity.
+
+    Revisions are only ever added to the front of a history, so a page
+    starting from a given revision never changes.  Only the first pages
+    of an entity, which start from its latest revision, are invalidated
+    when it gets a new one.
+
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30.0) -> None:
+        self.local = LRUCache(maxsize, ttl, on_evict=self._forget)
+        self.first_pages: typing.Dict[
+            uuid.UUID, typing.Set[typing.Tuple[typing.Any, ...]]
+        ] = {}
+        self.invalidations = 0
+
+    def get(self, entity_id: uuid.UUID, start: typing.Optional[uuid.UUID],
+            limit: int) -> typing.Optional[bytes]:
+        return self.local.get((entity_id, start, limit))
+
+    def set(self, entity_id: uuid.UUID, start: typing.Optional[uuid.UUID],
+            limit: int, value: bytes) -> None:
+        key = entity_id, start, limit
+        self.local.set(key, value)
+        if start is None:
+            self.first_pages.setdefault(entity_id, set()).add(key)
+
+    def _forget(self, key: typing.Tuple[typing.Any, ...]) -> None:
+        keys = self.first_pages.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                self.first_pages.pop(key[0], None)
+
+    def invalidate(self, entity_id: uuid.UUID) -> None:
+        for key in self.first_pages.pop(entity_id, ()):
+            if self.local.delete(key):
+                self.invalidations += 1
+
+    def stats(self) -> typing.Mapping[str, typing.Any]:
+        return {**self.local.stats(), 'invalidations': self.invalidations}
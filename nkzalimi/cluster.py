@@ -0,0 +1,166 @@
+import math
+import sys
+import typing
+import uuid
+
+from .entities import BusinessEntityStatus
+from .mercator import project, tile_ranges
+from .records import EntityRecord
+
+__all__ = 'CELL_BITS', 'Cluster', 'ClusterIndex', 'cluster_cells'
+
+
+#: Clusters at zoom ``z`` are the tiles of zoom ``z + CELL_BITS``, i.e.
+#: every map tile is split into 8 by 8 clusters of 32 pixels.
+CELL_BITS = 3
+
+#: Per-status ``[count, latitude sum, longitude sum]`` of a cell.
+Buckets = typing.Dict[BusinessEntityStatus, typing.List[float]]
+
+
+class Cluster(typing.NamedTuple):
+
+    count: int
+    latitude: float
+    longitude: float
+    statuses: typing.Mapping[BusinessEntityStatus, int]
+
+    @classmethod
+    def from_buckets(
+        cls, buckets: Buckets,
+        status: typing.Optional[BusinessEntityStatus] = None
+    ) -> typing.Optional['Cluster']:
+        if status is not None:
+            buckets = {status: buckets[status]} if status in buckets else {}
+        count = sum(int(b[0]) for b in buckets.values())
+        if not count:
+            return None
+        return cls(
+            count,
+            sum(b[1] for b in buckets.values()) / count,
+            sum(b[2] for b in buckets.values()) / count,
+            {s: int(b[0]) for s, b in buckets.items()}
+        )
+
+
+def cluster_cells(
+    zoom: int, south: float, west: float, north: float, east: float
+) -> typing.Tuple[typing.Sequence[typing.Tuple[int, int]],
+                  typing.Tuple[int, int]]:
+    """The cells of clusters at ``zoom`` overlapping a bounding box; see
+    also :func:`~.mercator.tile_ranges()`.
+
+    """
+    return tile_ranges(zoom + CELL_BITS, south, west, north, east)
+
+
+class ClusterIndex:
+    """Per-zoom grid aggregates of business entities for drawing clusters
+    on zoomed-out maps.  Every zoom level keeps the count and the sum of
+    coordinates of each cell by status, so adding or removing an entity
+    touches a single cell per level.
+
+    :param max_zoom: the finest zoom level to keep aggregates for; more
+                     zoomed in queries get the clusters of this level
+
+    """
+
+    def __init__(self, max_zoom: int = 16) -> None:
+        self.max_zoom = max_zoom
+        self.records: typing.Dict[uuid.UUID, EntityRecord] = {}
+        self.levels: typing.List[
+            typing.Dict[typing.Tuple[int, int], Buckets]
+        ] = [{} for _ in range(max_zoom + 1)]
+
+    def _apply(self, record: EntityRecord, sign: int) -> None:
+        latitude = record.latitude
+        longitude = record.longitude
+        x, y = project(latitude, longitude)
+        for zoom, cells in enumerate(self.levels):
+            n = 2 ** (zoom + CELL_BITS)
+            key = (min(max(math.floor(x * n), 0), n - 1),
+                   min(max(math.floor(y * n), 0), n - 1))
+            try:
+                buckets = cells[key]
+            except KeyError:
+                buckets = cells[key] = {}
+            try:
+                bucket = buckets[record.status]
+            except KeyError:
+                bucket = buckets[record.status] = [0, 0.0, 0.0]
+            bucket[0] += sign
+            bucket[1] += sign * latitude
+            bucket[2] += sign * longitude
+            if not bucket[0]:
+                del buckets[record.status]
+                if not buckets:
+                    del cells[key]
+
+    def rebuild(self, records: typing.Iterable[EntityRecord]) -> None:
+        self.records = {}
+        self.levels = [{} for _ in range(self.max_zoom + 1)]
+        for record in records:
+            self.add(record)
+
+    def add(self, record: EntityRecord) -> None:
+        self.records[record.id] = record
+        self._apply(record, 1)
+
+    def discard(self, id: uuid.UUID) -> None:
+        record = self.records.pop(id, None)
+        if record is not None:
+            self._apply(record, -1)
+
+    def update(self, record: EntityRecord,
+               previous: typing.Optional[EntityRecord]) -> None:
+        self.discard(record.id)
+        self.add(record)
+
+    def clusters(
+        self, south: float, west: float, north: float, east: float,
+        zoom: int, *, status: typing.Optional[BusinessEntityStatus] = None
+    ) -> typing.List[Cluster]:
+        """The clusters at ``zoom`` of cells overlapping a bounding box.
+        Cells are taken as a whole, so clusters near the edges may count
+        entities slightly outside of the box.
+
+        """
+        zoom = min(max(zoom, 0), self.max_zoom)
+        cells = self.levels[zoom]
+        x_ranges, (y_lo, y_hi) = cluster_cells(zoom, south, west,
+                                               north, east)
+        area = sum(hi - lo + 1 for lo, hi in x_ranges) * (y_hi - y_lo + 1)
+        if area > len(cells):
+            keys = sorted(
+                (x, y) for x, y in cells
+                if y_lo <= y <= y_hi and
+                any(lo <= x <= hi for lo, hi in x_ranges)
+            )
+        else:
+            keys = [
+                (x, y)
+                for lo, hi in x_ranges
+                for x in range(lo, hi + 1)
+                for y in range(y_lo, y_hi + 1)
+                if (x, y) in cells
+            ]
+        clusters = (Cluster.from_buckets(cells[key], status) for key in keys)
+        return [c for c in clusters if c is not None]
+
+    def memory_usage(self) -> int:
+        """Estimate the bytes held by the aggregates, records excluded."""
+        size = sys.getsizeof(self.records) + sys.getsizeof(self.levels)
+        for cells in self.levels:
+            size += sys.getsizeof(cells)
+            for key, buckets in cells.items():
+                size += sys.getsizeof(key) + sys.getsizeof(buckets)
+                size += sum(map(sys.getsizeof, buckets.values()))
+        return size
+
+    def stats(self) -> typing.Mapping[str, typing.Any]:
+        return {
+            'entities': len(self.records),
+            'cells': sum(map(len, self.levels)),
+            'max_zoom': self.max_zoom,
+            'memory_usage': self.memory_usage()
+        }
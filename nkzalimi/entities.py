@@ -6,19 +6,18 @@ from geoalchemy2.types import Geometry
 from sqlalchemy.dialects.postgresql import JSON
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.ext.hybrid import hybrid_property
-from sqlalchemy.orm import backref, column_property, relationship
-from sqlalchemy.schema import (Column, ForeignKey, PrimaryKeyConstraint,
-                               UniqueConstraint)
-from sqlalchemy.sql import select
-from sqlalchemy.sql.expression import and_, null
-from sqlalchemy.sql.functions import count as sqlcount
-from sqlalchemy.types import Boolean, Enum, Integer, Numeric, String, Unicode
+from sqlalchemy.orm import backref, column_property, deferred, relationship
+from sqlalchemy.schema import (Column, ForeignKey, Index,
+                               PrimaryKeyConstraint, UniqueConstraint)
+from sqlalchemy.sql.expression import null
+from sqlalchemy.types import (Boolean, Enum, Float, Integer, Numeric, String,
+                              Unicode)
 from sqlalchemy_imageattach.entity import Image, image_attachment
 from sqlalchemy_utc import UtcDateTime, utcnow
 from sqlalchemy_utils import UUIDType
 
 from .orm import Base
-from .util import latlng_to_point
+from .util import coordinate_geography, latlng_to_point
 
 
 class OAuthProvider(enum.Enum):
@@ -134,7 +133,8 @@ class OAuthSession(Base):
     id = Column(String, primary_key=True)
     secret = Column(String, nullable=False)
 
-    created_at = Column(UtcDateTime, nullable=False, default=utcnow())
+    created_at = Column(UtcDateTime, nullable=False, default=utcnow(),
+                        index=True)
 
     __tablename__ = 'oauth_session'
 
@@ -178,8 +178,7 @@ class BusinessEntity(Base):
                                   foreign_keys=first_revision_id,
                                   post_update=True)
 
-    created_at = Column(UtcDateTime, nullable=False, default=utcnow(),
-                        index=True)
+    created_at = Column(UtcDateTime, nullable=False, default=utcnow())
 
     __tablename__ = 'business_entity'
 
@@ -215,16 +214,15 @@ class Request(Base):
     kind = Column(Enum(RequestKind, name='request_kind'),
                   nullable=False, index=True)
 
-    upvotes = column_property(
-        select([sqlcount(Poll.request_id)]).where(
-            and_(Poll.request_id == id, Poll.upvote.is_(True))
-        )
-    )
-    downvotes = column_property(
-        select([sqlcount(Poll.request_id)]).where(
-            and_(Poll.request_id == id, Poll.upvote.is_(False))
-        )
-    )
+    #: The number of upvoting :class:`Poll`\ s, kept by
+    #: :func:`~nkzalimi.poll.cast_votes()`.
+    upvotes = Column(Integer, nullable=False, default=0, server_default='0')
+    #: The number of downvoting :class:`Poll`\ s, kept by
+    #: :func:`~nkzalimi.poll.cast_votes()`.
+    downvotes = Column(Integer, nullable=False, default=0, server_default='0')
+    #: The :func:`~nkzalimi.util.wilson_score()` of the votes, which the
+    #: moderation queue is ranked by.
+    score = Column(Float, nullable=False, default=0.0, server_default='0')
 
     @hybrid_property
     def committed(self) -> bool:
@@ -235,6 +233,15 @@ class Request(Base):
         return cls.committed_at.isnot(None)
 
     __tablename__ = 'request'
+    __table_args__ = (
+        # Keys of the moderation queue, which only lists pending requests.
+        Index('ix_request_pending_score', score, id,
+              postgresql_where=committed_at.is_(None)),
+        Index('ix_request_pending_created_at', created_at, id,
+              postgresql_where=committed_at.is_(None)),
+        Index('ix_request_pending_kind', kind, created_at, id,
+              postgresql_where=committed_at.is_(None)),
+    )
     __mapper_args__ = {
         'polymorphic_on': 'kind'
     }
@@ -267,6 +274,8 @@ class CreationRequest(Request):
         new = BusinessEntity()
         new.latest_revision = revision
         new.first_revision = revision
+        new.current = CurrentBusinessEntity()
+        new.current.update(revision, self.latitude, self.longitude)
         return new
 
     __tablename__ = 'creation_request'
@@ -302,6 +311,9 @@ class MarkAsDuplicateRequest(Request):
             address_sub=latest.address_sub,
             coordinate=latest.coordinate
         )
+        business_entity.latest_revision = new
+        current = business_entity.current
+        current.update(new, current.latitude, current.longitude)
         return new
 
     __tablename__ = 'mark_as_duplicate_request'
@@ -325,29 +337,38 @@ class RevisionRequest(Request):
         assert not self.committed, 'This revision has already committed'
         business_entity = self.business_entity
         latest = business_entity.latest_revision
-        new = BusinessEntityRevision(
-            replacing=latest,
-            request=self,
-            name=latest.name,
-            category=latest.category,
-            status=latest.status,
-            address=latest.address,
-            address_sub=latest.address_sub,
-            coordinate=latest.coordinate
-        )
+        values = {
+            'name': latest.name,
+            'category': latest.category,
+            'status': latest.status,
+            'address': latest.address,
+            'address_sub': latest.address_sub,
+            'coordinate': latest.coordinate,
+        }
+        # Read the coordinate off the current state, since latest might be
+        # a pending revision if several are committed in a row.
+        latitude = business_entity.current.latitude
+        longitude = business_entity.current.longitude
+        # Check data before making the revision, since the revision
+        # cascades into the session along with the request once made.
         if self.revision_kind is RevisionKind.name:
-            new.name = self.data
+            values['name'] = self.data
         elif self.revision_kind == RevisionKind.category:
-            new.category = self.data
+            values['category'] = self.data
         elif self.revision_kind == RevisionKind.status:
-            new.status = BusinessEntityStatus(self.data)
+            values['status'] = BusinessEntityStatus(self.data)
         elif self.revision_kind is RevisionKind.location:
-            new.address = self.data['address']
-            new.address_sub = self.data['address_sub']
-            new.coordinate = latlng_to_point(
-                self.data['coordinate'][0], self.data['coordniate'][1]
-            )
+            try:
+                values['address'] = self.data['address']
+                values['address_sub'] = self.data['address_sub']
+                latitude = float(self.data['coordinate'][0])
+                longitude = float(self.data['coordinate'][1])
+            except (IndexError, KeyError, TypeError) as e:
+                raise ValueError(f'Invalid location: {self.data!r}') from e
+            values['coordinate'] = latlng_to_point(latitude, longitude)
+        new = BusinessEntityRevision(replacing=latest, request=self, **values)
         business_entity.latest_revision = new
+        business_entity.current.update(new, latitude, longitude)
         return new
 
     __tablename__ = 'revision_request'
@@ -404,3 +425,62 @@ class BusinessEntityRevision(Base):
 
     __tablename__ = 'business_entity_revision'
 
+
+class CurrentBusinessEntity(Base):
+    """The latest state of a business entity in one flat row, so that reads
+    need neither a join with :class:`BusinessEntityRevision` nor
+    ``ST_X()``/``ST_Y()`` calls.  It's kept up to date in the same
+    transaction that commits a revision; see :meth:`update()`.
+
+    """
+
+    id = Column(UUIDType, ForeignKey(BusinessEntity.id), primary_key=True)
+    business_entity = relationship(BusinessEntity, uselist=False,
+                                   backref=backref('current', uselist=False))
+
+    revision_id = Column(UUIDType, ForeignKey(BusinessEntityRevision.id),
+                         nullable=False, unique=True)
+    revision = relationship(BusinessEntityRevision, uselist=False)
+
+    name = Column(Unicode, nullable=False)
+    category = Column(Unicode, nullable=False)
+    status = Column(Enum(BusinessEntityStatus), nullable=False)
+
+    address = Column(Unicode, nullable=False)
+    address_sub = Column(Unicode, nullable=False)
+    # Only there for spatial predicates; reads use latitude/longitude.
+    coordinate = deferred(Column(
+        Geometry(geometry_type='POINT', spatial_index=False), nullable=False
+    ))
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+
+    created_at = Column(UtcDateTime, nullable=False, default=utcnow())
+    updated_at = Column(UtcDateTime, nullable=False, default=utcnow())
+
+    def update(self, revision: BusinessEntityRevision,
+               latitude: float, longitude: float) -> None:
+        """Make ``revision`` the current state.  As the coordinate of a
+        pending revision can't be read back before it's flushed, its
+        ``latitude`` and ``longitude`` have to be passed as well.
+
+        """
+        self.revision = revision
+        self.name = revision.name
+        self.category = revision.category
+        self.status = revision.status
+        self.address = revision.address
+        self.address_sub = revision.address_sub
+        self.coordinate = revision.coordinate
+        self.latitude = latitude
+        self.longitude = longitude
+        self.updated_at = utcnow()
+
+    __tablename__ = 'current_business_entity'
+    __table_args__ = (
+        Index('ix_current_business_entity_created_at_id', created_at, id),
+        Index('ix_current_business_entity_coordinate', coordinate,
+              postgresql_using='gist'),
+        Index('ix_current_business_entity_geography',
+              coordinate_geography(coordinate), postgresql_using='gist'),
+    )
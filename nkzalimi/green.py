@@ -0,0 +1,30 @@
+from gevent.socket import wait_read, wait_write
+from psycopg2 import OperationalError, extensions
+
+__all__ = 'gevent_wait_callback', 'make_psycopg2_green'
+
+
+def gevent_wait_callback(connection, timeout=None) -> None:
+    """Wait for ``connection`` to be ready by yielding to the gevent hub,
+    instead of blocking the whole process inside libpq.
+
+    """
+    while True:
+        state = connection.poll()
+        if state == extensions.POLL_OK:
+            break
+        elif state == extensions.POLL_READ:
+            wait_read(connection.fileno(), timeout=timeout)
+        elif state == extensions.POLL_WRITE:
+            wait_write(connection.fileno(), timeout=timeout)
+        else:
+            raise OperationalError(f'Bad result from poll: {state!r}')
+
+
+def make_psycopg2_green() -> None:
+    """Make every psycopg2 connection of the process cooperative with
+    gevent.  It can't be undone, and can't be used with psycopg2's own
+    asynchronous connections.
+
+    """
+    extensions.set_wait_callback(gevent_wait_callback)
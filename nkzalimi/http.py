@@ -0,0 +1,131 @@
+import collections
+import threading
+import time
+import typing
+
+from requests import RequestException, Response, Session
+from requests.adapters import HTTPAdapter
+from requests_oauthlib import OAuth1Session
+
+__all__ = 'HTTPClient', 'ProviderBusy', 'ProviderMetrics'
+
+
+class ProviderBusy(RequestException):
+    """Raised when too many requests to a provider are already in flight
+    for another one to wait its turn.
+
+    """
+
+
+class ProviderMetrics:
+    """Counts and recent latencies of requests to a provider."""
+
+    def __init__(self, window: int = 1024) -> None:
+        self.requests = self.errors = self.rejected = self.in_flight = 0
+        self.latencies: typing.Deque[float] = collections.deque(maxlen=window)
+
+    def stats(self) -> typing.Mapping[str, typing.Any]:
+        latencies = sorted(self.latencies)
+
+        def percentile(p: float) -> typing.Optional[float]:
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1,
+                                 int(len(latencies) * p))]
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'rejected': self.rejected,
+            'in_flight': self.in_flight,
+            'latency_p50': percentile(0.5),
+            'latency_p95': percentile(0.95),
+            'latency_max': latencies[-1] if latencies else None,
+        }
+
+
+class HTTPClient:
+    """Outbound HTTP requests to OAuth providers.  Connections are kept
+    alive in a pool shared by every request, every request times out,
+    and at most ``concurrency`` requests to each provider are in flight
+    at once, so that a slow provider can't tie up every greenlet.
+
+    :param connect_timeout: seconds to wait for a connection, and for a
+                            turn when a provider is busy
+    :param read_timeout: seconds to wait for each read of a response
+    :param pool_size: connections kept alive per host
+    :param concurrency: requests in flight per provider
+
+    """
+
+    def __init__(self, connect_timeout: float = 3.05,
+                 read_timeout: float = 10.0, pool_size: int = 10,
+                 concurrency: int = 20) -> None:
+        self.timeout = connect_timeout, read_timeout
+        self.concurrency = concurrency
+        self.adapter = HTTPAdapter(pool_connections=pool_size,
+                                   pool_maxsize=pool_size)
+        self.session = Session()
+        self.mount(self.session)
+        self.lock = threading.Lock()
+        self.semaphores: typing.Dict[str, threading.BoundedSemaphore] = {}
+        self.metrics: typing.Dict[str, ProviderMetrics] = {}
+
+    def mount(self, session: Session) -> None:
+        """Make ``session`` use the shared connection pool."""
+        session.mount('https://', self.adapter)
+        session.mount('http://', self.adapter)
+
+    def oauth1_session(self, **kwargs) -> OAuth1Session:
+        """Create an :class:`OAuth1Session` on the shared connection pool.
+        Requests through it should go through :meth:`request()` still.
+
+        """
+        session = OAuth1Session(**kwargs)
+        self.mount(session)
+        return session
+
+    def provider(
+        self, name: str
+    ) -> typing.Tuple[threading.BoundedSemaphore, ProviderMetrics]:
+        with self.lock:
+            try:
+                return self.semaphores[name], self.metrics[name]
+            except KeyError:
+                semaphore = threading.BoundedSemaphore(self.concurrency)
+                metrics = ProviderMetrics()
+                self.semaphores[name] = semaphore
+                self.metrics[name] = metrics
+                return semaphore, metrics
+
+    def request(self, provider: str, method: str, url: str, *,
+                session: typing.Optional[Session] = None,
+                **kwargs) -> Response:
+        """Send a request to ``provider`` through ``session``, or a plain
+        one if omitted.  Raises :exc:`requests.RequestException` on
+        timeouts and connection errors, and :exc:`ProviderBusy` if the
+        provider doesn't get a free slot in time.
+
+        """
+        semaphore, metrics = self.provider(provider)
+        if not semaphore.acquire(timeout=self.timeout[0]):
+            metrics.rejected += 1
+            raise ProviderBusy(f'Too many requests to {provider} in flight')
+        metrics.in_flight += 1
+        started_at = time.monotonic()
+        try:
+            response = (session or self.session).request(
+                method, url, timeout=self.timeout, **kwargs
+            )
+        except RequestException:
+            metrics.errors += 1
+            raise
+        finally:
+            metrics.in_flight -= 1
+            metrics.requests += 1
+            metrics.latencies.append(time.monotonic() - started_at)
+            semaphore.release()
+        return response
+
+    def stats(self) -> typing.Mapping[str, typing.Any]:
+        return {name: metrics.stats()
+                for name, metrics in self.metrics.items()}
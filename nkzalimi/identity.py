@@ -0,0 +1,155 @@
+import datetime
+import json
+import typing
+import uuid
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached, selectinload
+
+from .cache import CacheBackend, LRUCache
+from .entities import OAuthLogin, OAuthProvider, User
+
+__all__ = 'IdentityCache', 'restore_user', 'snapshot_user'
+
+
+def snapshot_user(user: User) -> typing.Mapping[str, typing.Any]:
+    """Turn ``user`` and its OAuth logins into plain JSON values."""
+    return {
+        'id': str(user.id),
+        'display_name': user.display_name,
+        'admin': user.admin,
+        'created_at': user.created_at.isoformat(),
+        'blocked_at': user.blocked_at and user.blocked_at.isoformat(),
+        'oauth_logins': [[str(l.id), l.provider.value, l.uid]
+                         for l in user.oauth_logins],
+    }
+
+
+def restore_user(snapshot: typing.Mapping[str, typing.Any]) -> User:
+    """Turn a :func:`snapshot_user()` back into a detached :class:`User`,
+    which can be put into a session without querying it.
+
+    """
+    user = User(
+        id=uuid.UUID(snapshot['id']),
+        display_name=snapshot['display_name'],
+        admin=snapshot['admin'],
+        created_at=datetime.datetime.fromisoformat(snapshot['created_at']),
+        blocked_at=snapshot['blocked_at'] and
+        datetime.datetime.fromisoformat(snapshot['blocked_at'])
+    )
+    user.oauth_logins = [
+        OAuthLogin(id=uuid.UUID(id), user_id=user.id,
+                   provider=OAuthProvider(provider), uid=uid)
+        for id, provider, uid in snapshot['oauth_logins']
+    ]
+    for instance in (user, *user.oauth_logins):
+        make_transient_to_detached(instance)
+    return user
+
+
+class IdentityCache:
+    """Users along with their OAuth logins, so that authenticated requests
+    don't have to query them.  Users are kept in an in-process
+    :class:`LRUCache`, and in a ``shared`` :class:`CacheBackend` if any.
+
+    Once :meth:`watch()`\\ ed sessions commit changes to a user or its
+    logins, e.g. blocking it, the user is dropped from this process and
+    the shared tier right away.  Other processes may keep their copy for
+    up to ``ttl`` seconds, so keep it short.
+
+    """
+
+    def __init__(self, maxsize: int = 4096, ttl: float = 5.0,
+                 shared: typing.Optional[CacheBackend] = None,
+                 shared_ttl: float = 300.0, prefix: str = 'user') -> None:
+        self.local = LRUCache(maxsize, ttl)
+        self.shared = shared
+        self.shared_ttl = shared_ttl
+        self.prefix = prefix
+        self.invalidations = 0
+
+    def key(self, id: uuid.UUID) -> str:
+        return f'{self.prefix}:{id}'
+
+    def load(self, session: Session, id: uuid.UUID) -> typing.Optional[User]:
+        """Load a user into ``session``, from the cache if possible."""
+        snapshot = self.local.get(id)
+        if snapshot is None and self.shared is not None:
+            data = self.shared.get(self.key(id))
+            if data is not None:
+                snapshot = json.loads(data.decode('utf-8'))
+                self.local.set(id, snapshot)
+        if snapshot is not None:
+            return session.merge(restore_user(snapshot), load=False)
+        user = session.query(User) \
+            .options(selectinload(User.oauth_logins)) \
+            .filter_by(id=id) \
+            .one_or_none()
+        if user is not None:
+            snapshot = snapshot_user(user)
+            self.local.set(id, snapshot)
+            if self.shared is not None:
+                self.shared.set(self.key(id),
+                                json.dumps(snapshot).encode('utf-8'),
+                                self.shared_ttl)
+        return user
+
+    def invalidate(self, ids: typing.Iterable[uuid.UUID]) -> None:
+        ids = list(ids)
+        for id in ids:
+            if self.local.delete(id):
+                self.invalidations += 1
+        if ids and self.shared is not None:
+            self.shared.delete([self.key(id) for id in ids])
+
+    def watch(self, session_class: typing.Type[Session]) -> None:
+        """Invalidate users changed through sessions of ``session_class``
+        once they commit.
+
+        """
+        event.listen(session_class, 'before_flush', self._collect_users)
+        event.listen(session_class, 'after_flush', self._collect_logins)
+        event.listen(session_class, 'after_commit', self._commit)
+        event.listen(session_class, 'after_rollback', self._rollback)
+
+    def _collect_users(self, session: Session, flush_context,
+                       instances) -> None:
+        # Before the flush, as it expires attributes set to SQL
+        # expressions, e.g. blocked_at = utcnow(), which is_modified()
+        # then no longer sees.
+        ids = session.info.setdefault('changed_users', set())
+        for instance in session.dirty:
+            if isinstance(instance, User) and \
+               session.is_modified(instance, include_collections=False):
+                ids.add(instance.id)
+        for instance in session.deleted:
+            if isinstance(instance, User):
+                ids.add(instance.id)
+
+    def _collect_logins(self, session: Session, flush_context) -> None:
+        # After the flush, which fills in the user_id of new logins.  The
+        # session still lists what's just been flushed.
+        ids = session.info.setdefault('changed_users', set())
+        for instance in (*session.new, *session.dirty, *session.deleted):
+            if isinstance(instance, OAuthLogin):
+                ids.add(instance.user_id)
+
+    def _commit(self, session: Session) -> None:
+        # Savepoints fire after_commit as well, but nothing is visible to
+        # other sessions until the outermost transaction commits.
+        if session.transaction.nested:
+            return
+        ids = session.info.pop('changed_users', None)
+        if ids:
+            self.invalidate(ids)
+
+    def _rollback(self, session: Session) -> None:
+        # Users changed in a savepoint rolled back are left to be
+        # invalidated with the rest; invalidating too many is harmless.
+        if session.transaction.nested:
+            return
+        session.info.pop('changed_users', None)
+
+    def stats(self) -> typing.Mapping[str, typing.Any]:
+        return {**self.local.stats(), 'invalidations': self.invalidations}
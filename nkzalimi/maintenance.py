@@ -0,0 +1,126 @@
+import typing
+import uuid
+
+from geoalchemy2.functions import ST_X, ST_Y
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.sql.expression import case, or_
+from sqlalchemy.sql.functions import coalesce, count, sum as sqlsum
+
+from .entities import (BusinessEntity, BusinessEntityRevision,
+                       CurrentBusinessEntity, Poll, Request)
+from .util import wilson_score
+
+__all__ = ('check_current_business_entities', 'check_vote_counts',
+           'repair_current_business_entities', 'repair_vote_counts')
+
+
+def check_current_business_entities(
+    session: Session
+) -> typing.Iterator[typing.Tuple[uuid.UUID, str]]:
+    """Find business entities whose :class:`CurrentBusinessEntity` row is
+    missing or disagrees with their latest revision.  Yields pairs of
+    an entity id and either ``'missing'`` or ``'stale'``.
+
+    """
+    current = aliased(CurrentBusinessEntity)
+    missing = session.query(BusinessEntity.id) \
+        .outerjoin(current, current.id == BusinessEntity.id) \
+        .filter(current.id.is_(None))
+    for id, in missing.yield_per(1000):
+        yield id, 'missing'
+    latest = aliased(BusinessEntityRevision)
+    stale = session.query(current.id) \
+        .join(BusinessEntity, BusinessEntity.id == current.id) \
+        .join(latest, latest.id == BusinessEntity.latest_revision_id) \
+        .filter(or_(
+            current.revision_id != latest.id,
+            current.name != latest.name,
+            current.category != latest.category,
+            current.status != latest.status,
+            current.address != latest.address,
+            current.address_sub != latest.address_sub,
+            current.latitude != ST_X(latest.coordinate),
+            current.longitude != ST_Y(latest.coordinate),
+            current.created_at != BusinessEntity.created_at
+        ))
+    for id, in stale.yield_per(1000):
+        yield id, 'stale'
+
+
+def repair_current_business_entities(
+    session: Session, ids: typing.Iterable[uuid.UUID]
+) -> None:
+    """Rewrite the :class:`CurrentBusinessEntity` rows of the given
+    entities from their latest revisions.  Doesn't commit.
+
+    """
+    for id in ids:
+        entity = session.query(BusinessEntity).get(id)
+        latest = entity.latest_revision
+        if entity.current is None:
+            entity.current = CurrentBusinessEntity()
+        entity.current.update(latest, latest.latitude, latest.longitude)
+        entity.current.created_at = entity.created_at
+
+
+def count_votes(session: Session):
+    """A subquery of the actual ``upvotes`` and ``downvotes`` of each
+    ``request_id`` with any :class:`Poll`.
+
+    """
+    return session.query(
+        Poll.request_id,
+        sqlsum(case([(Poll.upvote, 1)], else_=0)).label('upvotes'),
+        sqlsum(case([(Poll.upvote, 0)], else_=1)).label('downvotes')
+    ).group_by(Poll.request_id).subquery()
+
+
+def check_vote_counts(
+    session: Session
+) -> typing.Iterator[typing.Tuple[uuid.UUID, int, int, float,
+                                  int, int, float]]:
+    """Find requests whose stored vote counts or score disagree with their
+    polls.  Yields tuples of a request id, the stored upvotes, downvotes
+    and score, and the actual upvotes and downvotes and the score of them.
+
+    """
+    votes = count_votes(session)
+    upvotes = coalesce(votes.c.upvotes, 0)
+    downvotes = coalesce(votes.c.downvotes, 0)
+    score = wilson_score(upvotes, downvotes)
+    rows = session.query(Request.id, Request.upvotes, Request.downvotes,
+                         Request.score, upvotes, downvotes, score) \
+        .outerjoin(votes, votes.c.request_id == Request.id) \
+        .filter(or_(Request.upvotes != upvotes,
+                    Request.downvotes != downvotes,
+                    Request.score != score))
+    for row in rows.yield_per(1000):
+        yield tuple(row)
+
+
+def repair_vote_counts(session: Session,
+                       ids: typing.Iterable[uuid.UUID]) -> None:
+    """Recount the votes of the given requests from their polls.  The
+    requests stay locked until the transaction ends, so that votes cast
+    meanwhile are counted on top of the recount.  Doesn't commit.
+
+    """
+    ids = list(ids)
+    if not ids:
+        return
+    session.query(Request.id) \
+        .filter(Request.id.in_(ids)) \
+        .with_for_update() \
+        .all()
+    for id in ids:
+        polls = session.query(Poll.upvote, count()) \
+            .filter(Poll.request_id == id) \
+            .group_by(Poll.upvote)
+        tally = dict(polls.all())
+        upvotes, downvotes = tally.get(True, 0), tally.get(False, 0)
+        session.query(Request).filter(Request.id == id).update(
+            {Request.upvotes: upvotes,
+             Request.downvotes: downvotes,
+             Request.score: wilson_score(upvotes, downvotes)},
+            synchronize_session=False
+        )
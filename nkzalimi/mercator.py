@@ -0,0 +1,80 @@
+import math
+import typing
+
+__all__ = ('EARTH_RADIUS', 'MAX_LATITUDE', 'project', 'tile_bounds',
+           'tile_envelope', 'tile_of', 'tile_ranges', 'unproject')
+
+
+#: Web Mercator leaves out the poles beyond this latitude.
+MAX_LATITUDE = 85.0511287798066
+
+#: The radius of the sphere Web Mercator (EPSG:3857) projects, in meters.
+EARTH_RADIUS = 6378137.0
+
+
+def project(latitude: float, longitude: float) -> typing.Tuple[float, float]:
+    """Project a point to Web Mercator, scaled so that the whole world is
+    the unit square with ``(0, 0)`` at the north-west corner.
+
+    """
+    latitude = max(-MAX_LATITUDE, min(MAX_LATITUDE, latitude))
+    sin_lat = math.sin(math.radians(latitude))
+    y = 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return (longitude + 180.0) / 360.0, y
+
+
+def unproject(x: float, y: float) -> typing.Tuple[float, float]:
+    """The inverse of :func:`project()`."""
+    return (math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y)))),
+            x * 360.0 - 180.0)
+
+
+def tile_of(zoom: int, latitude: float,
+            longitude: float) -> typing.Tuple[int, int]:
+    """The ``(x, y)`` of the tile at ``zoom`` containing a point."""
+    n = 2 ** zoom
+    x, y = project(latitude, longitude)
+    return (min(max(math.floor(x * n), 0), n - 1),
+            min(max(math.floor(y * n), 0), n - 1))
+
+
+def tile_bounds(zoom: int, x: int, y: int,
+                buffer: float = 0.0) -> typing.Tuple[float, float,
+                                                     float, float]:
+    """The ``(south, west, north, east)`` of a tile, in degrees.
+
+    :param buffer: how much to grow the tile by on each side, as
+                   a fraction of its edge
+
+    """
+    n = 2 ** zoom
+    south, west = unproject((x - buffer) / n, (y + 1 + buffer) / n)
+    north, east = unproject((x + 1 + buffer) / n, (y - buffer) / n)
+    return south, west, north, east
+
+
+def tile_envelope(zoom: int, x: int,
+                  y: int) -> typing.Tuple[float, float, float, float]:
+    """The ``(xmin, ymin, xmax, ymax)`` of a tile in EPSG:3857 meters."""
+    size = 2 * math.pi * EARTH_RADIUS / 2 ** zoom
+    origin = math.pi * EARTH_RADIUS
+    return (x * size - origin, origin - (y + 1) * size,
+            (x + 1) * size - origin, origin - y * size)
+
+
+def tile_ranges(
+    zoom: int, south: float, west: float, north: float, east: float
+) -> typing.Tuple[typing.Sequence[typing.Tuple[int, int]],
+                  typing.Tuple[int, int]]:
+    """The tiles at ``zoom`` overlapping a bounding box, as inclusive
+    ranges of ``x`` and a range of ``y``.  There are two ranges of ``x``
+    when the box crosses the antimeridian, i.e. ``west > east``.
+
+    """
+    x_lo, y_lo = tile_of(zoom, north, west)
+    x_hi, y_hi = tile_of(zoom, south, east)
+    if west > east:
+        x_ranges = [(x_lo, 2 ** zoom - 1), (0, x_hi)]
+    else:
+        x_ranges = [(x_lo, x_hi)]
+    return x_ranges, (y_lo, y_hi)
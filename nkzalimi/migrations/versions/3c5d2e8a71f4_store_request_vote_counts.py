@@ -0,0 +1,40 @@
+"""Store request vote counts
+
+Revision ID: 3c5d2e8a71f4
+Revises: 9f660b847b5e
+Create Date: 2019-05-02 22:14:37.604118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c5d2e8a71f4'
+down_revision = '9f660b847b5e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('request', sa.Column('upvotes', sa.Integer(),
+                                       server_default='0', nullable=False))
+    op.add_column('request', sa.Column('downvotes', sa.Integer(),
+                                       server_default='0', nullable=False))
+    op.execute('''
+        UPDATE request
+        SET upvotes = p.upvotes, downvotes = p.downvotes
+        FROM (
+            SELECT request_id,
+                   count(*) FILTER (WHERE upvote) AS upvotes,
+                   count(*) FILTER (WHERE NOT upvote) AS downvotes
+            FROM poll
+            GROUP BY request_id
+        ) AS p
+        WHERE p.request_id = request.id
+    ''')
+
+
+def downgrade():
+    op.drop_column('request', 'downvotes')
+    op.drop_column('request', 'upvotes')
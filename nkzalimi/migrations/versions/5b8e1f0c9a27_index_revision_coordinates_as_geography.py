@@ -0,0 +1,32 @@
+"""Index revision coordinates as geography
+
+Revision ID: 5b8e1f0c9a27
+Revises: d235ff7a4e51
+Create Date: 2019-04-24 19:31:05.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b8e1f0c9a27'
+down_revision = 'd235ff7a4e51'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Must be the same expression as nkzalimi.util.coordinate_geography()
+    # or the planner won't pick the index up.
+    op.execute(
+        'CREATE INDEX ix_business_entity_revision_geography '
+        'ON business_entity_revision USING gist ('
+        'CAST(ST_SetSRID(ST_MakePoint(ST_Y(coordinate), ST_X(coordinate)), '
+        '4326) AS geography(POINT,4326)))'
+    )
+
+
+def downgrade():
+    op.drop_index('ix_business_entity_revision_geography',
+                  table_name='business_entity_revision')
@@ -0,0 +1,47 @@
+"""Rank pending requests
+
+Revision ID: 7e2b9c4d15a3
+Revises: 3c5d2e8a71f4
+Create Date: 2019-05-04 16:27:05.318842
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e2b9c4d15a3'
+down_revision = '3c5d2e8a71f4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('request', sa.Column('score', sa.Float(),
+                                       server_default='0', nullable=False))
+    # The lower bound of the Wilson score interval at 95% confidence; see
+    # also nkzalimi.util.wilson_score().
+    op.execute('''
+        UPDATE request
+        SET score = (upvotes + 1.9208 -
+                     1.96 * sqrt(upvotes::float8 * downvotes /
+                                 (upvotes + downvotes) + 0.9604)) /
+                    (upvotes + downvotes + 3.8416)
+        WHERE upvotes + downvotes > 0
+    ''')
+    pending = sa.text('committed_at IS NULL')
+    op.create_index('ix_request_pending_score', 'request',
+                    ['score', 'id'], unique=False, postgresql_where=pending)
+    op.create_index('ix_request_pending_created_at', 'request',
+                    ['created_at', 'id'], unique=False,
+                    postgresql_where=pending)
+    op.create_index('ix_request_pending_kind', 'request',
+                    ['kind', 'created_at', 'id'], unique=False,
+                    postgresql_where=pending)
+
+
+def downgrade():
+    op.drop_index('ix_request_pending_kind', table_name='request')
+    op.drop_index('ix_request_pending_created_at', table_name='request')
+    op.drop_index('ix_request_pending_score', table_name='request')
+    op.drop_column('request', 'score')
@@ -0,0 +1,98 @@
+"""Add current_business_entity
+
+Revision ID: 9f660b847b5e
+Revises: 5b8e1f0c9a27
+Create Date: 2019-04-27 16:02:44.903517
+
+"""
+from alembic import op
+from geoalchemy2.types import Geometry
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from sqlalchemy_utc import UtcDateTime
+from sqlalchemy_utils import UUIDType
+
+# revision identifiers, used by Alembic.
+revision = '9f660b847b5e'
+down_revision = '5b8e1f0c9a27'
+branch_labels = None
+depends_on = None
+
+
+business_entity_status = postgresql.ENUM(
+    'kids_exclusive', 'kids_exclusive_withdrawn',
+    'kids_friendly', 'out_of_business', 'paused',
+    'duplicate', name='business_entity_status', create_type=False
+)
+
+BACKFILL_BATCH_SIZE = 10000
+BACKFILL = '''
+    INSERT INTO current_business_entity (
+        id, revision_id, name, category, status, address, address_sub,
+        coordinate, latitude, longitude, created_at, updated_at
+    )
+    SELECT e.id, r.id, r.name, r.category, r.status, r.address,
+           r.address_sub, r.coordinate, ST_X(r.coordinate),
+           ST_Y(r.coordinate), e.created_at, r.created_at
+    FROM business_entity AS e
+    JOIN business_entity_revision AS r ON r.id = e.latest_revision_id
+    WHERE e.id > :after
+    ORDER BY e.id
+    LIMIT :limit
+    RETURNING id
+'''
+
+
+def upgrade():
+    op.create_table(
+        'current_business_entity',
+        sa.Column('id', UUIDType, nullable=False),
+        sa.Column('revision_id', UUIDType, nullable=False),
+        sa.Column('name', sa.Unicode(), nullable=False),
+        sa.Column('category', sa.Unicode(), nullable=False),
+        sa.Column('status', business_entity_status, nullable=False),
+        sa.Column('address', sa.Unicode(), nullable=False),
+        sa.Column('address_sub', sa.Unicode(), nullable=False),
+        sa.Column('coordinate',
+                  Geometry(geometry_type='POINT', spatial_index=False),
+                  nullable=False),
+        sa.Column('latitude', sa.Float(), nullable=False),
+        sa.Column('longitude', sa.Float(), nullable=False),
+        sa.Column('created_at', UtcDateTime, nullable=False),
+        sa.Column('updated_at', UtcDateTime, nullable=False),
+        sa.ForeignKeyConstraint(['id'], ['business_entity.id'], ),
+        sa.ForeignKeyConstraint(['revision_id'],
+                                ['business_entity_revision.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('revision_id')
+    )
+    # Backfill in batches of entity ids before building indices, so that
+    # no single statement has to materialize the whole table.
+    bind = op.get_bind()
+    after = '00000000-0000-0000-0000-000000000000'
+    while True:
+        ids = [
+            str(id) for id, in bind.execute(
+                sa.text(BACKFILL), after=after, limit=BACKFILL_BATCH_SIZE
+            )
+        ]
+        if not ids:
+            break
+        after = max(ids)
+    op.create_index('ix_current_business_entity_created_at_id',
+                    'current_business_entity', ['created_at', 'id'],
+                    unique=False)
+    op.create_index('ix_current_business_entity_coordinate',
+                    'current_business_entity', ['coordinate'],
+                    unique=False, postgresql_using='gist')
+    # Must be the same expression as nkzalimi.util.coordinate_geography().
+    op.execute(
+        'CREATE INDEX ix_current_business_entity_geography '
+        'ON current_business_entity USING gist ('
+        'CAST(ST_SetSRID(ST_MakePoint(ST_Y(coordinate), ST_X(coordinate)), '
+        '4326) AS geography(POINT,4326)))'
+    )
+
+
+def downgrade():
+    op.drop_table('current_business_entity')
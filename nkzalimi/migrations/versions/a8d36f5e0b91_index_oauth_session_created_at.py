@@ -0,0 +1,26 @@
+"""Index oauth_session created_at
+
+Revision ID: a8d36f5e0b91
+Revises: 7e2b9c4d15a3
+Create Date: 2019-05-07 20:51:13.482207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8d36f5e0b91'
+down_revision = '7e2b9c4d15a3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(op.f('ix_oauth_session_created_at'), 'oauth_session',
+                    ['created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_oauth_session_created_at'),
+                  table_name='oauth_session')
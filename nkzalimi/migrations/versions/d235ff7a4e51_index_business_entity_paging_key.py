@@ -0,0 +1,30 @@
+"""Index business entity paging key
+
+Revision ID: d235ff7a4e51
+Revises: 4ae1d69d65ff
+Create Date: 2019-04-23 21:08:42.517390
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd235ff7a4e51'
+down_revision = '4ae1d69d65ff'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_business_entity_created_at_id', 'business_entity',
+                    ['created_at', 'id'], unique=False)
+    op.drop_index('ix_business_entity_created_at',
+                  table_name='business_entity')
+
+
+def downgrade():
+    op.create_index('ix_business_entity_created_at', 'business_entity',
+                    ['created_at'], unique=False)
+    op.drop_index('ix_business_entity_created_at_id',
+                  table_name='business_entity')
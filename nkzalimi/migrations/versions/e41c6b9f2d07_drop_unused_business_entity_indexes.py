@@ -0,0 +1,36 @@
+"""Drop unused business entity indexes
+
+Revision ID: e41c6b9f2d07
+Revises: a8d36f5e0b91
+Create Date: 2019-05-09 21:36:52.190473
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e41c6b9f2d07'
+down_revision = 'a8d36f5e0b91'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Listings are paged and searched by radius on current_business_entity,
+    # which has indexes of its own, so nothing reads these anymore.
+    op.drop_index('ix_business_entity_revision_geography',
+                  table_name='business_entity_revision')
+    op.drop_index('ix_business_entity_created_at_id',
+                  table_name='business_entity')
+
+
+def downgrade():
+    op.create_index('ix_business_entity_created_at_id', 'business_entity',
+                    ['created_at', 'id'], unique=False)
+    op.execute(
+        'CREATE INDEX ix_business_entity_revision_geography '
+        'ON business_entity_revision USING gist ('
+        'CAST(ST_SetSRID(ST_MakePoint(ST_Y(coordinate), ST_X(coordinate)), '
+        '4326) AS geography(POINT,4326)))'
+    )
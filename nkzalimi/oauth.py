@@ -0,0 +1,171 @@
+import datetime
+import logging
+import threading
+import time
+import typing
+
+import gevent
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import select
+
+from .cache import CacheBackend
+from .entities import OAuthSession
+
+__all__ = ('DatabaseOAuthSessionStore', 'MemoryOAuthSessionStore',
+           'OAuthSessionStore', 'SharedOAuthSessionStore', 'sweep_forever')
+
+
+class OAuthSessionStore:
+    """Where the secrets of pending OAuth 1 request tokens are kept between
+    the redirect to a provider and its callback.  Logins which are never
+    completed expire ``ttl`` seconds later.
+
+    """
+
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+
+    def put(self, session: Session, token: str, secret: str) -> None:
+        """Keep the ``secret`` of ``token``.  Changes made to ``session``
+        have to be committed.
+
+        """
+        raise NotImplementedError('put() has to be implemented')
+
+    def pop(self, session: Session, token: str) -> typing.Optional[str]:
+        """Take the secret of ``token`` out, or :const:`None` if it's
+        unknown or expired.  Changes made to ``session`` have to be
+        committed.
+
+        """
+        raise NotImplementedError('pop() has to be implemented')
+
+    def sweep(self, session: Session, batch_size: int) -> int:
+        """Delete expired secrets, at most ``batch_size`` at a time, and
+        return how many were deleted.
+
+        """
+        raise NotImplementedError('sweep() has to be implemented')
+
+
+class DatabaseOAuthSessionStore(OAuthSessionStore):
+    """Keeps secrets as :class:`OAuthSession` rows."""
+
+    def cutoff(self) -> datetime.datetime:
+        return datetime.datetime.now(datetime.timezone.utc) - \
+            datetime.timedelta(seconds=self.ttl)
+
+    def put(self, session: Session, token: str, secret: str) -> None:
+        session.add(OAuthSession(id=token, secret=secret))
+
+    def pop(self, session: Session, token: str) -> typing.Optional[str]:
+        # Deleting and reading in one statement lets a token be used once.
+        table = OAuthSession.__table__
+        return session.execute(
+            table.delete()
+            .where(table.c.id == token)
+            .where(table.c.created_at > self.cutoff())
+            .returning(table.c.secret)
+        ).scalar()
+
+    def sweep(self, session: Session, batch_size: int) -> int:
+        table = OAuthSession.__table__
+        deleted = 0
+        while True:
+            # Bounded batches keep locks and transactions short; rows
+            # locked by a callback in progress are left for later.
+            expired = select([table.c.id]) \
+                .where(table.c.created_at <= self.cutoff()) \
+                .order_by(table.c.created_at) \
+                .limit(batch_size) \
+                .with_for_update(skip_locked=True)
+            count = session.execute(
+                table.delete().where(table.c.id.in_(expired))
+            ).rowcount
+            session.commit()
+            deleted += count
+            if count < batch_size:
+                return deleted
+
+
+class MemoryOAuthSessionStore(OAuthSessionStore):
+    """Keeps secrets in a dictionary.  Only fit for a single process, as
+    the callback of a login may reach another one.
+
+    """
+
+    def __init__(self, ttl: float) -> None:
+        super().__init__(ttl)
+        self.secrets: typing.Dict[str, typing.Tuple[str, float]] = {}
+        self.lock = threading.Lock()
+
+    def put(self, session: Session, token: str, secret: str) -> None:
+        with self.lock:
+            self.secrets[token] = secret, time.monotonic() + self.ttl
+
+    def pop(self, session: Session, token: str) -> typing.Optional[str]:
+        with self.lock:
+            secret, expires_at = self.secrets.pop(token, (None, 0.0))
+        return secret if expires_at > time.monotonic() else None
+
+    def sweep(self, session: Session, batch_size: int) -> int:
+        now = time.monotonic()
+        with self.lock:
+            expired = [token
+                       for token, (_, expires_at) in self.secrets.items()
+                       if expires_at <= now]
+            for token in expired:
+                del self.secrets[token]
+        return len(expired)
+
+
+class SharedOAuthSessionStore(OAuthSessionStore):
+    """Keeps secrets in a :class:`~nkzalimi.cache.CacheBackend`, which
+    expires them by itself.
+
+    """
+
+    def __init__(self, ttl: float, backend: CacheBackend,
+                 prefix: str = 'oauth_session') -> None:
+        super().__init__(ttl)
+        self.backend = backend
+        self.prefix = prefix
+
+    def key(self, token: str) -> str:
+        return f'{self.prefix}:{token}'
+
+    def put(self, session: Session, token: str, secret: str) -> None:
+        self.backend.set(self.key(token), secret.encode('utf-8'), self.ttl)
+
+    def pop(self, session: Session, token: str) -> typing.Optional[str]:
+        key = self.key(token)
+        secret = self.backend.get(key)
+        if secret is None:
+            return None
+        self.backend.delete([key])
+        return secret.decode('utf-8')
+
+    def sweep(self, session: Session, batch_size: int) -> int:
+        return 0
+
+
+def sweep_forever(store: OAuthSessionStore,
+                  create_session: typing.Callable[[], Session],
+                  interval: float, batch_size: int) -> None:
+    """Sweep ``store`` every ``interval`` seconds.  Meant to be spawned as
+    a greenlet.
+
+    """
+    logger = logging.getLogger(__name__ + '.sweep_forever')
+    while True:
+        gevent.sleep(interval)
+        session = create_session()
+        try:
+            deleted = store.sweep(session, batch_size)
+        except Exception:
+            logger.exception('Failed to sweep expired OAuth sessions')
+        else:
+            if deleted:
+                logger.info('%d expired OAuth sessions deleted', deleted)
+        finally:
+            session.close()
@@ -1,12 +1,17 @@
+import contextlib
+import typing
+
 from alembic.command import downgrade, stamp
 from alembic.config import Config
 from alembic.environment import EnvironmentContext
 from alembic.script import ScriptDirectory
+from sqlalchemy import event
 from sqlalchemy.engine.base import Engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-__all__ = ('Base', 'Session', 'downgrade_database', 'get_alembic_config',
+__all__ = ('Base', 'Session', 'assert_query_count', 'count_queries',
+           'downgrade_database', 'get_alembic_config',
            'get_database_revision', 'initialize_database')
 
 
@@ -52,3 +57,38 @@ def get_database_revision(engine):
 def downgrade_database(engine, revision):
     config = get_alembic_config(engine)
     downgrade(config, revision)
+
+
+@contextlib.contextmanager
+def count_queries(engine: Engine) -> typing.Iterator[typing.List[str]]:
+    """Record the SQL statements run on ``engine`` within the block, into
+    the list it gives.
+
+    """
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context,
+                              executemany):
+        statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+@contextlib.contextmanager
+def assert_query_count(engine: Engine, expected: int) -> typing.Iterator[None]:
+    """Assert that exactly ``expected`` SQL statements run on ``engine``
+    within the block, e.g. to pin down how many queries an endpoint needs
+    regardless of how many rows it returns.
+
+    """
+    with count_queries(engine) as statements:
+        yield
+    if len(statements) != expected:
+        raise AssertionError(
+            '{} queries were expected, but {} ran:\n\n{}'.format(
+                expected, len(statements), '\n\n'.join(statements)
+            )
+        )
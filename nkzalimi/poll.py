@@ -0,0 +1,135 @@
+import typing
+import uuid
+
+from gevent import Greenlet, spawn_later
+from gevent.event import AsyncResult
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import select
+from sqlalchemy.sql.expression import case, literal_column
+from sqlalchemy.sql.functions import sum as sqlsum
+
+from .entities import Poll, Request
+from .util import wilson_score
+
+__all__ = 'Vote', 'VoteBuffer', 'cast_votes'
+
+
+class Vote(typing.NamedTuple):
+
+    user_id: uuid.UUID
+    request_id: uuid.UUID
+    upvote: bool
+
+
+def cast_votes(session: Session, votes: typing.Sequence[Vote]) -> None:
+    """Write ``votes`` and count them into :attr:`Request.upvotes`,
+    :attr:`Request.downvotes` and :attr:`Request.score`, all in a single
+    statement.  Polls are upserted; one which already has the same vote
+    is left alone and counted for nothing.  No two ``votes`` may share a
+    user and a request.  Doesn't commit.
+
+    """
+    if not votes:
+        return
+    poll = Poll.__table__
+    request = Request.__table__
+    # Keep the lock order the same across concurrent statements.
+    votes = sorted(votes, key=lambda v: (v.request_id, v.user_id))
+    upsert = insert(poll).values([v._asdict() for v in votes])
+    upsert = upsert.on_conflict_do_update(
+        index_elements=[poll.c.user_id, poll.c.request_id],
+        set_={'upvote': upsert.excluded.upvote},
+        where=poll.c.upvote.is_distinct_from(upsert.excluded.upvote)
+    ).returning(
+        poll.c.request_id, poll.c.upvote,
+        # A row inserted rather than updated has no xmax.
+        (literal_column('xmax') == 0).label('inserted')
+    ).cte('vote')
+    # A vote is either new, or flipped from the opposite one.
+    delta = select([
+        upsert.c.request_id,
+        sqlsum(case([(upsert.c.upvote, 1), (upsert.c.inserted, 0)],
+                    else_=-1)).label('upvotes'),
+        sqlsum(case([(~upsert.c.upvote, 1), (upsert.c.inserted, 0)],
+                    else_=-1)).label('downvotes'),
+    ]).group_by(upsert.c.request_id).alias('delta')
+    upvotes = request.c.upvotes + delta.c.upvotes
+    downvotes = request.c.downvotes + delta.c.downvotes
+    session.execute(
+        request.update()
+        .values(upvotes=upvotes, downvotes=downvotes,
+                score=wilson_score(upvotes, downvotes))
+        .where(request.c.id == delta.c.request_id)
+    )
+
+
+class VoteBuffer:
+    """Collects votes cast by concurrent greenlets for ``interval``
+    seconds, and writes them together through :func:`cast_votes()` in a
+    session of its own.  A batch is written early once it has
+    ``max_size`` votes.
+
+    """
+
+    def __init__(self, create_session: typing.Callable[[], Session],
+                 interval: float, max_size: int) -> None:
+        self.create_session = create_session
+        self.interval = interval
+        self.max_size = max_size
+        self.pending: typing.Dict[typing.Tuple[uuid.UUID, uuid.UUID],
+                                  bool] = {}
+        self.result = AsyncResult()
+        self.flusher: typing.Optional[Greenlet] = None
+        self.votes = self.batches = self.errors = self.largest = 0
+
+    def cast(self, user_id: uuid.UUID, request_id: uuid.UUID,
+             upvote: bool) -> None:
+        """Queue a vote, and block the current greenlet until its batch
+        is committed.  If the batch fails, every vote in it raises the
+        same error.  A later vote on the same request by the same user
+        within a batch replaces the earlier one.
+
+        """
+        self.pending[user_id, request_id] = upvote
+        result = self.result
+        if len(self.pending) >= self.max_size:
+            if self.flusher is not None:
+                self.flusher.kill(block=False)
+            self.flush()
+        elif self.flusher is None:
+            self.flusher = spawn_later(self.interval, self.flush)
+        result.get()
+
+    def flush(self) -> None:
+        pending, result = self.pending, self.result
+        self.pending = {}
+        self.result = AsyncResult()
+        self.flusher = None
+        if not pending:
+            result.set(None)
+            return
+        votes = [Vote(user_id, request_id, upvote)
+                 for (user_id, request_id), upvote in pending.items()]
+        session = self.create_session()
+        try:
+            cast_votes(session, votes)
+            session.commit()
+        except Exception as e:
+            self.errors += 1
+            result.set_exception(e)
+        else:
+            self.votes += len(votes)
+            self.batches += 1
+            self.largest = max(self.largest, len(votes))
+            result.set(None)
+        finally:
+            session.close()
+
+    def stats(self) -> typing.Mapping[str, typing.Any]:
+        return {
+            'votes': self.votes,
+            'batches': self.batches,
+            'errors': self.errors,
+            'largest_batch': self.largest,
+        }
@@ -0,0 +1,135 @@
+import threading
+import time
+import typing
+
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import QueuePool
+
+__all__ = 'InstrumentedQueuePool', 'PoolMetrics'
+
+
+class PoolMetrics:
+    """How long connection checkouts waited for a pool, and how long
+    opening new connections took.
+
+    """
+
+    #: Upper bounds of the buckets of the wait time histogram, in seconds.
+    BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.checkouts = self.waits = self.timeouts = 0
+        self.wait_time = 0.0
+        self.histogram = [0] * (len(self.BUCKETS) + 1)
+        self.connects = self.connect_errors = 0
+        self.connect_time = self.longest_connect = 0.0
+
+    def observe(self, elapsed: float, timed_out: bool = False) -> None:
+        with self.lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            # Anything under the first bucket is just the cost of a
+            # checkout, not waiting for a connection.
+            if elapsed > self.BUCKETS[0]:
+                self.waits += 1
+            self.wait_time += elapsed
+            for i, bound in enumerate(self.BUCKETS):
+                if elapsed <= bound:
+                    self.histogram[i] += 1
+                    break
+            else:
+                self.histogram[-1] += 1
+
+    def observe_connect(self, elapsed: float, failed: bool = False) -> None:
+        with self.lock:
+            if failed:
+                self.connect_errors += 1
+            else:
+                self.connects += 1
+            self.connect_time += elapsed
+            self.longest_connect = max(self.longest_connect, elapsed)
+
+    def stats(self) -> typing.Mapping[str, typing.Any]:
+        bounds = [str(b) for b in self.BUCKETS] + ['+Inf']
+        return {
+            'checkouts': self.checkouts,
+            'waits': self.waits,
+            'timeouts': self.timeouts,
+            'wait_time': self.wait_time,
+            'wait_histogram': dict(zip(bounds, self.histogram)),
+            'connects': self.connects,
+            'connect_errors': self.connect_errors,
+            'connect_time': self.connect_time,
+            'longest_connect': self.longest_connect,
+        }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """A :class:`~sqlalchemy.pool.QueuePool` which measures how long
+    checkouts wait for a connection, and how many connections are in use.
+    Opening a connection when the pool has room to grow isn't waiting for
+    one; it's measured on its own.
+
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+        # The checkout in progress in each thread, or greenlet when gevent
+        # has patched threading.
+        self.checkout = threading.local()
+
+    def _do_get(self):
+        checkout = self.checkout
+        if getattr(checkout, 'started_at', None) is not None:
+            # QueuePool._do_get() calls itself again when it loses a race
+            # for a connection; the outermost call measures the checkout.
+            return super()._do_get()
+        checkout.started_at = time.monotonic()
+        checkout.connect_time = 0.0
+        try:
+            connection = super()._do_get()
+        except TimeoutError:
+            self.metrics.observe(self._waited(checkout), True)
+            raise
+        else:
+            self.metrics.observe(self._waited(checkout))
+            return connection
+        finally:
+            checkout.started_at = None
+
+    def _waited(self, checkout: threading.local) -> float:
+        return max(0.0, time.monotonic() - checkout.started_at -
+                   checkout.connect_time)
+
+    def _create_connection(self):
+        started_at = time.monotonic()
+        try:
+            record = super()._create_connection()
+        except Exception:
+            self._connected(time.monotonic() - started_at, True)
+            raise
+        self._connected(time.monotonic() - started_at)
+        return record
+
+    def _connected(self, elapsed: float, failed: bool = False) -> None:
+        self.metrics.observe_connect(elapsed, failed)
+        if getattr(self.checkout, 'started_at', None) is not None:
+            self.checkout.connect_time += elapsed
+
+    def recreate(self) -> 'InstrumentedQueuePool':
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def stats(self) -> typing.Mapping[str, typing.Any]:
+        return {
+            'size': self.size(),
+            'checked_in': self.checkedin(),
+            'checked_out': self.checkedout(),
+            'overflow': self.overflow(),
+            **self.metrics.stats(),
+        }
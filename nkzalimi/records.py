@@ -0,0 +1,240 @@
+import datetime
+import typing
+import uuid
+
+from sqlalchemy.orm import Query, Session
+
+from .entities import (BusinessEntity, BusinessEntityRevision,
+                       BusinessEntityStatus, CurrentBusinessEntity,
+                       OAuthLogin, OAuthProvider, RequestKind, RevisionKind,
+                       RevisionRequest, User)
+
+__all__ = ('EntityRecord', 'OAuthLoginRecord', 'RevisionRecord',
+           'RevisionRequestRecord', 'UserRecord')
+
+
+class EntityRecord:
+    """A flat, read-only snapshot of a business entity and its latest
+    revision.  It serializes exactly like :class:`BusinessEntity` but
+    keeps no session or identity map state around.
+
+    """
+
+    __slots__ = ('id', 'created_at', 'name', 'category', 'status',
+                 'address', 'address_sub', 'latitude', 'longitude')
+
+    def __init__(self, id: uuid.UUID, created_at: datetime.datetime,
+                 name: str, category: str, status: BusinessEntityStatus,
+                 address: str, address_sub: str,
+                 latitude: float, longitude: float) -> None:
+        self.id = id
+        self.created_at = created_at
+        self.name = name
+        self.category = category
+        self.status = status
+        self.address = address
+        self.address_sub = address_sub
+        self.latitude = latitude
+        self.longitude = longitude
+
+    @classmethod
+    def from_entity(cls, entity: BusinessEntity) -> 'EntityRecord':
+        return cls.from_current(entity.current)
+
+    @classmethod
+    def from_current(cls, current: CurrentBusinessEntity) -> 'EntityRecord':
+        return cls(current.id, current.created_at, current.name,
+                   current.category, current.status, current.address,
+                   current.address_sub, current.latitude, current.longitude)
+
+    @classmethod
+    def query(cls, session: Session, *columns) -> Query:
+        """Query all entities as :class:`EntityRecord`\\ s, without loading
+        any ORM instances.  Rows end with extra ``columns`` if any; see
+        also :meth:`with_columns()`.
+
+        """
+        return session.query(
+            CurrentBusinessEntity.id, CurrentBusinessEntity.created_at,
+            CurrentBusinessEntity.name, CurrentBusinessEntity.category,
+            CurrentBusinessEntity.status, CurrentBusinessEntity.address,
+            CurrentBusinessEntity.address_sub, CurrentBusinessEntity.latitude,
+            CurrentBusinessEntity.longitude, *columns
+        )
+
+    @classmethod
+    def with_columns(
+        cls, rows: typing.Iterable[typing.Sequence[typing.Any]]
+    ) -> typing.List[typing.Tuple[typing.Any, ...]]:
+        """Turn rows of :meth:`query()` with extra columns into tuples of
+        a record followed by the extra columns.
+
+        """
+        n = len(cls.__slots__)
+        return [(cls(*row[:n]), *row[n:]) for row in rows]
+
+    @classmethod
+    def load_all(cls, session: Session) -> typing.Iterator['EntityRecord']:
+        for row in cls.query(session).yield_per(1000):
+            yield cls(*row)
+
+    def __repr__(self) -> str:
+        return '<{0.__module__}.{0.__qualname__} {1} {2!r}>'.format(
+            type(self), self.id, self.name
+        )
+
+
+class RevisionRecord:
+    """A read-only snapshot of a :class:`BusinessEntityRevision`,
+    serialized like one.
+
+    """
+
+    __slots__ = ('id', 'created_at', 'request_id', 'replacing_id', 'name',
+                 'category', 'status', 'address', 'address_sub', 'latitude',
+                 'longitude')
+
+    def __init__(self, id: uuid.UUID, created_at: datetime.datetime,
+                 request_id: uuid.UUID,
+                 replacing_id: typing.Optional[uuid.UUID], name: str,
+                 category: str, status: BusinessEntityStatus, address: str,
+                 address_sub: str, latitude: float, longitude: float) -> None:
+        self.id = id
+        self.created_at = created_at
+        self.request_id = request_id
+        self.replacing_id = replacing_id
+        self.name = name
+        self.category = category
+        self.status = status
+        self.address = address
+        self.address_sub = address_sub
+        self.latitude = latitude
+        self.longitude = longitude
+
+    @classmethod
+    def query(cls, session: Session) -> Query:
+        """Query revisions as :class:`RevisionRecord`\\ s, to be
+        filtered.
+
+        """
+        return session.query(
+            BusinessEntityRevision.id, BusinessEntityRevision.created_at,
+            BusinessEntityRevision.request_id,
+            BusinessEntityRevision.replacing_id, BusinessEntityRevision.name,
+            BusinessEntityRevision.category, BusinessEntityRevision.status,
+            BusinessEntityRevision.address,
+            BusinessEntityRevision.address_sub,
+            BusinessEntityRevision.latitude, BusinessEntityRevision.longitude
+        )
+
+    def __repr__(self) -> str:
+        return '<{0.__module__}.{0.__qualname__} {1} {2!r}>'.format(
+            type(self), self.id, self.name
+        )
+
+
+class OAuthLoginRecord(typing.NamedTuple):
+
+    provider: OAuthProvider
+    uid: str
+
+
+class UserRecord:
+    """A read-only snapshot of a :class:`User` and its OAuth logins,
+    serialized like one.
+
+    """
+
+    __slots__ = ('id', 'created_at', 'admin', 'blocked', 'display_name',
+                 'oauth_logins')
+
+    def __init__(self, id: uuid.UUID, created_at: datetime.datetime,
+                 admin: bool, blocked: bool, display_name: str,
+                 oauth_logins: typing.List[OAuthLoginRecord]) -> None:
+        self.id = id
+        self.created_at = created_at
+        self.admin = admin
+        self.blocked = blocked
+        self.display_name = display_name
+        self.oauth_logins = oauth_logins
+
+    @classmethod
+    def load(cls, session: Session,
+             ids: typing.Iterable[uuid.UUID]) -> typing.Dict[uuid.UUID,
+                                                             'UserRecord']:
+        """Load the users of ``ids`` in two queries."""
+        ids = set(ids)
+        if not ids:
+            return {}
+        users = {
+            id: cls(id, created_at, admin, blocked, display_name, [])
+            for id, created_at, admin, blocked, display_name in session.query(
+                User.id, User.created_at, User.admin, User.blocked,
+                User.display_name
+            ).filter(User.id.in_(ids))
+        }
+        logins = session.query(
+            OAuthLogin.user_id, OAuthLogin.provider, OAuthLogin.uid
+        ).filter(OAuthLogin.user_id.in_(ids))
+        for user_id, provider, uid in logins:
+            users[user_id].oauth_logins.append(
+                OAuthLoginRecord(provider, uid)
+            )
+        return users
+
+    def __repr__(self) -> str:
+        return '<{0.__module__}.{0.__qualname__} {1} {2!r}>'.format(
+            type(self), self.id, self.display_name
+        )
+
+
+class RevisionRequestRecord:
+    """A read-only snapshot of a :class:`RevisionRequest`, serialized
+    like one.
+
+    """
+
+    __slots__ = ('id', 'created_at', 'submitted_by', 'upvotes', 'downvotes',
+                 'committed', 'business_entity_id', 'revision_kind', 'data')
+
+    kind = RequestKind.revision
+
+    def __init__(self, id: uuid.UUID, created_at: datetime.datetime,
+                 submitted_by: UserRecord, upvotes: int, downvotes: int,
+                 committed: bool, business_entity_id: uuid.UUID,
+                 revision_kind: RevisionKind, data: typing.Any) -> None:
+        self.id = id
+        self.created_at = created_at
+        self.submitted_by = submitted_by
+        self.upvotes = upvotes
+        self.downvotes = downvotes
+        self.committed = committed
+        self.business_entity_id = business_entity_id
+        self.revision_kind = revision_kind
+        self.data = data
+
+    @classmethod
+    def query(cls, session: Session) -> Query:
+        """Query revision requests for :meth:`load()`, to be filtered."""
+        return session.query(
+            RevisionRequest.id, RevisionRequest.created_at,
+            RevisionRequest.submitted_by_id, RevisionRequest.upvotes,
+            RevisionRequest.downvotes, RevisionRequest.committed,
+            RevisionRequest.business_entity_id,
+            RevisionRequest.revision_kind, RevisionRequest.data
+        ).select_from(RevisionRequest)
+
+    @classmethod
+    def load(cls, session: Session,
+             query: Query) -> typing.List['RevisionRequestRecord']:
+        rows = query.all()
+        users = UserRecord.load(session, (row[2] for row in rows))
+        return [
+            cls(id, created_at, users[submitted_by_id], *rest)
+            for id, created_at, submitted_by_id, *rest in rows
+        ]
+
+    def __repr__(self) -> str:
+        return '<{0.__module__}.{0.__qualname__} {1}>'.format(
+            type(self), self.id
+        )
@@ -0,0 +1,239 @@
+import sys
+import typing
+import unicodedata
+import uuid
+
+from .entities import BusinessEntityStatus
+from .records import EntityRecord
+from .spatial import sphere_distance
+
+__all__ = ('SearchIndex', 'chosung', 'is_chosung_query', 'ngrams',
+           'normalize')
+
+
+HANGUL_BASE = 0xac00
+HANGUL_LAST = 0xd7a3
+#: Syllables sharing an initial consonant (21 medials * 28 finals).
+HANGUL_INITIAL_SPAN = 588
+#: Initial consonants in Hangul Compatibility Jamo, in syllable order.
+CHOSUNG = 'ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ'
+CHOSUNG_SET = frozenset(CHOSUNG)
+
+#: Prefixes posting keys of chosung grams so they never collide with
+#: grams of the text itself.
+CHOSUNG_KEY = '\x00'
+
+
+def normalize(text: str) -> str:
+    return ' '.join(unicodedata.normalize('NFC', text).casefold().split())
+
+
+def chosung(text: str) -> str:
+    """Replace every Hangul syllable in ``text`` with its initial
+    consonant, e.g. ``'키즈카페'`` becomes ``'ㅋㅈㅋㅍ'``.
+
+    """
+    return ''.join(
+        CHOSUNG[(ord(c) - HANGUL_BASE) // HANGUL_INITIAL_SPAN]
+        if HANGUL_BASE <= ord(c) <= HANGUL_LAST else c
+        for c in text
+    )
+
+
+def is_chosung_query(keyword: str) -> bool:
+    return bool(keyword) and all(c in CHOSUNG_SET or c == ' '
+                                 for c in keyword)
+
+
+def ngrams(text: str) -> typing.Set[str]:
+    """Character unigrams and bigrams of ``text``.  Bigrams narrow down
+    candidates well for Korean, where a syllable is already a fairly
+    selective unit; unigrams serve single-syllable keywords.
+
+    """
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    grams.discard(' ')
+    return grams
+
+
+def query_grams(text: str) -> typing.Set[str]:
+    if len(text) < 2:
+        return {text}
+    grams = {text[i:i + 2] for i in range(len(text) - 1)}
+    return grams - {'  '}
+
+
+class Document:
+
+    __slots__ = 'record', 'name', 'address', 'address_sub', 'chosung'
+
+    def __init__(self, record: EntityRecord) -> None:
+        self.record = record
+        self.name = normalize(record.name)
+        self.address = normalize(record.address)
+        self.address_sub = normalize(record.address_sub)
+        self.chosung = chosung(self.name)
+
+    def grams(self, with_chosung: bool) -> typing.Set[str]:
+        grams = ngrams(self.name)
+        grams.update(ngrams(self.address))
+        grams.update(ngrams(self.address_sub))
+        if with_chosung:
+            grams.update(CHOSUNG_KEY + g for g in ngrams(self.chosung))
+        return grams
+
+    def score(self, keyword: str, chosung_query: bool) -> float:
+        """Rank how well ``keyword`` matches, or 0 if it doesn't."""
+        if chosung_query:
+            position = self.chosung.find(keyword)
+            if position == 0:
+                return 25.0
+            return 20.0 - min(position, 10) * 0.1 if position > 0 else 0.0
+        position = self.name.find(keyword)
+        if position >= 0:
+            if keyword == self.name:
+                return 100.0
+            elif position == 0:
+                return 50.0
+            return 30.0 - min(position, 10) * 0.1
+        if keyword in self.address or keyword in self.address_sub:
+            return 10.0
+        return 0.0
+
+
+class SearchIndex:
+    """An inverted index of character n-grams over the names and addresses
+    of the latest revision of every business entity.
+
+    Postings narrow a keyword down to the entities having all of its
+    bigrams, then candidates are verified and ranked, so the work done is
+    proportional to the rarest bigram rather than to the number of
+    entities.  Keywords made only of initial consonants (e.g. ``ㅋㅈㅋㅍ``)
+    match names by their chosung when ``chosung`` is enabled.
+
+    """
+
+    def __init__(self, chosung: bool = True) -> None:
+        self.chosung = chosung
+        self.documents: typing.Dict[uuid.UUID, Document] = {}
+        self.postings: typing.Dict[str, typing.Set[uuid.UUID]] = {}
+
+    def rebuild(self, records: typing.Iterable[EntityRecord]) -> None:
+        self.documents = {}
+        self.postings = {}
+        for record in records:
+            self.add(record)
+
+    def add(self, record: EntityRecord) -> None:
+        document = Document(record)
+        self.documents[record.id] = document
+        postings = self.postings
+        for gram in document.grams(self.chosung):
+            try:
+                postings[gram].add(record.id)
+            except KeyError:
+                postings[gram] = {record.id}
+
+    def discard(self, id: uuid.UUID) -> None:
+        document = self.documents.pop(id, None)
+        if document is None:
+            return
+        postings = self.postings
+        for gram in document.grams(self.chosung):
+            posting = postings[gram]
+            posting.discard(id)
+            if not posting:
+                del postings[gram]
+
+    def update(self, record: EntityRecord,
+               previous: typing.Optional[EntityRecord]) -> None:
+        self.discard(record.id)
+        self.add(record)
+
+    def candidates(self, keyword: str,
+                   chosung_query: bool) -> typing.Set[uuid.UUID]:
+        grams = query_grams(keyword)
+        if chosung_query:
+            grams = {CHOSUNG_KEY + g for g in grams}
+        postings = []
+        for gram in grams:
+            try:
+                postings.append(self.postings[gram])
+            except KeyError:
+                return set()
+        postings.sort(key=len)
+        result = set(postings[0])
+        for posting in postings[1:]:
+            result.intersection_update(posting)
+            if not result:
+                break
+        return result
+
+    def search(
+        self, keyword: str, *,
+        status: typing.Optional[BusinessEntityStatus] = None,
+        near: typing.Optional[typing.Tuple[float, float, float]] = None,
+        after: typing.Optional[typing.Tuple[float, uuid.UUID]] = None,
+        limit: typing.Optional[int] = None
+    ) -> typing.List[typing.Tuple[EntityRecord, float]]:
+        """Search entities matching ``keyword``.  Without ``near`` results
+        are ranked best first and paired with their score; with a
+        ``(latitude, longitude, radius)`` triple as ``near`` they are
+        limited to that circle and ordered like the geo listing, paired
+        with their distance.  ``after`` is the ``(score or distance, id)``
+        of the last row of the previous page.
+
+        """
+        keyword = normalize(keyword)
+        if not keyword:
+            return []
+        chosung_query = self.chosung and is_chosung_query(keyword)
+        documents = self.documents
+        found = []
+        for id in self.candidates(keyword, chosung_query):
+            document = documents[id]
+            record = document.record
+            if status is not None and record.status is not status:
+                continue
+            score = document.score(keyword, chosung_query)
+            if not score:
+                continue
+            if near is None:
+                key = -score, id
+            else:
+                latitude, longitude, radius = near
+                distance = sphere_distance(latitude, longitude,
+                                           record.latitude, record.longitude)
+                if distance > radius:
+                    continue
+                key = distance, id
+            found.append(key)
+        if after is not None:
+            after_key, after_id = after
+            after = (after_key if near else -after_key), after_id
+            found = [key for key in found if key > after]
+        found.sort()
+        if limit is not None:
+            found = found[:limit]
+        if near is None:
+            return [(documents[id].record, -score) for score, id in found]
+        return [(documents[id].record, distance) for distance, id in found]
+
+    def memory_usage(self) -> int:
+        """Estimate the bytes held by the index, records excluded."""
+        size = sys.getsizeof(self.documents) + sys.getsizeof(self.postings)
+        for gram, posting in self.postings.items():
+            size += sys.getsizeof(gram) + sys.getsizeof(posting)
+        for document in self.documents.values():
+            size += sys.getsizeof(document)
+            size += sum(sys.getsizeof(getattr(document, name))
+                        for name in Document.__slots__[1:])
+        return size
+
+    def stats(self) -> typing.Mapping[str, typing.Any]:
+        return {
+            'entities': len(self.documents),
+            'grams': len(self.postings),
+            'memory_usage': self.memory_usage()
+        }
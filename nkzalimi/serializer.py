@@ -1,12 +1,24 @@
 import datetime
 import functools
+import json
 import typing
 import uuid
 
-from .entities import (BusinessEntity, BusinessEntityRevision,
-                       BusinessEntityStatus, CreationRequest, OAuthLogin,
-                       OAuthProvider, Request, RequestKind, RevisionKind,
-                       RevisionRequest, User)
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+from .autocomplete import Suggestion, SuggestionKind
+from .cluster import Cluster
+from .entities import (BlockUserRequest, BusinessEntity,
+                       BusinessEntityRevision, BusinessEntityStatus,
+                       CreationRequest, CurrentBusinessEntity,
+                       MarkAsDuplicateRequest, OAuthLogin, OAuthProvider,
+                       Request, RequestKind, RevisionKind, RevisionRequest,
+                       User)
+from .records import (EntityRecord, RevisionRecord, RevisionRequestRecord,
+                      UserRecord)
 
 
 @functools.singledispatch
@@ -23,6 +35,7 @@ def _(entity: datetime.datetime) -> typing.Any:
 @serialize.register(OAuthProvider)
 @serialize.register(RevisionKind)
 @serialize.register(RequestKind)
+@serialize.register(SuggestionKind)
 def _(entity) -> typing.Any:
     return entity.value
 
@@ -32,8 +45,9 @@ def _(entity) -> typing.Any:
     return str(entity)
 
 
-@serialize.register
-def _(entity: User) -> typing.Any:
+@serialize.register(User)
+@serialize.register(UserRecord)
+def _(entity) -> typing.Any:
     oauth_logins = {
         serialize(l.provider): l.uid for l in entity.oauth_logins
     }
@@ -47,21 +61,97 @@ def _(entity: User) -> typing.Any:
     }
 
 
+def entity_fields(e, id: uuid.UUID,
+                  created_at: datetime.datetime) -> typing.Any:
+    """Serialize a business entity of ``id`` whose latest state is ``e``,
+    either a revision or a flat row of it.
+
+    """
+    return {
+        'id': str(id),
+        'created_at': created_at.isoformat(),
+        'name': e.name,
+        'category': e.category,
+        'status': e.status.value,
+        'address': f'{e.address} {e.address_sub}',
+        'coordinate': [e.latitude, e.longitude]
+    }
+
+
 @serialize.register
 def _(entity: BusinessEntity) -> typing.Any:
-    latest = entity.latest_revision
+    return entity_fields(entity.latest_revision, entity.id, entity.created_at)
+
+
+#: Serializers of lists of objects by their class; see
+#: :func:`register_plan()`.
+plans: typing.Dict[type, typing.Callable[[typing.Iterable], list]] = {}
+
+
+def register_plan(*classes: type) -> typing.Callable[[typing.Callable],
+                                                     typing.Callable]:
+    """Register the decorated function as :func:`serialize()` of
+    ``classes``, and as the plan :func:`serialize_many()` maps over lists
+    of them.  It should convert values directly (e.g. ``str(e.id)``)
+    rather than call :func:`serialize()`, which dispatches on every value.
+
+    """
+    def register(fields: typing.Callable) -> typing.Callable:
+        def plan(entities: typing.Iterable) -> list:
+            return list(map(fields, entities))
+        for cls in classes:
+            plans[cls] = plan
+            serialize.register(cls, fields)
+        return fields
+    return register
+
+
+def serialize_many(entities: typing.Sequence[typing.Any]) -> list:
+    """Serialize a list of objects, in one pass if they are all of the
+    same class with a plan.
+
+    """
+    if entities:
+        cls = type(entities[0])
+        plan = plans.get(cls)
+        if plan is not None and all(type(e) is cls for e in entities):
+            return plan(entities)
+    return [serialize(e) for e in entities]
+
+
+@register_plan(CurrentBusinessEntity, EntityRecord)
+def _(e) -> typing.Any:
+    return entity_fields(e, e.id, e.created_at)
+
+
+@register_plan(BusinessEntityRevision, RevisionRecord)
+def _(e) -> typing.Any:
+    fields = entity_fields(e, e.id, e.created_at)
+    fields['request_id'] = str(e.request_id)
+    fields['replacing_id'] = \
+        None if e.replacing_id is None else str(e.replacing_id)
+    return fields
+
+
+@register_plan(Suggestion)
+def _(e) -> typing.Any:
     return {
-        'id': serialize(entity.id),
-        'created_at': serialize(entity.created_at),
-        'name': latest.name,
-        'category': latest.category,
-        'status': serialize(latest.status),
-        'address': f'{latest.address} {latest.address_sub}',
-        'coordinate': [latest.latitude, latest.longitude]
+        'text': e.text,
+        'kind': e.kind.value,
+        'business_entity_id': str(e.business_entity_id)
+    }
+
+
+@register_plan(Cluster)
+def _(e) -> typing.Any:
+    return {
+        'count': e.count,
+        'coordinate': [e.latitude, e.longitude],
+        'statuses': {s.value: n for s, n in e.statuses.items()}
     }
 
 
-def serialize_request(entity: Request) -> typing.Mapping[str, typing.Any]:
+def serialize_request(entity) -> typing.Mapping[str, typing.Any]:
     return {
         'id': serialize(entity.id),
         'created_at': serialize(entity.created_at),
@@ -87,8 +177,9 @@ def _(entity: CreationRequest) -> typing.Any:
     }
 
 
-@serialize.register
-def _(entity: RevisionRequest) -> typing.Any:
+@serialize.register(RevisionRequest)
+@serialize.register(RevisionRequestRecord)
+def _(entity) -> typing.Any:
     return {
         **serialize_request(entity),
         'revision': {
@@ -97,3 +188,63 @@ def _(entity: RevisionRequest) -> typing.Any:
             'data': entity.data
         }
     }
+
+
+@serialize.register
+def _(entity: MarkAsDuplicateRequest) -> typing.Any:
+    return {
+        **serialize_request(entity),
+        'mark_as_duplicate': {
+            'business_entity_id': serialize(entity.business_entity_id),
+            'duplicates_with_id': serialize(entity.duplicates_with_id)
+        }
+    }
+
+
+@serialize.register
+def _(entity: BlockUserRequest) -> typing.Any:
+    return {
+        **serialize_request(entity),
+        'block_user': {
+            'blocking_user_id': serialize(entity.blocking_user_id)
+        }
+    }
+
+
+def stdlib_dumps(data: typing.Any) -> str:
+    return json.dumps(data, sort_keys=True, separators=(',', ':'),
+                      ensure_ascii=True)
+
+
+def ujson_dumps(data: typing.Any) -> str:
+    return ujson.dumps(data, sort_keys=True, ensure_ascii=True,
+                       escape_forward_slashes=False)
+
+
+#: What JSON encoders tend to disagree on.
+DUMPS_SAMPLE = {
+    'text': 'a/b <&> \'"\\ \t\n\x00 \u00e9 \u2028 \U0001f600',
+    'numbers': [0, -1, 2 ** 53, 37.0, 0.1, 127.12345678901234, 1e16, 1e-05,
+                -0.0],
+    'constants': [True, False, None],
+    'nested': {'b': [], 'a': {}},
+}
+
+
+def select_dumps() -> typing.Callable[[typing.Any], str]:
+    """Pick the fastest JSON encoder which encodes :const:`DUMPS_SAMPLE`
+    the same as :func:`stdlib_dumps()`.  Install ujson to make it faster.
+
+    """
+    if ujson is not None:
+        try:
+            if ujson_dumps(DUMPS_SAMPLE) == stdlib_dumps(DUMPS_SAMPLE):
+                return ujson_dumps
+        except (TypeError, ValueError, OverflowError):
+            pass
+    return stdlib_dumps
+
+
+#: Encode serialized data as compact JSON with sorted keys and ASCII only,
+#: like :func:`flask.jsonify()` does with its default settings.
+dumps = select_dumps()
@@ -0,0 +1,13 @@
+from blinker import Namespace
+
+__all__ = 'entity_committed', 'signals'
+
+
+signals = Namespace()
+
+#: Sent by the web app after a committed request has changed a business
+#: entity.  The sender is the :class:`~nkzalimi.app.App`, ``record`` is
+#: the :class:`~nkzalimi.records.EntityRecord` of its new latest revision
+#: and ``previous`` the record it replaced, or :const:`None` if the entity
+#: has just been created.
+entity_committed = signals.signal('entity-committed')
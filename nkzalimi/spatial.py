@@ -0,0 +1,274 @@
+import array
+import math
+import sys
+import typing
+import uuid
+
+from .entities import BusinessEntityStatus
+from .records import EntityRecord
+
+__all__ = 'EARTH_RADIUS', 'SpatialIndex', 'sphere_distance'
+
+
+#: The mean radius of the WGS 84 spheroid in meters, which is also what
+#: PostGIS uses for spherical geography distances.
+EARTH_RADIUS = 6371008.771415059
+
+#: Meters per degree of latitude on the sphere.
+METERS_PER_DEGREE = EARTH_RADIUS * math.pi / 180.0
+
+
+def sphere_distance(lat1: float, lng1: float,
+                    lat2: float, lng2: float) -> float:
+    """The great-circle distance in meters.  It follows the formula of
+    PostGIS' ``sphere_distance()`` so results agree with ``<->`` and
+    ``ST_DWithin()`` on geographies.
+
+    """
+    lat1 = math.radians(lat1)
+    lat2 = math.radians(lat2)
+    d_lng = math.radians(lng2 - lng1)
+    cos_d_lng = math.cos(d_lng)
+    cos_lat1 = math.cos(lat1)
+    sin_lat1 = math.sin(lat1)
+    cos_lat2 = math.cos(lat2)
+    sin_lat2 = math.sin(lat2)
+    a1 = (cos_lat2 * math.sin(d_lng)) ** 2
+    a2 = (cos_lat1 * sin_lat2 - sin_lat1 * cos_lat2 * cos_d_lng) ** 2
+    a = math.sqrt(a1 + a2)
+    b = sin_lat1 * sin_lat2 + cos_lat1 * cos_lat2 * cos_d_lng
+    return math.atan2(a, b) * EARTH_RADIUS
+
+
+class Cell:
+
+    __slots__ = 'ids', 'latitudes', 'longitudes'
+
+    def __init__(self) -> None:
+        self.ids = []
+        self.latitudes = array.array('d')
+        self.longitudes = array.array('d')
+
+    def add(self, id: uuid.UUID, latitude: float, longitude: float) -> None:
+        self.ids.append(id)
+        self.latitudes.append(latitude)
+        self.longitudes.append(longitude)
+
+    def remove(self, id: uuid.UUID) -> None:
+        i = self.ids.index(id)
+        # Swap with the last slot so that removal doesn't shift the arrays.
+        self.ids[i] = self.ids[-1]
+        self.latitudes[i] = self.latitudes[-1]
+        self.longitudes[i] = self.longitudes[-1]
+        self.ids.pop()
+        self.latitudes.pop()
+        self.longitudes.pop()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __sizeof__(self) -> int:
+        return (object.__sizeof__(self) + sys.getsizeof(self.ids) +
+                sys.getsizeof(self.latitudes) +
+                sys.getsizeof(self.longitudes))
+
+
+class SpatialIndex:
+    """A grid index over the latest revision of every business entity,
+    answering "what's near me" queries without a database round trip.
+    Entities are bucketed into latitude/longitude cells, each keeping its
+    coordinates in flat :class:`array.array` columns, so a query only
+    touches the cells overlapping its radius.
+
+    The index lives in the process which built it, and only commits made
+    by that same process update it (see
+    :func:`~nkzalimi.web.update_indexes()`).  Nothing refreshes it across
+    processes, so with several worker processes the others keep serving
+    what they loaded until they restart.
+
+    :param cell_size: the edge length of a grid cell, in degrees
+
+    """
+
+    def __init__(self, cell_size: float = 0.05) -> None:
+        self.cell_size = cell_size
+        self.records: typing.Dict[uuid.UUID, EntityRecord] = {}
+        self.cells: typing.Dict[typing.Tuple[int, int], Cell] = {}
+
+    def cell_key(self, latitude: float,
+                 longitude: float) -> typing.Tuple[int, int]:
+        return (math.floor(latitude / self.cell_size),
+                math.floor(longitude / self.cell_size))
+
+    def rebuild(self, records: typing.Iterable[EntityRecord]) -> None:
+        self.records = {}
+        self.cells = {}
+        for record in records:
+            self.add(record)
+
+    def add(self, record: EntityRecord) -> None:
+        self.records[record.id] = record
+        key = self.cell_key(record.latitude, record.longitude)
+        try:
+            cell = self.cells[key]
+        except KeyError:
+            cell = self.cells[key] = Cell()
+        cell.add(record.id, record.latitude, record.longitude)
+
+    def discard(self, id: uuid.UUID) -> None:
+        record = self.records.pop(id, None)
+        if record is None:
+            return
+        key = self.cell_key(record.latitude, record.longitude)
+        cell = self.cells[key]
+        cell.remove(id)
+        if not cell:
+            del self.cells[key]
+
+    def update(self, record: EntityRecord,
+               previous: typing.Optional[EntityRecord]) -> None:
+        self.discard(record.id)
+        self.add(record)
+
+    def _candidate_cells(
+        self, latitude: float, longitude: float, radius: float
+    ) -> typing.Iterable[Cell]:
+        lat_span = radius / METERS_PER_DEGREE
+        cos_lat = math.cos(math.radians(
+            min(abs(latitude) + lat_span, 90.0)
+        ))
+        lng_span = lat_span / cos_lat if cos_lat > 1e-9 else 360.0
+        lng_min = longitude - lng_span
+        lng_max = longitude + lng_span
+        if lng_min < -180.0 or lng_max > 180.0:
+            # Crosses the antimeridian or encircles a pole; not worth
+            # special-casing.
+            return self.cells.values()
+        lat_lo, lng_lo = self.cell_key(latitude - lat_span, lng_min)
+        lat_hi, lng_hi = self.cell_key(latitude + lat_span, lng_max)
+        if (lat_hi - lat_lo + 1) * (lng_hi - lng_lo + 1) > len(self.cells):
+            return self.cells.values()
+        cells = self.cells
+        return [
+            cells[i, j]
+            for i in range(lat_lo, lat_hi + 1)
+            for j in range(lng_lo, lng_hi + 1)
+            if (i, j) in cells
+        ]
+
+    def nearby(
+        self, latitude: float, longitude: float, radius: float, *,
+        status: typing.Optional[BusinessEntityStatus] = None,
+        after: typing.Optional[typing.Tuple[float, uuid.UUID]] = None,
+        limit: typing.Optional[int] = None
+    ) -> typing.List[typing.Tuple[EntityRecord, float]]:
+        """Find the entities within ``radius`` meters, nearest first.
+        The same as the SQL geo listing: ties are broken by id, and
+        ``after`` is the ``(distance, id)`` of the last row of the previous
+        page.
+
+        """
+        records = self.records
+        found = []
+        for cell in self._candidate_cells(latitude, longitude, radius):
+            lats = cell.latitudes
+            lngs = cell.longitudes
+            for i, id in enumerate(cell.ids):
+                distance = sphere_distance(latitude, longitude,
+                                           lats[i], lngs[i])
+                if distance > radius:
+                    continue
+                if after is not None and (distance, id) <= after:
+                    continue
+                if status is not None and records[id].status is not status:
+                    continue
+                found.append((distance, id))
+        found.sort()
+        if limit is not None:
+            found = found[:limit]
+        return [(records[id], distance) for distance, id in found]
+
+    def nearest(
+        self, latitude: float, longitude: float, k: int, *,
+        status: typing.Optional[BusinessEntityStatus] = None
+    ) -> typing.List[typing.Tuple[EntityRecord, float]]:
+        """Find the ``k`` nearest entities regardless of how far they
+        are, nearest first.  Rings of cells around the origin are scanned
+        until the ``k``-th nearest found so far is closer than anything
+        outside of them could be.
+
+        """
+        if k <= 0:
+            return []
+        records = self.records
+        cells = self.cells
+        cell_size = self.cell_size
+        found = []
+
+        def scan(cell):
+            lats = cell.latitudes
+            lngs = cell.longitudes
+            for i, id in enumerate(cell.ids):
+                if status is not None and records[id].status is not status:
+                    continue
+                found.append((sphere_distance(latitude, longitude,
+                                              lats[i], lngs[i]), id))
+
+        ci, cj = self.cell_key(latitude, longitude)
+        cos_lat = math.cos(math.radians(latitude))
+        r = 0
+        while True:
+            west = longitude - (cj - r) * cell_size
+            east = (cj + r + 1) * cell_size - longitude
+            if (2 * r + 1) ** 2 > len(cells) or \
+                    longitude - west <= -180.0 or longitude + east >= 180.0:
+                # Cheaper to look at every cell, or the rings would have to
+                # wrap around the antimeridian.
+                found = []
+                for cell in cells.values():
+                    scan(cell)
+                break
+            if r:
+                ring = [(ci + d, cj + e) for d in (-r, r)
+                        for e in range(-r, r + 1)]
+                ring += [(ci + d, cj + e) for e in (-r, r)
+                         for d in range(-r + 1, r)]
+            else:
+                ring = [(ci, cj)]
+            for key in ring:
+                if key in cells:
+                    scan(cells[key])
+            if len(found) >= k:
+                # The nearest points outside of the rings are at least as
+                # far as the nearest parallel or meridian bounding them.
+                south = latitude - (ci - r) * cell_size
+                north = (ci + r + 1) * cell_size - latitude
+                lng_gap = math.radians(min(west, east, 90.0))
+                bound = min(
+                    min(south, north) * METERS_PER_DEGREE,
+                    math.asin(cos_lat * math.sin(lng_gap)) * EARTH_RADIUS
+                )
+                found.sort()
+                del found[k:]
+                if found[-1][0] <= bound:
+                    break
+            r += 1
+        found.sort()
+        return [(records[id], distance) for distance, id in found[:k]]
+
+    def memory_usage(self) -> int:
+        """Estimate the bytes held by the index, records included."""
+        size = sys.getsizeof(self.records) + sys.getsizeof(self.cells)
+        size += sum(map(sys.getsizeof, self.cells.values()))
+        for record in self.records.values():
+            size += sys.getsizeof(record)
+            size += sum(sys.getsizeof(getattr(record, name))
+                        for name in EntityRecord.__slots__)
+        return size
+
+    def stats(self) -> typing.Mapping[str, typing.Any]:
+        return {
+            'entities': len(self.records),
+            'cells': len(self.cells),
+            'memory_usage': self.memory_usage()
+        }
@@ -0,0 +1,235 @@
+import hashlib
+import math
+import os
+import pathlib
+import tempfile
+import time
+import typing
+
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import cast, literal_column
+from sqlalchemy.sql.functions import func
+from sqlalchemy.types import Unicode
+
+from .entities import CurrentBusinessEntity
+from .mercator import project, tile_bounds, tile_envelope
+
+__all__ = 'BUFFER', 'EXTENT', 'LAYER', 'TileCache', 'render_tile', 'tile_etag'
+
+
+#: The name of the layer business entities are in.
+LAYER = 'business_entities'
+
+#: The size of a tile in MVT coordinates.
+EXTENT = 4096
+
+#: How far features beyond the edges are kept, in MVT coordinates, so that
+#: markers near the edges aren't clipped.
+BUFFER = 64
+
+
+def render_tile(session: Session, zoom: int, x: int, y: int) -> bytes:
+    """Encode the business entities in a tile as a Mapbox Vector Tile."""
+    south, west, north, east = tile_bounds(zoom, x, y, BUFFER / EXTENT)
+    point = func.ST_Transform(
+        func.ST_SetSRID(
+            func.ST_MakePoint(CurrentBusinessEntity.longitude,
+                              CurrentBusinessEntity.latitude),
+            4326
+        ),
+        3857
+    )
+    features = session.query(
+        cast(CurrentBusinessEntity.id, Unicode).label('id'),
+        CurrentBusinessEntity.name,
+        CurrentBusinessEntity.category,
+        cast(CurrentBusinessEntity.status, Unicode).label('status'),
+        func.ST_AsMVTGeom(
+            point,
+            func.ST_MakeEnvelope(*tile_envelope(zoom, x, y), 3857),
+            EXTENT, BUFFER, True
+        ).label('geom')
+    ).filter(
+        # The coordinate column has latitudes for x.
+        CurrentBusinessEntity.coordinate.intersects(
+            func.ST_MakeEnvelope(south, west, north, east)
+        )
+    ).subquery('features')
+    data = session.query(
+        func.ST_AsMVT(literal_column('features'), LAYER, EXTENT, 'geom')
+    ).select_from(features).scalar()
+    return bytes(data or b'')
+
+
+def tile_etag(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+#: Seconds invalidation markers are kept for, which has to outlast any
+#: render of a tile.
+MARKER_TTL = 86400
+
+
+class TileCache:
+    """Rendered tiles stored as files under ``directory``, laid out as
+    ``{z}/{x}/{y}.mvt``.  Since the files are shared by every worker
+    process on the host, so are invalidations.
+
+    Each invalidated tile gets a marker file holding its *generation*.
+    A tile is only stored if its generation is the same as before it was
+    rendered (see :meth:`set()`), so that an invalidation which comes in
+    while it renders isn't lost.
+
+    The files take about ``max_size`` bytes at most; the least recently
+    rendered tiles are deleted beyond that (see :meth:`prune()`).
+
+    """
+
+    def __init__(self, directory: pathlib.Path, min_zoom: int,
+                 max_zoom: int, max_size: int) -> None:
+        self.directory = directory
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.max_size = max_size
+        self.written = 0
+        self.hits = self.misses = self.invalidations = 0
+        self.discards = self.evictions = 0
+
+    def path(self, zoom: int, x: int, y: int) -> pathlib.Path:
+        return self.directory / str(zoom) / str(x) / f'{y}.mvt'
+
+    def marker_path(self, zoom: int, x: int, y: int) -> pathlib.Path:
+        return self.directory / str(zoom) / str(x) / f'{y}.gen'
+
+    def get(self, zoom: int, x: int, y: int) -> typing.Optional[bytes]:
+        try:
+            data = self.path(zoom, x, y).read_bytes()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def generation(self, zoom: int, x: int, y: int) -> typing.Optional[str]:
+        """The generation of a tile, to be passed to :meth:`set()` along
+        with the tile rendered after this returned.
+
+        """
+        try:
+            return self.marker_path(zoom, x, y).read_text()
+        except FileNotFoundError:
+            return None
+
+    def set(self, zoom: int, x: int, y: int, data: bytes,
+            generation: typing.Optional[str]) -> None:
+        """Store a tile rendered after :meth:`generation()` returned
+        ``generation``, unless the tile has been invalidated since.
+
+        """
+        if self.generation(zoom, x, y) != generation:
+            self.discards += 1
+            return
+        path = self.path(zoom, x, y)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file and rename it, so that readers never
+        # see a partially written tile.
+        fd, tmp = tempfile.mkstemp(dir=str(path.parent), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, str(path))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        # An invalidation which bumped the generation before the check
+        # above but after this one deletes the file after it's written;
+        # one which bumped it in between has to be caught here.
+        if self.generation(zoom, x, y) != generation:
+            self.discards += 1
+            unlink(path)
+            return
+        self.written += len(data)
+        if self.written >= self.max_size // 16:
+            self.prune()
+
+    def delete(self, zoom: int, x: int, y: int) -> None:
+        # Bump the generation before deleting; see set().
+        marker = self.marker_path(zoom, x, y)
+        marker.parent.mkdir(parents=True, exist_ok=True)
+        marker.write_text(os.urandom(8).hex())
+        if unlink(self.path(zoom, x, y)):
+            self.invalidations += 1
+
+    def prune(self) -> None:
+        """Delete the least recently rendered tiles until the rest take
+        ``max_size`` bytes at most, along with expired markers and
+        temporary files left behind.  Every worker process prunes after
+        writing a sixteenth of ``max_size``.
+
+        """
+        self.written = 0
+        expired_at = time.time() - MARKER_TTL
+        tiles = []
+        size = 0
+        for root, _, files in os.walk(str(self.directory)):
+            for name in files:
+                path = pathlib.Path(root, name)
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                if name.endswith('.mvt'):
+                    tiles.append((stat.st_mtime, stat.st_size, path))
+                    size += stat.st_size
+                elif stat.st_mtime < expired_at:
+                    unlink(path)
+        tiles.sort()
+        for _, tile_size, path in tiles:
+            if size <= self.max_size:
+                break
+            if unlink(path):
+                self.evictions += 1
+            size -= tile_size
+
+    def tiles_at(
+        self, latitude: float, longitude: float
+    ) -> typing.Iterator[typing.Tuple[int, int, int]]:
+        """Every tile a point is drawn in, including the ones whose
+        :const:`BUFFER` it falls in.
+
+        """
+        margin = BUFFER / EXTENT
+        px, py = project(latitude, longitude)
+        for zoom in range(self.min_zoom, self.max_zoom + 1):
+            n = 2 ** zoom
+            xs = {math.floor(px * n + d) for d in (-margin, 0, margin)}
+            ys = {math.floor(py * n + d) for d in (-margin, 0, margin)}
+            for x in xs:
+                for y in ys:
+                    if 0 <= y < n:
+                        yield zoom, x % n, y
+
+    def invalidate(
+        self, points: typing.Iterable[typing.Tuple[float, float]]
+    ) -> None:
+        for latitude, longitude in points:
+            for zoom, x, y in self.tiles_at(latitude, longitude):
+                self.delete(zoom, x, y)
+
+    def stats(self) -> typing.Mapping[str, typing.Any]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'discards': self.discards,
+            'evictions': self.evictions,
+            'max_size': self.max_size,
+        }
+
+
+def unlink(path: pathlib.Path) -> bool:
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        return False
+    return True
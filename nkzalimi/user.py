@@ -1,21 +1,26 @@
 from flask import Blueprint, abort, redirect, request, url_for
 from flask_login import login_user
-from requests import get as requests_get, post as requests_post
-from requests_oauthlib import OAuth1Session
+from requests import RequestException
 from sqlalchemy.orm.exc import NoResultFound
+from werkzeug.exceptions import BadGateway
 from werkzeug.urls import url_decode
 
-from .entities import GithubLogin, OAuthSession, TwitterLogin, User
+from .entities import GithubLogin, TwitterLogin, User
 from .web import app, session
 
 
 bp = Blueprint('user', __name__, url_prefix='/user')
 
 
+@bp.errorhandler(RequestException)
+def provider_unavailable(e: RequestException):
+    return BadGateway(f'The login provider is unavailable: {e}')
+
+
 @bp.route('/oauth/authorized/github/')
 def login_github():
-    at_response = requests_post(
-        'https://github.com/login/oauth/access_token',
+    at_response = app.http_client.request(
+        'github', 'POST', 'https://github.com/login/oauth/access_token',
         data={
             'client_id': app.github_oauth_client_id,
             'client_secret': app.github_oauth_client_secret,
@@ -26,8 +31,10 @@ def login_github():
     assert at_response.status_code == 200
     response_data = url_decode(at_response.text)
     access_token = response_data['access_token']
-    user_response = requests_get('https://api.github.com/user',
-                                 params={'access_token': access_token})
+    user_response = app.http_client.request(
+        'github', 'GET', 'https://api.github.com/user',
+        params={'access_token': access_token}
+    )
     assert user_response.status_code == 200
     user_data = user_response.json()
     try:
@@ -45,15 +52,17 @@ def login_github():
 
 @bp.route('/login/twitter/')
 def request_login_twitter():
-    sess = OAuth1Session(
+    sess = app.http_client.oauth1_session(
         client_key=app.twitter_oauth_client_id,
         client_secret=app.twitter_oauth_client_secret
     )
     url = 'https://api.twitter.com/oauth/request_token'
-    data = url_decode(sess.get(url).text)
+    data = url_decode(
+        app.http_client.request('twitter', 'GET', url, session=sess).text
+    )
     oauth_token = data['oauth_token']
     oauth_token_secret = data['oauth_token_secret']
-    session.add(OAuthSession(id=oauth_token, secret=oauth_token_secret))
+    app.oauth_session_store.put(session, oauth_token, oauth_token_secret)
     session.commit()
     redirect_url = 'https://api.twitter.com/oauth/authenticate?oauth_token={}' \
         .format(oauth_token)
@@ -64,22 +73,20 @@ def request_login_twitter():
 def login_twitter():
     oauth_token = request.args['oauth_token']
     oauth_verifier = request.args['oauth_verifier']
-    try:
-        oauth_session = session.query(OAuthSession).filter_by(
-            id=oauth_token
-        ).one()
-    except NoResultFound:
+    oauth_token_secret = app.oauth_session_store.pop(session, oauth_token)
+    if oauth_token_secret is None:
         abort(400)
-    session.delete(oauth_session)
     session.commit()
-    sess = OAuth1Session(
+    sess = app.http_client.oauth1_session(
         client_key=app.twitter_oauth_client_id,
         client_secret=app.twitter_oauth_client_secret,
-        resource_owner_key=oauth_session.id,
-        resource_owner_secret=oauth_session.secret
+        resource_owner_key=oauth_token,
+        resource_owner_secret=oauth_token_secret
+    )
+    res = app.http_client.request(
+        'twitter', 'POST', 'https://api.twitter.com/oauth/access_token',
+        session=sess, data={'oauth_verifier': oauth_verifier}
     )
-    res = sess.post('https://api.twitter.com/oauth/access_token',
-                    data={'oauth_verifier': oauth_verifier})
     assert res.status_code < 400
     data = url_decode(res.text)
     try:
@@ -1,2 +1,69 @@
+from geoalchemy2.types import Geography
+from sqlalchemy.sql.expression import case, cast, literal_column
+from sqlalchemy.sql.functions import func
+from sqlalchemy.types import Float
+
+#: The SRID used for every geography value (WGS 84).
+WGS84 = literal_column('4326')
+GEOGRAPHY = Geography(geometry_type='POINT', srid=4326)
+LINESTRING_GEOGRAPHY = Geography(geometry_type='LINESTRING', srid=4326)
+
+
 def latlng_to_point(lat, lng):
     return 'POINT({} {})'.format(lat, lng)
+
+
+def latlng_to_geography(lat, lng):
+    return cast(func.ST_SetSRID(func.ST_MakePoint(lng, lat), WGS84),
+                GEOGRAPHY)
+
+
+def coordinate_geometry(coordinate):
+    """Turn a ``coordinate`` column into a ``POINT(lng lat)`` geometry in
+    WGS 84, swapping the axes.
+
+    """
+    return func.ST_SetSRID(
+        func.ST_MakePoint(func.ST_Y(coordinate), func.ST_X(coordinate)),
+        WGS84
+    )
+
+
+def coordinate_geography(coordinate):
+    """Turn a ``coordinate`` column into a geography expression.
+
+    Coordinates are stored as ``POINT(lat lng)`` while geography wants
+    ``POINT(lng lat)``, so the axes are swapped.  The resulting expression
+    is the one ``ix_*_geography`` expression indices are built on; keep
+    them in sync.
+
+    """
+    return cast(coordinate_geometry(coordinate), GEOGRAPHY)
+
+
+def path_to_geometry(path):
+    """Turn a sequence of ``(lat, lng)`` pairs into a ``LINESTRING``
+    geometry in WGS 84.
+
+    """
+    wkt = 'LINESTRING({})'.format(
+        ', '.join('{} {}'.format(float(lng), float(lat)) for lat, lng in path)
+    )
+    return func.ST_GeomFromText(wkt, WGS84)
+
+
+def wilson_score(upvotes, downvotes, z=1.96):
+    """The lower bound of the Wilson score interval of the ratio of
+    ``upvotes`` to all votes, as an SQL expression.  Unlike the plain
+    ratio, it ranks many upvotes above a few.  ``z`` is the quantile of
+    the confidence level, 95% by default.
+
+    """
+    up = cast(upvotes, Float)
+    down = cast(downvotes, Float)
+    n = up + down
+    return case(
+        [(n > 0, (up + z * z / 2 - z * func.sqrt(up * down / n + z * z / 4)) /
+                 (n + z * z))],
+        else_=0.0
+    )
@@ -4,11 +4,15 @@ import typing
 from flask import Flask, current_app, request
 from flask_login import LoginManager
 from raven.contrib.flask import Sentry
+from sqlalchemy.orm import selectinload
 from sqlalchemy.orm.session import Session
 from werkzeug.local import LocalProxy
 
 from .app import App
 from .entities import User
+from .orm import Session as SessionClass
+from .records import EntityRecord
+from .signals import entity_committed
 
 
 app = LocalProxy(lambda: current_app.config['APP'])
@@ -37,7 +41,56 @@ def close_session(exception=None):
 
 @login_manager.user_loader
 def load_user(user_id: str) -> typing.Optional[User]:
-    return session.query(User).filter_by(id=uuid.UUID(user_id)).one_or_none()
+    cache = app.user_cache
+    if cache is None:
+        user = session.query(User) \
+            .options(selectinload(User.oauth_logins)) \
+            .filter_by(id=uuid.UUID(user_id)) \
+            .one_or_none()
+    else:
+        user = cache.load(session, uuid.UUID(user_id))
+    # Blocked users are treated as anonymous.
+    if user is None or user.blocked:
+        return None
+    return user
+
+
+def build_indexes(app: App) -> None:
+    indexes = app.indexes
+    if not indexes:
+        return
+    session = app.create_session()
+    try:
+        records = list(EntityRecord.load_all(session))
+    finally:
+        session.close()
+    for index in indexes.values():
+        index.rebuild(records)
+    entity_committed.connect(update_indexes, sender=app)
+
+
+def update_indexes(app: App, record: EntityRecord,
+                   previous: typing.Optional[EntityRecord]) -> None:
+    """Apply a committed change to the in-process indexes.  It only
+    reaches the indexes of the process which committed it.
+
+    """
+    for index in app.indexes.values():
+        index.update(record, previous)
+
+
+def invalidate_caches(app: App, record: EntityRecord,
+                      previous: typing.Optional[EntityRecord]) -> None:
+    points = [(record.latitude, record.longitude)]
+    if previous is not None:
+        points.append((previous.latitude, previous.longitude))
+    for cache in app.caches.values():
+        cache.invalidate(points)
+
+
+def invalidate_history(app: App, record: EntityRecord,
+                       previous: typing.Optional[EntityRecord]) -> None:
+    app.history_cache.invalidate(record.id)
 
 
 def create_web_app(app: App) -> Flask:
@@ -54,4 +107,11 @@ def create_web_app(app: App) -> Flask:
     login_manager.init_app(flask_app)
     flask_app.config.update(app.web_config)
     flask_app.config['APP'] = app
+    build_indexes(app)
+    if app.caches:
+        entity_committed.connect(invalidate_caches, sender=app)
+    if app.history_cache is not None:
+        entity_committed.connect(invalidate_history, sender=app)
+    if app.user_cache is not None:
+        app.user_cache.watch(SessionClass)
     return flask_app
@@ -5,10 +5,12 @@ import logging
 import os
 import pathlib
 
+from gevent import spawn
 from gevent.pywsgi import WSGIServer
 from ormeasy.alembic import upgrade_database
 
 from nkzalimi.app import App
+from nkzalimi.oauth import sweep_forever
 from nkzalimi.orm import Base, get_alembic_config
 from nkzalimi.web import create_web_app
 
@@ -59,6 +61,8 @@ def main():
     if args.shell:
         run_shell(wsgi_app)
     else:
+        spawn(sweep_forever, app.oauth_session_store, app.create_session,
+              app.oauth_sweep_interval, app.oauth_sweep_batch_size)
         if args.debug:
             for logger, level in debug_loggers.items():
                 logging.getLogger(logger).setLevel(level)
@@ -0,0 +1,135 @@
+import os
+import typing
+import uuid
+
+from flask import Flask
+from flask.testing import FlaskClient
+from pytest import fixture, skip
+from sqlalchemy.engine import Engine, create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy_utc import utcnow
+
+from nkzalimi.app import App
+from nkzalimi.entities import (BusinessEntityStatus, CreationRequest,
+                               RevisionKind, RevisionRequest, User)
+from nkzalimi.orm import Base, initialize_database
+from nkzalimi.util import latlng_to_point
+from nkzalimi.web import create_web_app
+
+
+#: The environment variable with the URL of a scratch PostGIS database
+#: for tests which need one.  Everything in it is dropped.
+DATABASE_URL_ENV = 'NKZALIMI_TEST_DATABASE_URL'
+
+
+@fixture(scope='session')
+def fx_database_url() -> str:
+    url = os.environ.get(DATABASE_URL_ENV)
+    if not url:
+        skip(f'{DATABASE_URL_ENV} is not set')
+    engine = create_engine(url)
+    try:
+        engine.execute('CREATE EXTENSION IF NOT EXISTS postgis')
+        Base.metadata.drop_all(engine)
+        initialize_database(engine)
+    finally:
+        engine.dispose()
+    return url
+
+
+def truncate_all(engine: Engine) -> None:
+    preparer = engine.dialect.identifier_preparer
+    tables = ', '.join(preparer.format_table(table)
+                       for table in Base.metadata.sorted_tables)
+    engine.execute(f'TRUNCATE {tables} CASCADE')
+
+
+@fixture
+def fx_app(fx_database_url: str) -> typing.Iterator[App]:
+    app = App(database={'url': fx_database_url})
+    try:
+        yield app
+    finally:
+        truncate_all(app.database_engine)
+        app.database_engine.dispose()
+
+
+@fixture
+def fx_session(fx_app: App) -> typing.Iterator[Session]:
+    session = fx_app.create_session()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@fixture
+def fx_wsgi_app(fx_app: App) -> Flask:
+    return create_web_app(fx_app)
+
+
+def login(client: FlaskClient, user_id: uuid.UUID) -> FlaskClient:
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
+
+
+def make_user(session: Session, name: str, admin: bool = False) -> uuid.UUID:
+    user = User(display_name=name, admin=admin)
+    session.add(user)
+    session.commit()
+    return user.id
+
+
+def make_entities(
+    session: Session, user_id: uuid.UUID,
+    points: typing.Sequence[typing.Tuple[float, float]],
+    status: BusinessEntityStatus = BusinessEntityStatus.kids_friendly
+) -> typing.List[uuid.UUID]:
+    """Create a business entity at each of ``points`` through creation
+    requests, and return their ids in the same order.
+
+    """
+    requests = [
+        CreationRequest(
+            submitted_by_id=user_id,
+            name=f'Entity {i}',
+            category='cafe',
+            status=status,
+            address=f'{i} Sejong-daero',
+            address_sub='',
+            coordinate=latlng_to_point(latitude, longitude)
+        )
+        for i, (latitude, longitude) in enumerate(points)
+    ]
+    session.add_all(requests)
+    session.flush()
+    ids = [req.id for req in requests]
+    session.commit()
+    # Load them again along with the coordinates create() reads.
+    loaded = {
+        req.id: req
+        for req in session.query(CreationRequest)
+                          .filter(CreationRequest.id.in_(ids))
+    }
+    entities = []
+    for id in ids:
+        entity = loaded[id].create()
+        loaded[id].committed_at = utcnow()
+        session.add(entity)
+        entities.append(entity)
+    session.flush()
+    entity_ids = [entity.id for entity in entities]
+    session.commit()
+    return entity_ids
+
+
+def make_revision_request(session: Session, user_id: uuid.UUID,
+                          entity_id: uuid.UUID, name: str) -> uuid.UUID:
+    req = RevisionRequest(submitted_by_id=user_id,
+                          business_entity_id=entity_id,
+                          revision_kind=RevisionKind.name, data=name)
+    session.add(req)
+    session.commit()
+    return req.id
@@ -0,0 +1,162 @@
+import uuid
+
+from flask import Flask
+from pytest import fixture, mark, raises
+from sqlalchemy.orm import Session
+
+from nkzalimi.api import MAX_NEAREST, encode_next, get_listing_params
+from nkzalimi.app import App
+from nkzalimi.entities import BlockUserRequest, BusinessEntity
+from nkzalimi.orm import assert_query_count
+from nkzalimi.web import create_web_app, load_user
+from .conftest import (login, make_entities, make_revision_request,
+                       make_user)
+
+
+#: Points around Seoul City Hall, about a hundred meters apart.
+POINTS = [(37.5665 + i * 0.001, 126.9780 - i * 0.001) for i in range(5)]
+
+
+@fixture
+def fx_entities(fx_session: Session) -> dict:
+    user_id = make_user(fx_session, 'creator')
+    return {'user_id': user_id,
+            'ids': make_entities(fx_session, user_id, POINTS)}
+
+
+def get(app: App, wsgi_app: Flask, url: str, queries: int,
+        user_id: uuid.UUID = None) -> dict:
+    """Get ``url`` and assert it took exactly ``queries`` statements,
+    whatever the number of rows involved.
+
+    """
+    client = wsgi_app.test_client()
+    if user_id is not None:
+        login(client, user_id)
+    with assert_query_count(app.database_engine, queries):
+        response = client.get(url)
+    assert response.status_code == 200, response.data
+    return response.get_json()['data']
+
+
+@mark.parametrize('nearest, k', [('1', 1), ('10', 10),
+                                  (str(MAX_NEAREST + 1), MAX_NEAREST)])
+def test_listing_params_nearest(nearest, k):
+    latitude, longitude = POINTS[0]
+    params = get_listing_params({'latitude': str(latitude),
+                                 'longitude': str(longitude),
+                                 'nearest': nearest})
+    assert params['nearest'] == params['limit'] == k
+
+
+@mark.parametrize('nearest', ['0', '-1', 'many'])
+def test_listing_params_invalid_nearest(nearest):
+    latitude, longitude = POINTS[0]
+    with raises(ValueError):
+        get_listing_params({'latitude': str(latitude),
+                            'longitude': str(longitude),
+                            'nearest': nearest})
+
+
+def test_listing_queries(fx_app, fx_wsgi_app, fx_entities):
+    latitude, longitude = POINTS[0]
+    data = get(fx_app, fx_wsgi_app,
+               f'/api/business_entities/?latitude={latitude}'
+               f'&longitude={longitude}&radius=5000', 1)
+    assert len(data['business_entities']) == len(POINTS)
+    data = get(fx_app, fx_wsgi_app, '/api/business_entities/', 1)
+    assert len(data['business_entities']) == len(POINTS)
+
+
+def test_business_entity_queries(fx_app, fx_wsgi_app, fx_session,
+                                 fx_entities):
+    entity_id = fx_entities['ids'][0]
+    url = f'/api/business_entity/{entity_id}/'
+    data = get(fx_app, fx_wsgi_app, url, 2)
+    assert data['requests'] == []
+    # Pending requests and their submitters are loaded in two queries,
+    # however many there are.
+    for i in range(3):
+        user_id = make_user(fx_session, f'reviser {i}')
+        make_revision_request(fx_session, user_id, entity_id, f'Name {i}')
+    data = get(fx_app, fx_wsgi_app, url, 4)
+    assert len(data['requests']) == 3
+
+
+def test_history_queries(fx_app, fx_wsgi_app, fx_entities):
+    entity_id = fx_entities['ids'][0]
+    data = get(fx_app, fx_wsgi_app,
+               f'/api/business_entity/{entity_id}/history/', 1)
+    assert len(data['revisions']) == 1
+
+
+def test_history_foreign_token(fx_wsgi_app, fx_session, fx_entities):
+    entity_id, other_id = fx_entities['ids'][:2]
+    revisions = dict(
+        fx_session.query(BusinessEntity.id, BusinessEntity.first_revision_id)
+    )
+    client = fx_wsgi_app.test_client()
+    url = f'/api/business_entity/{entity_id}/history/?next='
+    response = client.get(url + encode_next({
+        'entity': str(entity_id), 'limit': 10,
+        'start': str(revisions[entity_id]),
+    }))
+    assert response.status_code == 200, response.data
+    assert len(response.get_json()['data']['revisions']) == 1
+    # A token forged to start from a revision of another entity.
+    response = client.get(url + encode_next({
+        'entity': str(entity_id), 'limit': 10,
+        'start': str(revisions[other_id]),
+    }))
+    assert response.status_code == 400, response.data
+    assert response.get_json()['error']['type'] == 'invalid_arg_format'
+
+
+def test_request_queries(fx_app, fx_wsgi_app, fx_session, fx_entities):
+    user_id = fx_entities['user_id']
+    request_id = make_revision_request(fx_session, user_id,
+                                       fx_entities['ids'][0], 'Renamed')
+    data = get(fx_app, fx_wsgi_app, f'/api/requests/{request_id}/', 2)
+    assert data['request']['submitted_by']['id'] == str(user_id)
+
+
+def test_user_queries(fx_app, fx_wsgi_app, fx_entities):
+    user_id = fx_entities['user_id']
+    data = get(fx_app, fx_wsgi_app, '/api/user/', 2, user_id)
+    assert data['user']['id'] == str(user_id)
+
+
+def test_request_queue_queries(fx_app, fx_wsgi_app, fx_session,
+                               fx_entities):
+    admin_id = make_user(fx_session, 'admin', admin=True)
+    for i, entity_id in enumerate(fx_entities['ids']):
+        user_id = make_user(fx_session, f'reviser {i}')
+        make_revision_request(fx_session, user_id, entity_id, f'Name {i}')
+    # Two for the administrator, and two for the page of requests.
+    data = get(fx_app, fx_wsgi_app, '/api/requests/queue/', 4, admin_id)
+    assert len(data['requests']) == len(POINTS)
+
+
+def test_bulk_commit_invalidates_user_cache(fx_app, fx_session, fx_entities):
+    app = App(fx_app.config, cache={'users': True})
+    try:
+        wsgi_app = create_web_app(app)
+        user_id = fx_entities['user_id']
+        admin_id = make_user(fx_session, 'admin', admin=True)
+        req = BlockUserRequest(submitted_by_id=admin_id,
+                               blocking_user_id=user_id)
+        fx_session.add(req)
+        fx_session.commit()
+        # Cache the user before blocking it.
+        get(app, wsgi_app, '/api/user/', 2, user_id)
+        client = login(wsgi_app.test_client(), admin_id)
+        response = client.post('/api/requests/commit/',
+                               json={'request_ids': [str(req.id)]})
+        assert response.status_code == 200, response.data
+        [result] = response.get_json()['data']['results']
+        assert result['result'] == 'success'
+        assert app.user_cache.stats()['invalidations'] == 1
+        with wsgi_app.test_request_context():
+            assert load_user(str(user_id)) is None
+    finally:
+        app.database_engine.dispose()
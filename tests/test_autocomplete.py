@@ -0,0 +1,112 @@
+import datetime
+import itertools
+import random
+import typing
+import uuid
+
+from pytest import mark
+
+from nkzalimi import autocomplete
+from nkzalimi.autocomplete import (SCAN_MATCHES, AutocompleteIndex,
+                                   Suggestion, SuggestionKind)
+from nkzalimi.entities import BusinessEntityStatus
+from nkzalimi.records import EntityRecord
+from nkzalimi.search import normalize
+from nkzalimi.spatial import sphere_distance
+
+
+CENTER = 37.5665, 126.9780
+
+
+def make_record(name: str, address: str, latitude: float,
+                longitude: float) -> EntityRecord:
+    return EntityRecord(uuid.uuid4(),
+                        datetime.datetime.now(datetime.timezone.utc),
+                        name, 'cafe', BusinessEntityStatus.kids_friendly,
+                        address, '', latitude, longitude)
+
+
+def rank_all(index: AutocompleteIndex, prefix: str, limit: int,
+             near: typing.Optional[typing.Tuple[float, float]]):
+    """Score every entry the slow way."""
+    prefix = normalize(prefix)
+    best = {}
+    entries = itertools.chain.from_iterable(
+        group.entries for group in index.keys.groups.values()
+    )
+    for key, id, kind, whole in entries:
+        if not key.startswith(prefix):
+            continue
+        record = index.records[id]
+        kind = SuggestionKind(kind)
+        text = record.name if kind is SuggestionKind.name \
+            else record.address
+        score = (1.0 if whole else 0.5) / len(key)
+        if near is not None:
+            score /= 1.0 + sphere_distance(near[0], near[1], record.latitude,
+                                           record.longitude) / 1000.0
+        if (text, kind) not in best or best[text, kind].score < score:
+            best[text, kind] = Suggestion(text, kind, id, score)
+    return sorted(best.values(),
+                  key=lambda s: (-s.score, s.text, s.kind.value))[:limit]
+
+
+def test_nearby_beyond_lexicographic_matches():
+    index = AutocompleteIndex()
+    # Many matches sort before the nearby one, all of them far away.
+    far = [make_record(f'Kids Cafe {i:04}', 'Busan', 35.1796, 129.0756)
+           for i in range(1000)]
+    near = make_record('Kids Cafe Seoul', 'Seoul', *CENTER)
+    index.rebuild(far + [near])
+    suggestions = index.complete('kids', 5, CENTER)
+    assert suggestions[0].business_entity_id == near.id
+    assert suggestions[0].text == 'Kids Cafe Seoul'
+
+
+def scatter(n: int, seed: str) -> typing.List[EntityRecord]:
+    rng = random.Random(seed)
+    words = ['kids', 'cafe', 'kitchen', 'seoul', 'sejong', 'kim', 'park']
+    return [
+        make_record(' '.join(rng.sample(words, rng.randint(1, 3))) + f' {i}',
+                    ' '.join(rng.sample(words, 2)),
+                    CENTER[0] + rng.uniform(-0.5, 0.5),
+                    CENTER[1] + rng.uniform(-0.5, 0.5))
+        for i in range(n)
+    ]
+
+
+@mark.parametrize('prefix', ['k', 'ki', 'kids cafe 1', 'cafe', 'se', 'zz'])
+@mark.parametrize('near', [
+    None,
+    CENTER,
+    (CENTER[0] + 0.45, CENTER[1] - 0.45),
+    (CENTER[0] + 3.0, CENTER[1]),
+    (CENTER[0], 179.95),
+])
+# Either score every match, or look for them in the nearest cells.
+@mark.parametrize('scan_matches', [SCAN_MATCHES, 0])
+def test_complete_ranks_every_match(monkeypatch, prefix, near, scan_matches):
+    monkeypatch.setattr(autocomplete, 'SCAN_MATCHES', scan_matches)
+    index = AutocompleteIndex(cell_size=0.1)
+    index.rebuild(scatter(500, prefix))
+    assert index.complete(prefix, 10, near) == rank_all(index, prefix, 10,
+                                                        near)
+
+
+def test_update():
+    records = scatter(100, 'update')
+    index = AutocompleteIndex(cell_size=0.1)
+    index.rebuild(records)
+    keys = len(index.keys)
+    moved = records[0]
+    record = EntityRecord(moved.id, moved.created_at, 'Zoo Cafe',
+                          moved.category, moved.status, moved.address, '',
+                          *CENTER)
+    index.update(record, moved)
+    assert len(index.keys) == keys - len(list(index.entries(moved))) + \
+        len(list(index.entries(record)))
+    assert sum(map(len, index.cells.values())) == len(index.keys)
+    suggestion, = index.complete('zoo', 10, CENTER)
+    assert suggestion.business_entity_id == moved.id
+    assert not any(s.business_entity_id == moved.id
+                   for s in index.complete(moved.name, 10))
@@ -0,0 +1,56 @@
+from pytest import fixture, mark
+
+from nkzalimi.cache import LocalCacheBackend, ResponseCache
+
+
+CENTER = 37.5665, 126.9780
+
+
+@fixture(params=[False, True], ids=['local', 'shared'])
+def fx_cache(request) -> ResponseCache:
+    return ResponseCache(shared=LocalCacheBackend() if request.param
+                         else None)
+
+
+@mark.parametrize('near', [None, (*CENTER, 1000.0)])
+def test_set_after_invalidation(fx_cache: ResponseCache, near):
+    tags = fx_cache.tags_for(near)
+    generation = fx_cache.generation()
+    # The entity changes while the response is built.
+    fx_cache.invalidate([CENTER])
+    fx_cache.set('key', b'stale', tags, generation)
+    assert fx_cache.get('key') is None
+    assert fx_cache.stats()['discards'] == 1
+    # Built again from scratch, it's kept until the next invalidation.
+    fx_cache.set('key', b'fresh', tags, fx_cache.generation())
+    assert fx_cache.get('key') == b'fresh'
+    fx_cache.invalidate([CENTER])
+    assert fx_cache.get('key') is None
+
+
+def test_shared_generation():
+    shared = LocalCacheBackend()
+    cache = ResponseCache(shared=shared)
+    other = ResponseCache(shared=shared)
+    tags = cache.tags_for(None)
+    generation = cache.generation()
+    # Another worker process invalidates while the response is built.
+    other.invalidate([CENTER])
+    cache.set('key', b'stale', tags, generation)
+    assert cache.get('key') is None
+    assert other.get('key') is None
+
+
+def test_invalidation_while_set():
+    class Backend(LocalCacheBackend):
+        def tag(self, key, tags):
+            super().tag(key, tags)
+            # Right after the entry is stored, before the second check.
+            other.invalidate([CENTER])
+
+    shared = Backend()
+    cache = ResponseCache(shared=shared)
+    other = ResponseCache(shared=shared)
+    cache.set('key', b'stale', cache.tags_for(None), cache.generation())
+    assert cache.get('key') is None
+    assert cache.stats()['discards'] == 1
@@ -0,0 +1,106 @@
+import http.server
+import threading
+import time
+import urllib.parse
+
+from pytest import fixture, raises
+from requests import Timeout
+
+from nkzalimi.http import HTTPClient, ProviderBusy
+
+
+class FakeProvider(http.server.BaseHTTPRequestHandler):
+    """Answers every request with a form-encoded OAuth token after the
+    seconds of the ``delay`` query parameter, keeping connections alive.
+
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.connections.add(self.client_address)
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+        time.sleep(float(query.get('delay', ['0'])[0]))
+        body = b'oauth_token=token&oauth_token_secret=secret'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-www-form-urlencoded')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@fixture
+def fx_provider():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), FakeProvider)
+    server.connections = set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def url_of(server: http.server.HTTPServer, path: str = '/') -> str:
+    return f'http://127.0.0.1:{server.server_port}{path}'
+
+
+def test_request(fx_provider):
+    client = HTTPClient()
+    response = client.request('fake', 'GET', url_of(fx_provider))
+    assert response.status_code == 200
+    assert 'oauth_token=token' in response.text
+    stats = client.stats()['fake']
+    assert stats['requests'] == 1
+    assert stats['errors'] == stats['rejected'] == stats['in_flight'] == 0
+    assert stats['latency_max'] is not None
+
+
+def test_request_timeout(fx_provider):
+    client = HTTPClient(read_timeout=0.1)
+    with raises(Timeout):
+        client.request('fake', 'GET', url_of(fx_provider, '/?delay=1'))
+    stats = client.stats()['fake']
+    assert stats['requests'] == stats['errors'] == 1
+    assert stats['in_flight'] == 0
+
+
+def test_provider_busy(fx_provider):
+    client = HTTPClient(connect_timeout=0.1, concurrency=1)
+    slow = threading.Thread(
+        target=client.request,
+        args=('fake', 'GET', url_of(fx_provider, '/?delay=0.5'))
+    )
+    slow.start()
+    try:
+        while not client.stats().get('fake', {}).get('in_flight'):
+            time.sleep(0.01)
+        with raises(ProviderBusy):
+            client.request('fake', 'GET', url_of(fx_provider))
+        # Other providers have slots of their own.
+        client.request('other', 'GET', url_of(fx_provider))
+    finally:
+        slow.join()
+    assert client.stats()['fake']['rejected'] == 1
+    # The slot is given back once the slow request is done.
+    client.request('fake', 'GET', url_of(fx_provider))
+
+
+def test_pool_reuse(fx_provider):
+    client = HTTPClient()
+    for _ in range(3):
+        client.request('fake', 'GET', url_of(fx_provider))
+    oauth1 = client.oauth1_session(client_key='key', client_secret='secret')
+    client.request('fake', 'POST', url_of(fx_provider), session=oauth1,
+                   data={'oauth_verifier': 'verifier'})
+    # Every request, including the one signed by the OAuth 1 session,
+    # went through the same kept-alive connection.
+    assert len(fx_provider.connections) == 1
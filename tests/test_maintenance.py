@@ -0,0 +1,39 @@
+from sqlalchemy.orm import Session
+
+from nkzalimi.entities import Poll, Request
+from nkzalimi.maintenance import check_vote_counts, repair_vote_counts
+from .conftest import make_entities, make_revision_request, make_user
+
+
+def test_check_vote_counts(fx_session: Session):
+    user_id = make_user(fx_session, 'creator')
+    entity_id, = make_entities(fx_session, user_id, [(37.5665, 126.978)])
+    request_ids = [
+        make_revision_request(fx_session, user_id, entity_id, f'Name {i}')
+        for i in range(3)
+    ]
+    voters = [make_user(fx_session, f'voter {i}') for i in range(3)]
+    fx_session.add_all(Poll(user_id=voter, request_id=request_id,
+                            upvote=upvote)
+                       for request_id in request_ids[:2]
+                       for voter, upvote in zip(voters, [True, True, False]))
+    fx_session.commit()
+    assert {row[0] for row in check_vote_counts(fx_session)} == \
+        set(request_ids[:2])
+    repair_vote_counts(fx_session, request_ids[:2])
+    fx_session.commit()
+    assert list(check_vote_counts(fx_session)) == []
+    # Counts which are right along with a score which isn't.
+    fx_session.query(Request) \
+        .filter(Request.id == request_ids[0]) \
+        .update({Request.score: 0.9}, synchronize_session=False)
+    fx_session.commit()
+    (id, up, down, score,
+     actual_up, actual_down, actual_score), = check_vote_counts(fx_session)
+    assert id == request_ids[0]
+    assert (up, down, score) == (2, 1, 0.9)
+    assert (actual_up, actual_down) == (2, 1)
+    assert 0.0 < actual_score < 0.9
+    repair_vote_counts(fx_session, [id])
+    fx_session.commit()
+    assert list(check_vote_counts(fx_session)) == []
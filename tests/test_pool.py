@@ -0,0 +1,79 @@
+import sqlite3
+import threading
+import time
+
+from pytest import raises
+from sqlalchemy.exc import TimeoutError
+
+from nkzalimi.pool import InstrumentedQueuePool
+
+
+#: Seconds the fake database takes to accept a connection.
+CONNECT_TIME = 0.05
+
+
+def slow_connect() -> sqlite3.Connection:
+    time.sleep(CONNECT_TIME)
+    return sqlite3.connect(':memory:', check_same_thread=False)
+
+
+def test_connect_is_not_waiting():
+    pool = InstrumentedQueuePool(slow_connect, pool_size=1, max_overflow=1)
+    first = pool.connect()
+    second = pool.connect()
+    first.close()
+    third = pool.connect()
+    stats = pool.stats()
+    assert stats['checkouts'] == 3
+    assert stats['waits'] == 0
+    assert stats['wait_time'] < CONNECT_TIME
+    assert stats['connects'] == 2
+    assert stats['connect_time'] >= 2 * CONNECT_TIME
+    assert stats['longest_connect'] >= CONNECT_TIME
+    second.close()
+    third.close()
+
+
+def test_waiting_for_connection():
+    pool = InstrumentedQueuePool(slow_connect, pool_size=1, max_overflow=0,
+                                 timeout=1)
+    connection = pool.connect()
+    timer = threading.Timer(0.1, connection.close)
+    timer.start()
+    try:
+        pool.connect().close()
+    finally:
+        timer.join()
+    stats = pool.stats()
+    assert stats['checkouts'] == 2
+    assert stats['waits'] == 1
+    assert stats['wait_time'] >= 0.1
+    assert stats['connects'] == 1
+
+
+def test_timeout():
+    pool = InstrumentedQueuePool(slow_connect, pool_size=1, max_overflow=0,
+                                 timeout=0.05)
+    connection = pool.connect()
+    with raises(TimeoutError):
+        pool.connect()
+    connection.close()
+    stats = pool.stats()
+    assert stats['checkouts'] == 1
+    assert stats['timeouts'] == 1
+    assert stats['wait_time'] >= 0.05
+    assert stats['connects'] == 1
+
+
+def test_connect_error():
+    def fail():
+        time.sleep(CONNECT_TIME)
+        raise sqlite3.OperationalError('unable to connect')
+
+    pool = InstrumentedQueuePool(fail, pool_size=1, max_overflow=0)
+    with raises(sqlite3.OperationalError):
+        pool.connect()
+    stats = pool.stats()
+    assert stats['checkouts'] == stats['connects'] == 0
+    assert stats['connect_errors'] == 1
+    assert stats['connect_time'] >= CONNECT_TIME
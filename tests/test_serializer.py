@@ -0,0 +1,83 @@
+import datetime
+import uuid
+
+from flask import Flask, jsonify
+from pytest import fixture, mark
+
+from nkzalimi.autocomplete import Suggestion, SuggestionKind
+from nkzalimi.cluster import Cluster
+from nkzalimi.entities import (BusinessEntity, BusinessEntityRevision,
+                               BusinessEntityStatus, CurrentBusinessEntity)
+from nkzalimi.records import EntityRecord, RevisionRecord
+from nkzalimi.serializer import (DUMPS_SAMPLE, dumps, plans, serialize,
+                                 serialize_many, stdlib_dumps)
+
+
+NOW = datetime.datetime(2019, 5, 1, 9, 30, tzinfo=datetime.timezone.utc)
+
+#: Values every kind of business entity row shares.
+VALUES = dict(
+    created_at=NOW, name='키즈카페 <&> "Fixture"', category='cafe',
+    status=BusinessEntityStatus.kids_exclusive,
+    address='110 Sejong-daero, Jung-gu, Seoul', address_sub='2F',
+    latitude=37.5665, longitude=126.978
+)
+
+
+def make_objects(cls: type, id: uuid.UUID = None) -> list:
+    if cls in (CurrentBusinessEntity, EntityRecord):
+        return [cls(id=id or uuid.uuid4(), **VALUES) for _ in range(3)]
+    elif cls in (BusinessEntityRevision, RevisionRecord):
+        return [
+            cls(id=uuid.uuid4(), request_id=uuid.uuid4(),
+                replacing_id=replacing_id, **VALUES)
+            for replacing_id in (None, uuid.uuid4())
+        ]
+    elif cls is Suggestion:
+        return [Suggestion(f'Fixture {i}', kind, uuid.uuid4(), 0.5)
+                for i, kind in enumerate(SuggestionKind)]
+    elif cls is Cluster:
+        statuses = {s: i + 1 for i, s in enumerate(BusinessEntityStatus)}
+        return [Cluster(3, 37.5665, 126.978, statuses)]
+    raise ValueError(cls)
+
+
+@fixture
+def fx_flask_app() -> Flask:
+    app = Flask(__name__)
+    with app.app_context():
+        yield app
+
+
+def test_dumps_sample(fx_flask_app: Flask):
+    body = jsonify(DUMPS_SAMPLE).get_data()
+    assert (dumps(DUMPS_SAMPLE) + '\n').encode() == body
+    assert (stdlib_dumps(DUMPS_SAMPLE) + '\n').encode() == body
+
+
+@mark.parametrize('cls', list(plans), ids=lambda cls: cls.__name__)
+def test_plan(fx_flask_app: Flask, cls: type):
+    objects = make_objects(cls)
+    data = serialize_many(objects)
+    assert data == [serialize(e) for e in objects]
+    payload = {'result': 'success', 'data': {'items': data}}
+    assert (dumps(payload) + '\n').encode() == jsonify(payload).get_data()
+
+
+@mark.parametrize('cls', [CurrentBusinessEntity, EntityRecord])
+def test_plan_like_business_entity(cls: type):
+    entity_id = uuid.uuid4()
+    revision, = [r for r in make_objects(BusinessEntityRevision)
+                 if r.replacing_id is None]
+    entity = BusinessEntity(id=entity_id, created_at=NOW,
+                            latest_revision=revision)
+    expected = serialize(entity)
+    assert serialize_many(make_objects(cls, entity_id)) == [expected] * 3
+    # Revisions are serialized like entities, with links to their request
+    # and the revision they replace.
+    assert serialize(revision) == {
+        **expected,
+        'id': str(revision.id),
+        'request_id': str(revision.request_id),
+        'replacing_id': None,
+    }
@@ -0,0 +1,139 @@
+import datetime
+import random
+import typing
+import uuid
+
+from pytest import approx, fixture, mark
+from sqlalchemy.orm import Session
+
+from nkzalimi.api import query_business_entities
+from nkzalimi.entities import BusinessEntityStatus
+from nkzalimi.records import EntityRecord
+from nkzalimi.spatial import SpatialIndex, sphere_distance
+from nkzalimi.util import latlng_to_geography
+from .conftest import make_entities, make_user
+
+
+CENTER = 37.5665, 126.9780
+
+STATUSES = (BusinessEntityStatus.kids_exclusive,
+            BusinessEntityStatus.kids_friendly)
+
+#: (latitude, longitude, radius, status) of the queries compared.
+QUERIES = [
+    (*CENTER, 500.0, None),
+    (*CENTER, 3000.0, None),
+    (*CENTER, 3000.0, BusinessEntityStatus.kids_exclusive),
+    (CENTER[0] + 0.04, CENTER[1] - 0.04, 2000.0, None),
+    (CENTER[0] + 1.0, CENTER[1], 1000.0, None),
+]
+
+
+def scatter(n: int, seed: int) -> typing.List[typing.Tuple[float, float]]:
+    rng = random.Random(seed)
+    return [(CENTER[0] + rng.uniform(-0.05, 0.05),
+             CENTER[1] + rng.uniform(-0.05, 0.05)) for _ in range(n)]
+
+
+def brute_force(records: typing.Iterable[EntityRecord], latitude: float,
+                longitude: float, status: BusinessEntityStatus = None):
+    found = sorted(
+        (sphere_distance(latitude, longitude, r.latitude, r.longitude), r.id)
+        for r in records
+        if status is None or r.status is status
+    )
+    return [(id, distance) for distance, id in found]
+
+
+def ids_and_distances(rows) -> typing.List[typing.Tuple[uuid.UUID, float]]:
+    return [(record.id, distance) for record, distance in rows]
+
+
+@fixture
+def fx_records() -> typing.List[EntityRecord]:
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return [
+        EntityRecord(uuid.uuid4(), now, f'Entity {i}', 'cafe',
+                     STATUSES[i % 2], '', '', latitude, longitude)
+        for i, (latitude, longitude) in enumerate(scatter(2000, 1))
+    ]
+
+
+@mark.parametrize('latitude, longitude, radius, status', QUERIES)
+def test_nearby_brute_force(fx_records, latitude, longitude, radius, status):
+    index = SpatialIndex(cell_size=0.01)
+    index.rebuild(fx_records)
+    expected = [(id, distance)
+                for id, distance in brute_force(fx_records, latitude,
+                                                longitude, status)
+                if distance <= radius]
+    rows = index.nearby(latitude, longitude, radius, status=status)
+    assert ids_and_distances(rows) == expected
+    # Paging through the same results.
+    pages = []
+    after = None
+    while True:
+        page = index.nearby(latitude, longitude, radius, status=status,
+                            after=after, limit=7)
+        pages.extend(page)
+        if len(page) < 7:
+            break
+        record, distance = page[-1]
+        after = distance, record.id
+    assert ids_and_distances(pages) == expected
+
+
+@mark.parametrize('k', [1, 10, 100])
+@mark.parametrize('latitude, longitude, _, status', QUERIES)
+def test_nearest_brute_force(fx_records, latitude, longitude, _, status, k):
+    index = SpatialIndex(cell_size=0.01)
+    index.rebuild(fx_records)
+    expected = brute_force(fx_records, latitude, longitude, status)[:k]
+    rows = index.nearest(latitude, longitude, k, status=status)
+    assert ids_and_distances(rows) == expected
+
+
+@mark.parametrize('k', [0, -1])
+def test_nearest_nothing(fx_records, k):
+    index = SpatialIndex(cell_size=0.01)
+    index.rebuild(fx_records)
+    assert index.nearest(*CENTER, k) == []
+
+
+def test_update(fx_records):
+    index = SpatialIndex(cell_size=0.01)
+    index.rebuild(fx_records)
+    moved = fx_records[0]
+    record = EntityRecord(moved.id, moved.created_at, moved.name,
+                          moved.category, moved.status, '', '', *CENTER)
+    index.update(record, moved)
+    (found, distance), = index.nearest(*CENTER, 1)
+    assert found is record and distance == 0.0
+    assert len(index.records) == len(fx_records)
+
+
+@fixture
+def fx_entities(fx_session: Session) -> None:
+    user_id = make_user(fx_session, 'creator')
+    for i, status in enumerate(STATUSES):
+        make_entities(fx_session, user_id, scatter(300, i), status)
+
+
+@mark.parametrize('latitude, longitude, radius, status', QUERIES)
+def test_matches_sql(fx_wsgi_app, fx_session, fx_entities,
+                     latitude, longitude, radius, status):
+    index = SpatialIndex(cell_size=0.01)
+    index.rebuild(EntityRecord.load_all(fx_session))
+    origin = latlng_to_geography(latitude, longitude)
+    with fx_wsgi_app.test_request_context():
+        nearby = query_business_entities(origin, radius, None, status, None,
+                                         0, None, 1000)
+        nearest = query_business_entities(origin, None, None, status, None,
+                                          0, None, 25)
+    for expected, rows in [
+        (nearby, index.nearby(latitude, longitude, radius, status=status)),
+        (nearest, index.nearest(latitude, longitude, 25, status=status)),
+    ]:
+        assert [r.id for r, _ in rows] == [r.id for r, _ in expected]
+        assert [d for _, d in rows] == approx([d for _, d in expected],
+                                              abs=1e-6)
@@ -0,0 +1,30 @@
+from pytest import fixture, mark
+
+from nkzalimi.app import App
+from nkzalimi.web import create_web_app
+
+
+@fixture
+def fx_app() -> App:
+    # Nothing here reaches the database.
+    return App(
+        database={'url': 'postgresql:///nkzalimi_test'},
+        github={'oauth_client_id': 'id', 'oauth_client_secret': 'secret'},
+        twitter={'oauth_client_id': 'id', 'oauth_client_secret': 'secret'},
+        http={'connect_timeout': 0.01, 'concurrency': 1},
+    )
+
+
+@mark.parametrize('provider, url', [
+    ('github', '/user/oauth/authorized/github/?code=code'),
+    ('twitter', '/user/login/twitter/'),
+])
+def test_provider_unavailable(fx_app: App, provider: str, url: str):
+    semaphore, _ = fx_app.http_client.provider(provider)
+    # Take the only slot, so that the provider is never reached.
+    semaphore.acquire()
+    client = create_web_app(fx_app).test_client()
+    response = client.get(url)
+    assert response.status_code == 502
+    assert b'The login provider is unavailable' in response.data
+    assert fx_app.http_client.stats()[provider]['rejected'] == 1